@@ -0,0 +1,197 @@
+import argparse, hashlib, io, struct
+from pathlib import Path
+from PIL import Image, ImageChops
+from typing import Any, Dict, Iterable, Iterator, Set, Tuple
+
+from Franjas import FIRMA_PNG, TIPOS_PNG, bytes_por_fila, chunk_png, datos_idat
+
+# Empaquetado de PNG animados (APNG) fotograma a fotograma.
+#
+# img.tobytes() solo entrega el primer fotograma de un APNG. Aquí se recorren todos con Pillow, que
+# ya compone cada uno sobre el lienzo según las operaciones de su fcTL, y de cada lienzo se guarda
+# solo el recuadro que cambia respecto al anterior. Un recorte que ya se guardó (mismo recuadro y
+# mismos píxeles, como en una animación que se repite) se guarda una sola vez. Al reconstruir, cada
+# recorte se escribe como un fotograma de ese recuadro que sustituye a los píxeles de debajo y no se
+# desecha: se obtienen exactamente los mismos lienzos sin tener nunca más de uno en memoria.
+#
+# hash_pixel resume los lienzos completos de todos los fotogramas, uno tras otro.
+
+# Operaciones con que se escriben los fotogramas reconstruidos: APNG_DISPOSE_OP_NONE y APNG_BLEND_OP_SOURCE
+DESECHAR_NINGUNO: int = 0
+MEZCLAR_SUSTITUYENDO: int = 0
+
+# Nivel de compresión de zlib de los fotogramas reconstruidos (oxipng no se usa con los APNG)
+NIVEL_FOTOGRAMAS: int = 9
+
+Recuadro = Tuple[int, int, int, int]
+
+
+def es_animada(img: Image.Image) -> bool:
+	"""Indica si una imagen abierta es un PNG con más de un fotograma."""
+	return img.format == "PNG" and getattr(img, "n_frames", 1) > 1
+
+def modo_lienzo(modo: str) -> str:
+	"""El modo en que se guardan los lienzos: el de la imagen si se escribe tal cual en PNG (ver Franjas.TIPOS_PNG) o RGBA."""
+	return modo if modo in TIPOS_PNG else "RGBA"
+
+def longitud_recorte(modo: str, recuadro: Recuadro) -> int:
+	"""Bytes del rawdata de un recuadro (izquierda, arriba, derecha, abajo)."""
+	izquierda, arriba, derecha, abajo = recuadro
+	return bytes_por_fila(modo=modo, ancho=derecha - izquierda) * (abajo - arriba)
+
+def descomponer(img: Image.Image) -> Iterator[Tuple[Dict[str, Any], bytes, bytes]]:
+	"""
+	Recorre los fotogramas de un PNG animado abierto y recorta de cada uno lo que cambia.
+
+	El primer fotograma de la animación se guarda entero. Un fotograma igual al anterior guarda un
+	único píxel (sin cambios) para no escribir fcTL vacíos. Al terminar, la imagen vuelve al primer fotograma.
+
+	Args:
+		img (Image.Image): La imagen abierta (ver es_animada).
+
+	Yields:
+		Tuple[Dict[str, Any], bytes, bytes]: La descripción de cada fotograma (recuadro guardado, duración y las
+			operaciones de su fcTL original), su lienzo completo para el hash y el recorte que hay que guardar,
+			vacío si repite el de un fotograma anterior.
+	"""
+	modo: str = modo_lienzo(modo=img.mode)
+	anterior: Image.Image | None = None
+	guardados: Dict[Tuple[Recuadro, bytes], int] = {}
+	for indice in range(img.n_frames):
+		img.seek(indice)
+		lienzo: Image.Image = img.convert(mode=modo) if img.mode != modo else img.copy()
+		# La imagen por defecto no forma parte de la animación, que empieza en un lienzo vacío
+		if anterior is None or (indice == 1 and img.info.get("default_image")):
+			recuadro: Recuadro = (0, 0, *img.size)
+		else:
+			recuadro = ImageChops.difference(anterior, lienzo).getbbox(alpha_only=False) or (0, 0, 1, 1)
+		recorte: bytes = lienzo.crop(box=recuadro).tobytes()
+
+		fotograma: Dict[str, Any] = {"box": list(recuadro), "duration": img.info.get("duration", 0.0), "disposal": img.info.get("disposal", 0), "blend": img.info.get("blend", 0)}
+		clave: Tuple[Recuadro, bytes] = (recuadro, hashlib.sha256(recorte).digest())
+		if clave in guardados:
+			fotograma["repeat"] = guardados[clave]
+			recorte = b""
+		else:
+			guardados[clave] = indice
+		yield fotograma, lienzo.tobytes(), recorte
+		anterior = lienzo
+	img.seek(0)
+
+def recortes(modo: str, animacion: Dict[str, Any], rawdata: bytes) -> Iterator[Tuple[Recuadro, bytes]]:
+	"""
+	Entrega el recuadro y los píxeles de cada fotograma, resolviendo los que repiten un recorte anterior.
+
+	Raises:
+		ValueError: Si la longitud del rawdata no es la que suman los recortes.
+	"""
+	posicion: int = 0
+	inicios: Dict[int, int] = {}
+	for indice, fotograma in enumerate(iterable=animacion["frames"]):
+		recuadro: Recuadro = tuple(fotograma["box"])
+		longitud: int = longitud_recorte(modo=modo, recuadro=recuadro)
+		if "repeat" in fotograma:
+			inicio: int = inicios[fotograma["repeat"]]
+		else:
+			inicio = inicios[indice] = posicion
+			posicion += longitud
+		if inicio + longitud > len(rawdata):
+			raise ValueError(f"El rawdata termina antes del fotograma {indice}")
+		yield recuadro, rawdata[inicio:inicio + longitud]
+	if posicion != len(rawdata):
+		raise ValueError(f"El rawdata tiene {len(rawdata) - posicion} bytes de más")
+
+def recomponer(modo: str, tamaño: Tuple[int, int], animacion: Dict[str, Any], rawdata: bytes) -> Iterator[bytes]:
+	"""Recompone, uno a uno, los lienzos completos de los fotogramas a partir de sus recortes (para calcular hash_pixel)."""
+	lienzo: Image.Image = Image.new(mode=modo, size=tamaño)
+	for recuadro, recorte in recortes(modo=modo, animacion=animacion, rawdata=rawdata):
+		izquierda, arriba, derecha, abajo = recuadro
+		lienzo.paste(im=Image.frombytes(mode=modo, size=(derecha - izquierda, abajo - arriba), data=recorte), box=(izquierda, arriba))
+		yield lienzo.tobytes()
+
+def retardo(duracion: float) -> Tuple[int, int]:
+	"""El numerador y el denominador del retardo de fcTL (2 bytes cada uno) para una duración en milisegundos."""
+	numerador, denominador = round(duracion), 1000
+	while numerador > 0xFFFF and denominador > 1:
+		numerador, denominador = round(numerador / 10), denominador // 10
+	return min(numerador, 0xFFFF), denominador
+
+def comprimir_recorte(modo: str, recuadro: Recuadro, recorte: bytes, nivel: int) -> bytes:
+	"""Filtra y comprime los píxeles de un recorte como el flujo zlib de un PNG, con el codificador de Pillow."""
+	izquierda, arriba, derecha, abajo = recuadro
+	salida = io.BytesIO()
+	Image.frombytes(mode=modo, size=(derecha - izquierda, abajo - arriba), data=recorte).save(fp=salida, format="PNG", compress_level=nivel)
+	return datos_idat(png=salida.getvalue())
+
+def escribir_apng(ruta: Path, modo: str, tamaño: Tuple[int, int], animacion: Dict[str, Any], rawdata: bytes, chunks: Iterable[bytes] = (), nivel: int = NIVEL_FOTOGRAMAS) -> None:
+	"""
+	Escribe un PNG animado a partir de los recortes guardados por descomponer.
+
+	Cada fotograma se codifica y se escribe en cuanto se llega a él; solo se conservan comprimidos los
+	recortes que otros fotogramas repiten.
+
+	Args:
+		ruta (Path): La ruta del PNG.
+		modo (str): El modo de los lienzos; uno de Franjas.TIPOS_PNG.
+		tamaño (Tuple[int, int]): Ancho y alto del lienzo.
+		animacion (Dict[str, Any]): La descripción de la animación guardada con las propiedades.
+		rawdata (bytes): Los recortes guardados.
+		chunks (Iterable[bytes]): Chunks completos que se escriben entre IHDR y acTL (metadatos).
+		nivel (int): Nivel de compresión de zlib.
+	"""
+	ancho, alto = tamaño
+	profundidad, tipo_color = TIPOS_PNG[modo]
+	fotogramas: list = animacion["frames"]
+	por_defecto: bool = animacion.get("default_image", False)
+	repetidos: Set[int] = {fotograma["repeat"] for fotograma in fotogramas if "repeat" in fotograma}
+	comprimidos: Dict[int, bytes] = {}
+	secuencia: int = 0
+
+	with open(file=ruta, mode="wb") as f:
+		f.write(FIRMA_PNG)
+		f.write(chunk_png(tipo=b"IHDR", datos=struct.pack(">IIBBBBB", ancho, alto, profundidad, tipo_color, 0, 0, 0)))
+		for chunk in chunks:
+			f.write(chunk)
+		f.write(chunk_png(tipo=b"acTL", datos=struct.pack(">II", len(fotogramas) - por_defecto, animacion.get("loop", 0))))
+
+		for indice, (fotograma, (recuadro, recorte)) in enumerate(iterable=zip(fotogramas, recortes(modo=modo, animacion=animacion, rawdata=rawdata))):
+			origen: int = fotograma.get("repeat", indice)
+			datos: bytes | None = comprimidos.get(origen)
+			if datos is None:
+				datos = comprimir_recorte(modo=modo, recuadro=recuadro, recorte=recorte, nivel=nivel)
+				if origen in repetidos:
+					comprimidos[origen] = datos
+
+			# La imagen por defecto (IDAT) no lleva fcTL si no forma parte de la animación
+			if indice > 0 or not por_defecto:
+				izquierda, arriba, derecha, abajo = recuadro
+				numerador, denominador = retardo(duracion=fotograma["duration"])
+				f.write(chunk_png(tipo=b"fcTL", datos=struct.pack(">IIIIIHHBB", secuencia, derecha - izquierda, abajo - arriba, izquierda, arriba,
+					numerador, denominador, DESECHAR_NINGUNO, MEZCLAR_SUSTITUYENDO)))
+				secuencia += 1
+			if indice == 0:
+				f.write(chunk_png(tipo=b"IDAT", datos=datos))
+			else:
+				f.write(chunk_png(tipo=b"fdAT", datos=struct.pack(">I", secuencia) + datos))
+				secuencia += 1
+
+		f.write(chunk_png(tipo=b"IEND", datos=b""))
+
+if __name__ == "__main__":
+	# Muestra cómo se guardaría cada fotograma de un PNG animado
+	parser = argparse.ArgumentParser(description='Muestra los fotogramas de un PNG animado, el recuadro que cambia en cada uno y los que se repiten.')
+	parser.add_argument('imagen', help='PNG animado')
+	args: argparse.Namespace = parser.parse_args()
+
+	with Image.open(fp=Path(args.imagen)) as img:
+		if not es_animada(img=img):
+			print(f"{args.imagen} no es un PNG animado")
+			exit()
+		completo: int = 0
+		guardado: int = 0
+		for indice, (fotograma, lienzo, recorte) in enumerate(iterable=descomponer(img=img)):
+			repite: str = f"repite el {fotograma['repeat']}" if "repeat" in fotograma else ""
+			print(f"{indice:>5} {str(tuple(fotograma['box'])):<26}{fotograma['duration']:>8.0f} ms {len(recorte) / 2**10:>10.1f} KB {repite}")
+			completo += len(lienzo)
+			guardado += len(recorte)
+	print(f"Total: {completo / 2**20:.1f} MB de lienzos -> {guardado / 2**20:.2f} MB de recortes")
@@ -0,0 +1,383 @@
+import argparse, contextlib, io, json, os, platform, random, shutil, subprocess, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+from PIL import Image, ImageDraw
+from typing import Any, Callable, Dict, List, Tuple
+
+from Instrumentacion import Instrumentacion
+
+# Banco de pruebas de rendimiento.
+#
+# Genera galerías sintéticas deterministas (siempre los mismos píxeles para la misma semilla), mide el
+# empaquetado y el desempaquetado completos y cada etapa por separado (con las propias funciones del
+# empaquetador y el desempaquetador, leyendo las Etapas que anotan), y guarda los resultados en JSON
+# para compararlos con una ejecución anterior. Cada fase se ejecuta en un proceso nuevo para que el
+# pico de memoria (RSS) sea el de esa fase y no el acumulado de las anteriores.
+
+# Tamaños de imagen disponibles para las galerías
+TAMAÑOS: Dict[str, Tuple[int, int]] = {
+	"pequeña": (320, 240),
+	"mediana": (1280, 960),
+	"grande": (3840, 2160),
+}
+
+# Fases medidas, en el orden en que se ejecutan
+FASES: Tuple[str, ...] = ("decodificar", "hash", "exif", "escribir", "comprimir", "reconstruir", "optimizar", "empaquetar", "desempaquetar", "ordenar")
+
+# Fases que reconstruyen un contenedor, creado antes por la fase comprimir en su carpeta de trabajo
+FASES_CON_CONTENEDOR: Tuple[str, ...] = ("reconstruir", "optimizar", "desempaquetar")
+
+# Etapa de Instrumentacion.Etapas que mide cada fase de una sola etapa (las demás miden la suya)
+ETAPA_POR_FASE: Dict[str, str] = {
+	"reconstruir": "codificar",
+	"optimizar": "oxipng",
+}
+
+# Versión del formato del informe JSON
+VERSION_INFORME: int = 1
+
+
+def _foto(rng: random.Random, ancho: int, alto: int) -> Image.Image:
+	"""Imagen de tipo fotográfico: zonas suaves con ruido de sensor."""
+	degradado: Image.Image = Image.linear_gradient("L").resize((ancho, alto))
+	canales: List[Image.Image] = []
+	for _ in range(3):
+		manchas: Image.Image = Image.frombytes("L", (ancho // 16 + 1, alto // 16 + 1), rng.randbytes((ancho // 16 + 1) * (alto // 16 + 1))).resize((ancho, alto), Image.BICUBIC)
+		ruido: Image.Image = Image.frombytes("L", (ancho, alto), rng.randbytes(ancho * alto))
+		canales.append(Image.blend(Image.blend(degradado, manchas, 0.6), ruido, 0.08))
+	return Image.merge("RGB", canales)
+
+def _captura(rng: random.Random, ancho: int, alto: int) -> Image.Image:
+	"""Captura de pantalla sintética: colores planos, paneles y líneas de «texto»."""
+	colores: List[Tuple[int, int, int]] = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(6)]
+	img: Image.Image = Image.new("RGB", (ancho, alto), colores[0])
+	dibujo = ImageDraw.Draw(img)
+	for _ in range(12):
+		x0, y0 = rng.randrange(ancho), rng.randrange(alto)
+		dibujo.rectangle((x0, y0, x0 + rng.randrange(ancho // 2 + 1), y0 + rng.randrange(alto // 3 + 1)), fill=rng.choice(colores))
+	for y in range(8, alto - 8, 14):
+		x: int = 8
+		while x < ancho - 40 and rng.random() < 0.95:
+			palabra: int = rng.randrange(10, 40)
+			dibujo.rectangle((x, y, x + palabra, y + 6), fill=colores[-1])
+			x += palabra + 6
+	return img
+
+def _rgba(rng: random.Random, ancho: int, alto: int) -> Image.Image:
+	"""Imagen con transparencia: una foto recortada con un alfa degradado."""
+	img: Image.Image = _foto(rng=rng, ancho=ancho, alto=alto).convert("RGBA")
+	alfa: Image.Image = Image.radial_gradient("L").resize((ancho, alto))
+	img.putalpha(alfa.point(lambda valor: 255 - valor))
+	return img
+
+def generar_galeria(carpeta: Path, tamaños: List[str], semilla: int = 0, versiones: int = 0) -> List[Path]:
+	"""
+	Genera una galería sintética determinista.
+
+	Por cada tamaño: una foto PNG, una foto JPEG con EXIF, dos capturas de pantalla, una imagen con
+	paleta, una RGBA con transparencia, un duplicado exacto y un casi duplicado (unos píxeles distintos).
+	Con `versiones`, además, esa cantidad de fotos por tamaño con un retoque cada una (un casi duplicado
+	cuyo nombre queda al final de la galería, lejos del original, como las exportaciones posteriores).
+
+	Args:
+		carpeta (Path): La carpeta de la galería; se vacía si ya existe.
+		tamaños (List[str]): Nombres de TAMAÑOS.
+		semilla (int): Semilla del generador; la misma semilla produce los mismos archivos.
+		versiones (int): Fotos con retoque por tamaño.
+
+	Returns:
+		List[Path]: Las imágenes generadas.
+	"""
+	shutil.rmtree(carpeta, ignore_errors=True)
+	carpeta.mkdir(parents=True)
+	rng = random.Random(semilla)
+	rutas: List[Path] = []
+
+	for nombre in tamaños:
+		ancho, alto = TAMAÑOS[nombre]
+		foto: Image.Image = _foto(rng=rng, ancho=ancho, alto=alto)
+
+		exif = Image.Exif()
+		exif[0x010F] = "Benchmark"			# Make
+		exif[0x0110] = "Sintética"			# Model
+		exif[0x0132] = "2024:01:01 00:00:00"	# DateTime
+
+		imagenes: List[Tuple[str, Callable[[Path], None]]] = [
+			(f"{nombre}_foto.png", lambda ruta: foto.save(ruta)),
+			(f"{nombre}_foto.jpg", lambda ruta: _foto(rng=rng, ancho=ancho, alto=alto).save(ruta, quality=90, exif=exif)),
+			(f"{nombre}_captura_1.png", lambda ruta: _captura(rng=rng, ancho=ancho, alto=alto).save(ruta)),
+			(f"{nombre}_captura_2.png", lambda ruta: _captura(rng=rng, ancho=ancho, alto=alto).save(ruta)),
+			(f"{nombre}_paleta.png", lambda ruta: _foto(rng=rng, ancho=ancho, alto=alto).quantize(colors=64).save(ruta)),
+			(f"{nombre}_rgba.png", lambda ruta: _rgba(rng=rng, ancho=ancho, alto=alto).save(ruta)),
+			(f"{nombre}_duplicado.png", lambda ruta: foto.save(ruta)),
+			(f"{nombre}_casi_duplicado.png", lambda ruta: _casi_duplicado(foto=foto, rng=rng).save(ruta)),
+		]
+		for numero in range(versiones):
+			serie: Image.Image = _foto(rng=rng, ancho=ancho, alto=alto)
+			imagenes.append((f"{nombre}_serie_{numero}.png", lambda ruta, serie=serie: serie.save(ruta)))
+			imagenes.append((f"retoque_{nombre}_serie_{numero}.png", lambda ruta, serie=serie: _casi_duplicado(foto=serie, rng=rng).save(ruta)))
+		for archivo, guardar in imagenes:
+			ruta: Path = carpeta / archivo
+			guardar(ruta)
+			rutas.append(ruta)
+
+	# Fechas fijas para que las propiedades guardadas también sean deterministas
+	for numero, ruta in enumerate(iterable=rutas):
+		os.utime(ruta, (1_700_000_000 + numero, 1_700_000_000 + numero))
+	return rutas
+
+def _casi_duplicado(foto: Image.Image, rng: random.Random) -> Image.Image:
+	"""Copia de una foto con un pequeño parche cambiado."""
+	copia: Image.Image = foto.copy()
+	x, y = rng.randrange(foto.width - 8), rng.randrange(foto.height - 8)
+	ImageDraw.Draw(copia).rectangle((x, y, x + 7, y + 7), fill=(255, 0, 0))
+	return copia
+
+def pico_rss_mb() -> float | None:
+	"""
+	Pico de memoria residente de este proceso y sus hijos, en MB; None donde no se puede medir (Windows).
+
+	En Linux se lee VmHWM, que empieza de cero en cada proceso nuevo; ru_maxrss se hereda a través de
+	exec y arrastraría el pico del proceso que lanzó la fase.
+	"""
+	try:
+		import resource
+	except ImportError:
+		return None
+	propio: float = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)	# macOS informa en bytes y Linux en KB
+	with contextlib.suppress(OSError):
+		with open(file="/proc/self/status", mode="r") as f:
+			for linea in f:
+				if linea.startswith("VmHWM:"):
+					propio = int(linea.split()[1]) / 2**10
+	hijos: float = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+	return max(propio, hijos)
+
+def _medidas(instrumentacion: Instrumentacion, etapa: str, imagenes: int) -> Dict[str, Any]:
+	"""
+	Las medidas de una etapa tal como las anotaron el empaquetador o el desempaquetador.
+
+	Returns:
+		Dict[str, Any]: Segundos, imágenes y bytes procesados de la etapa, y los totales de todas las etapas de la ejecución.
+	"""
+	return {"segundos": instrumentacion.segundos.get(etapa, 0.0), "imagenes": imagenes, "bytes": instrumentacion.bytes.get(etapa, 0),
+		"etapas": {nombre: {"segundos": segundos, "bytes": instrumentacion.bytes[nombre]} for nombre, segundos in instrumentacion.segundos.items()}}
+
+def medir_fase(fase: str, carpeta: Path, trabajo: Path, perfil: str, trabajadores: int) -> Dict[str, Any]:
+	"""
+	Ejecuta una fase y devuelve sus medidas.
+
+	Las fases de una sola etapa ejecutan las funciones del empaquetador o del desempaquetador y toman
+	el tiempo que estas anotan en sus Etapas (ver Instrumentacion.py), así que miden exactamente lo
+	que hace un empaquetado real, con los bloques sólidos y los hilos del perfil.
+
+	Args:
+		fase (str): Una de FASES.
+		carpeta (Path): La galería.
+		trabajo (Path): Carpeta para los archivos temporales de la fase.
+		perfil (str): Perfil de compresión (ver Perfiles.PERFILES).
+		trabajadores (int): Procesos para empaquetar y desempaquetar.
+
+	Returns:
+		Dict[str, Any]: Segundos, bytes procesados, las etapas medidas y, según la fase, el tamaño comprimido.
+	"""
+	from Desempaquetador import desempaquetar, desempaquetar_cgb
+	from Empaquetador import comprimir_en_cgb, configurar_compresion, decodificar_imagen_con_etapas, empaquetar, escanear_carpeta, estimar_tamaño_raw, guardar_propiedades_imagenes
+
+	lista_imagenes: List[Path] = escanear_carpeta(carpeta=carpeta)
+	trabajo.mkdir(parents=True, exist_ok=True)
+	instrumentacion = Instrumentacion(sumideros=[])		# Sin progreso: solo interesan los totales por etapa
+
+	if fase in ("decodificar", "hash", "exif"):
+		# decodificar_imagen anota las tres etapas; cada fase se queda con la suya
+		for i, imagen in enumerate(iterable=lista_imagenes):
+			_, _, etapas = decodificar_imagen_con_etapas(imagen=imagen, nombre_raw=f"{i+1}.raw")
+			instrumentacion.imagen(etapas=etapas)
+		return _medidas(instrumentacion=instrumentacion, etapa=fase, imagenes=len(lista_imagenes))
+	if fase == "escribir":
+		# Los archivos RAW del modo 7z se escriben junto a la galería; se borran al terminar
+		rutas_raw: List[Path] = []
+		try:
+			rutas_raw = guardar_propiedades_imagenes(lista_imagenes=lista_imagenes, trabajadores=trabajadores, instrumentacion=instrumentacion)
+		finally:
+			for ruta in rutas_raw or carpeta.glob("*.raw"):
+				ruta.unlink(missing_ok=True)
+			(carpeta / "images.json").unlink(missing_ok=True)
+		return _medidas(instrumentacion=instrumentacion, etapa=fase, imagenes=len(lista_imagenes))
+	if fase == "comprimir":
+		configuracion = configurar_compresion(lista_imagenes=lista_imagenes, perfil=perfil)
+		contenedor: Path = comprimir_en_cgb(lista_imagenes=lista_imagenes, configuracion=configuracion, trabajadores=trabajadores, instrumentacion=instrumentacion)
+		# El contenedor se aparta de la galería; las fases de FASES_CON_CONTENEDOR lo reconstruyen desde aquí
+		contenedor = Path(shutil.move(src=contenedor, dst=trabajo / contenedor.name))
+		resultado: Dict[str, Any] = _medidas(instrumentacion=instrumentacion, etapa=fase, imagenes=len(lista_imagenes))
+		resultado["comprimido"] = contenedor.stat().st_size
+		return resultado
+	if fase in ("reconstruir", "optimizar"):
+		# reconstruir_imagen pasa siempre los PNG por oxipng; su tiempo es el de la fase optimizar
+		if shutil.which("oxipng") is None:
+			return {"omitida": "oxipng no está instalado"}
+		desempaquetar_cgb(archivo=trabajo / "contenedor" / f"{carpeta.name}.cgb", carpeta=trabajo / "imagenes", trabajadores=trabajadores, instrumentacion=instrumentacion)
+		return _medidas(instrumentacion=instrumentacion, etapa=ETAPA_POR_FASE[fase], imagenes=len(lista_imagenes))
+
+	if fase in ("empaquetar", "ordenar"):
+		# "ordenar" empaqueta igual, pero comprimiendo seguidas las imágenes parecidas (ver Similitud.py)
+		inicio: float = time.perf_counter()
+		empaquetar(carpeta=carpeta, trabajadores=trabajadores, formato="cgb", perfil=perfil, ordenar=fase == "ordenar")
+		segundos: float = time.perf_counter() - inicio
+		contenedor = carpeta / f"{carpeta.name}.cgb"
+		return {"segundos": segundos, "imagenes": len(lista_imagenes), "bytes": estimar_tamaño_raw(lista_imagenes=lista_imagenes), "comprimido": contenedor.stat().st_size}
+	if fase == "desempaquetar":
+		# Se desempaqueta el contenedor de la fase, en su carpeta de trabajo, para no pisar la galería original
+		inicio = time.perf_counter()
+		desempaquetar(archivo=trabajo / "contenedor" / f"{carpeta.name}.cgb", trabajadores=trabajadores)
+		return {"segundos": time.perf_counter() - inicio, "imagenes": len(lista_imagenes), "bytes": estimar_tamaño_raw(lista_imagenes=lista_imagenes)}
+	raise ValueError(f"Fase desconocida: {fase}")
+
+def ejecutar_fase_aislada(fase: str, carpeta: Path, trabajo: Path, perfil: str, trabajadores: int) -> Dict[str, Any]:
+	"""
+	Ejecuta una fase en un proceso nuevo y añade a sus medidas el ritmo, la relación y el pico de memoria.
+
+	La relación es siempre el rawdata de la galería (estimar_tamaño_raw) entre el tamaño comprimido,
+	aunque la fase haya procesado menos bytes (comprimir no cuenta los duplicados).
+	"""
+	archivo_resultado: Path = trabajo / f"{fase}.json"
+	if fase in FASES_CON_CONTENEDOR:
+		# El contenedor que se reconstruye se crea antes, en su propio proceso, para que no cuente en la memoria de la fase
+		ejecutar_fase_aislada(fase="comprimir", carpeta=carpeta, trabajo=trabajo / "contenedor", perfil=perfil, trabajadores=trabajadores)
+	subprocess.run(args=[sys.executable, str(Path(__file__).resolve()), "--fase", fase, "--resultado", str(archivo_resultado),
+		"--perfil", perfil, "-t", str(trabajadores), "--directorio", str(trabajo), str(carpeta)], check=True, stdout=subprocess.DEVNULL)
+	with open(file=archivo_resultado, mode="r") as f:
+		resultado: Dict[str, Any] = json.load(f)
+
+	if resultado.get("segundos"):
+		resultado["imagenes_s"] = resultado["imagenes"] / resultado["segundos"]
+		if resultado["bytes"]:
+			resultado["mb_s"] = resultado["bytes"] / 2**20 / resultado["segundos"]
+	if resultado.get("comprimido"):
+		from Empaquetador import escanear_carpeta, estimar_tamaño_raw
+		resultado["relacion"] = estimar_tamaño_raw(lista_imagenes=escanear_carpeta(carpeta=carpeta)) / resultado["comprimido"]
+	return resultado
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> bool:
+	"""
+	Muestra la diferencia entre dos informes y dice si hay regresiones.
+
+	Args:
+		actual (Dict[str, Any]): El informe de esta ejecución.
+		base (Dict[str, Any]): El informe de referencia.
+		tolerancia (float): Caída de ritmo (o subida de memoria) admitida, en tanto por uno.
+
+	Returns:
+		bool: True si ninguna fase empeora más que la tolerancia.
+	"""
+	sin_regresiones: bool = True
+	print(f"{'Fase':<15}{'Ritmo':>12}{'base':>10}{'Δ':>8}{'RSS MB':>10}{'base':>10}{'Δ':>8}")
+	for fase, medidas in actual["fases"].items():
+		referencia: Dict[str, Any] = base.get("fases", {}).get(fase, {})
+		# MB/s donde la fase procesa rawdata; imágenes/s en el resto (exif)
+		clave: str = "mb_s" if "mb_s" in medidas else "imagenes_s"
+		if clave not in medidas or clave not in referencia:
+			continue
+		cambio_velocidad: float = medidas[clave] / referencia[clave] - 1
+		unidad: str = "MB/s" if clave == "mb_s" else "img/s"
+		linea: str = f"{fase:<15}{medidas[clave]:>7.1f}{unidad:>5}{referencia[clave]:>10.1f}{cambio_velocidad:>+8.0%}"
+		if medidas.get("rss_pico_mb") and referencia.get("rss_pico_mb"):
+			cambio_memoria: float = medidas["rss_pico_mb"] / referencia["rss_pico_mb"] - 1
+			linea += f"{medidas['rss_pico_mb']:>10.0f}{referencia['rss_pico_mb']:>10.0f}{cambio_memoria:>+8.0%}"
+			sin_regresiones &= cambio_memoria <= tolerancia
+		sin_regresiones &= cambio_velocidad >= -tolerancia
+		print(linea)
+	for fase in ("comprimir", "empaquetar", "ordenar"):
+		if "relacion" in actual["fases"].get(fase, {}) and "relacion" in base.get("fases", {}).get(fase, {}):
+			print(f"Relación ({fase}): {actual['fases'][fase]['relacion']:.3f} (base {base['fases'][fase]['relacion']:.3f})")
+	return sin_regresiones
+
+def ejecutar(tamaños: List[str], perfil: str, trabajadores: int, fases: List[str], directorio: Path, semilla: int = 0, versiones: int = 0) -> Dict[str, Any]:
+	"""
+	Genera la galería y mide todas las fases indicadas.
+
+	Returns:
+		Dict[str, Any]: El informe, listo para guardarlo como JSON.
+	"""
+	carpeta: Path = directorio / "galeria"
+	lista_imagenes: List[Path] = generar_galeria(carpeta=carpeta, tamaños=tamaños, semilla=semilla, versiones=versiones)
+	from Empaquetador import estimar_tamaño_raw
+
+	informe: Dict[str, Any] = {
+		"version": VERSION_INFORME,
+		"fecha": datetime.now().isoformat(timespec="seconds"),
+		"python": platform.python_version(),
+		"plataforma": platform.platform(),
+		"nucleos": os.cpu_count(),
+		"perfil": perfil,
+		"trabajadores": trabajadores,
+		"galeria": {
+			"tamaños": tamaños,
+			"semilla": semilla,
+			"versiones": versiones,
+			"imagenes": len(lista_imagenes),
+			"bytes_archivos": sum(ruta.stat().st_size for ruta in lista_imagenes),
+			"bytes_raw": estimar_tamaño_raw(lista_imagenes=lista_imagenes),
+		},
+		"fases": {},
+	}
+	for fase in fases:
+		print(f"Midiendo {fase}...", end="\r")
+		informe["fases"][fase] = ejecutar_fase_aislada(fase=fase, carpeta=carpeta, trabajo=directorio / fase, perfil=perfil, trabajadores=trabajadores)
+	return informe
+
+if __name__ == "__main__":
+	from Perfiles import PERFIL_POR_DEFECTO, PERFILES
+
+	parser = argparse.ArgumentParser(description='Mide la velocidad, la relación de compresión y la memoria del empaquetado y el desempaquetado.')
+	parser.add_argument('carpeta', nargs='?', help=argparse.SUPPRESS)		# Galería ya generada (uso interno con --fase)
+	parser.add_argument('--tamaños', default='pequeña,mediana', help=f'Tamaños de imagen de la galería, separados por comas ({", ".join(TAMAÑOS)})')
+	parser.add_argument('--fases', default=','.join(FASES), help='Fases a medir, separadas por comas')
+	parser.add_argument('-p', '--perfil', choices=list(PERFILES), default=PERFIL_POR_DEFECTO, help='Perfil de compresión')
+	parser.add_argument('-t', '--trabajadores', type=int, default=1, help='Procesos para empaquetar y desempaquetar (1 = serie, 0 = todos los núcleos)')
+	parser.add_argument('--semilla', type=int, default=0, help='Semilla de la galería sintética')
+	parser.add_argument('--versiones', type=int, default=0, help='Fotos con un retoque por tamaño, con nombres alejados del original (para medir la fase ordenar)')
+	parser.add_argument('--directorio', help='Carpeta de trabajo (por defecto, una temporal que se borra al terminar)')
+	parser.add_argument('-o', '--salida', help='Guarda el informe JSON en este archivo')
+	parser.add_argument('-b', '--base', help='Informe JSON de referencia con el que comparar')
+	parser.add_argument('--tolerancia', type=float, default=0.10, help='Empeoramiento admitido frente a la referencia (0.10 = 10 %%)')
+	parser.add_argument('--fase', help=argparse.SUPPRESS)					# Uso interno: ejecuta una sola fase
+	parser.add_argument('--resultado', help=argparse.SUPPRESS)
+	args: argparse.Namespace = parser.parse_args()
+
+	if args.fase:
+		# Proceso hijo: mide una fase y guarda el resultado en JSON
+		with contextlib.redirect_stdout(io.StringIO()):
+			resultado: Dict[str, Any] = medir_fase(fase=args.fase, carpeta=Path(args.carpeta), trabajo=Path(args.directorio), perfil=args.perfil, trabajadores=args.trabajadores)
+		resultado["rss_pico_mb"] = pico_rss_mb()
+		with open(file=args.resultado, mode="w") as f:
+			json.dump(obj=resultado, fp=f)
+		sys.exit(0)
+
+	directorio: Path = Path(args.directorio) if args.directorio else Path(tempfile.mkdtemp(prefix="cgb_benchmark_"))
+	try:
+		informe: Dict[str, Any] = ejecutar(tamaños=args.tamaños.split(","), perfil=args.perfil, trabajadores=args.trabajadores,
+			fases=args.fases.split(","), directorio=directorio, semilla=args.semilla, versiones=args.versiones)
+	finally:
+		if not args.directorio:
+			shutil.rmtree(directorio, ignore_errors=True)
+
+	texto: str = json.dumps(obj=informe, indent=4, ensure_ascii=False)
+	if args.salida:
+		with open(file=args.salida, mode="w", encoding="utf-8") as f:
+			f.write(texto)
+	print(texto)
+
+	# Lo que gana (o pierde) el orden por parecido frente al orden por nombre
+	normal: Dict[str, Any] = informe["fases"].get("empaquetar", {})
+	ordenado: Dict[str, Any] = informe["fases"].get("ordenar", {})
+	if "relacion" in normal and "relacion" in ordenado:
+		print(f"Orden por parecido: relación {ordenado['relacion']:.3f} frente a {normal['relacion']:.3f} ({ordenado['comprimido'] / normal['comprimido'] - 1:+.1%} de tamaño), "
+			f"{ordenado['segundos']:.1f} s frente a {normal['segundos']:.1f} s")
+
+	if args.base:
+		with open(file=args.base, mode="r", encoding="utf-8") as f:
+			base: Dict[str, Any] = json.load(f)
+		if not comparar(actual=informe, base=base, tolerancia=args.tolerancia):
+			print("Hay regresiones respecto a la referencia")
+			sys.exit(1)
@@ -0,0 +1,227 @@
+import hashlib, json, os, re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from Contenedor import codificar_valor_json, decodificar_valor_json
+
+# Diario de empaquetado y caché de decodificación.
+#
+# Decodificar cada imagen con Pillow y calcular su hash_pixel es la mayor parte del trabajo de un
+# empaquetado. Con una caché, cada imagen decodificada se anota en cuanto termina: su rawdata (tal
+# como se va a guardar, ya reducido o transformado) en un archivo y sus propiedades en un diario,
+# una línea JSON por imagen que solo se escribe cuando el rawdata ya está completo en disco.
+#
+# Las líneas del diario se buscan por la ruta, el tamaño y la fecha de modificación de la imagen,
+# más las opciones que cambian el rawdata. Los archivos de rawdata, en cambio, se nombran por su
+# contenido (hash_pixel, modo, tamaño, reducción, transformación y opciones): las imágenes idénticas
+# comparten uno solo, igual que el Deduplicador del empaquetador guarda su rawdata una sola vez.
+#
+# Si el empaquetado se interrumpe (o falla 7-Zip), al repetirlo las imágenes ya anotadas no se
+# vuelven a decodificar, y lo mismo al volver a empaquetar una carpeta casi sin cambios.
+#
+# La caché tiene un tamaño máximo: al superarlo se olvidan las imágenes usadas hace más tiempo, y se
+# borra cada archivo de rawdata cuando ya no lo usa ninguna. El diario se reescribe al cerrarla, en
+# orden de uso y sin las entradas olvidadas.
+
+# Nombre del diario dentro de la carpeta de la caché
+NOMBRE_DIARIO: str = "diario.jsonl"
+
+# Tamaño máximo por defecto del rawdata guardado en la caché
+TAMAÑO_MAXIMO_CACHE: int = 8 << 30
+
+# Archivos de rawdata de la caché (completos o a medio escribir); son los únicos que se borran de su carpeta
+PATRON_RAW = re.compile(r"[0-9a-f]{32}\.raw(\.tmp)?")
+
+
+def identificar_contenido(propiedades: Dict[str, Any], opciones: str, longitud: int) -> str:
+	"""
+	El nombre del archivo de rawdata de una imagen, que depende solo de lo que se guarda en él.
+
+	Los mismos píxeles (hash_pixel) pueden guardarse distinto según su modo y tamaño, la reducción,
+	la transformación o la animación, así que todo ello forma parte del nombre. Una imagen sin
+	hash_pixel no comparte su archivo con ninguna otra.
+	"""
+	hash_pixel: str | None = propiedades["properties"].get("hash_pixel")
+	if hash_pixel is None:
+		return os.urandom(16).hex()
+	descripcion: str = json.dumps(obj=[hash_pixel, propiedades["mode"], propiedades["properties"]["size"], propiedades.get("reduction"),
+		propiedades.get("transform"), propiedades.get("animation"), opciones, longitud], default=codificar_valor_json, sort_keys=True)
+	return hashlib.sha256(descripcion.encode(encoding="utf-8")).hexdigest()[:32]
+
+
+class CacheDecodificacion:
+	"""Caché en disco de las imágenes decodificadas, con su diario (ver el comentario del módulo)."""
+
+	def __init__(self, carpeta: Path, tamaño_maximo: int = TAMAÑO_MAXIMO_CACHE) -> None:
+		self.carpeta: Path = carpeta
+		self.tamaño_maximo: int = tamaño_maximo
+		self.entradas: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+		self.claves_por_ruta: Dict[Tuple[str, str], str] = {}
+		self.referencias: Dict[str, int] = {}		# Entradas que usan cada archivo de rawdata
+		self.bytes_guardados: int = 0
+		self.aciertos: int = 0
+		self.anotadas: int = 0
+		self.compartidas: int = 0
+		self.carpeta.mkdir(parents=True, exist_ok=True)
+		self._cargar()
+		self._compactar()
+		self.diario = open(file=self.carpeta / NOMBRE_DIARIO, mode="a", encoding="utf-8")
+
+	def __enter__(self) -> "CacheDecodificacion":
+		return self
+
+	def __exit__(self, *excepcion: Any) -> None:
+		self.cerrar()
+
+	def _cargar(self) -> None:
+		"""Lee el diario; una última línea a medias (de una ejecución interrumpida) se ignora."""
+		ruta_diario: Path = self.carpeta / NOMBRE_DIARIO
+		if not ruta_diario.exists():
+			return
+		with open(file=ruta_diario, mode="r", encoding="utf-8") as f:
+			for linea in f:
+				try:
+					entrada: Dict[str, Any] = json.loads(linea)
+				except json.JSONDecodeError:
+					continue
+				# La línea más reciente de una imagen sustituye a las anteriores
+				anterior: str | None = self.claves_por_ruta.get((entrada["path"], entrada["options"]))
+				if anterior is not None:
+					del self.entradas[anterior]
+				self.entradas[entrada["key"]] = entrada
+				self.claves_por_ruta[(entrada["path"], entrada["options"])] = entrada["key"]
+
+		# Solo valen las entradas cuyo rawdata sigue completo en disco
+		completos: Dict[str, bool] = {}
+		for clave, entrada in list(self.entradas.items()):
+			datos: str = entrada["data"]
+			if datos not in completos:
+				ruta_raw: Path = self._ruta_raw(datos=datos)
+				completos[datos] = ruta_raw.exists() and ruta_raw.stat().st_size == entrada["length"]
+			if not completos[datos]:
+				del self.entradas[clave]
+				del self.claves_por_ruta[(entrada["path"], entrada["options"])]
+				continue
+			if datos not in self.referencias:
+				self.bytes_guardados += entrada["length"]
+			self.referencias[datos] = self.referencias.get(datos, 0) + 1
+		self._liberar(necesarios=0)
+
+	def _compactar(self) -> None:
+		"""Reescribe el diario con las entradas vivas, en orden de uso, y borra los archivos que ya no usa ninguna."""
+		ruta_diario: Path = self.carpeta / NOMBRE_DIARIO
+		ruta_temporal: Path = ruta_diario.with_name(ruta_diario.name + ".tmp")
+		with open(file=ruta_temporal, mode="w", encoding="utf-8") as f:
+			for entrada in self.entradas.values():
+				f.write(json.dumps(obj=entrada, separators=(",", ":")) + "\n")
+		os.replace(ruta_temporal, ruta_diario)
+		for archivo in self.carpeta.iterdir():
+			if PATRON_RAW.fullmatch(archivo.name) and (archivo.name.endswith(".tmp") or archivo.stem not in self.referencias):
+				archivo.unlink(missing_ok=True)
+
+	def _ruta_raw(self, datos: str) -> Path:
+		return self.carpeta / f"{datos}.raw"
+
+	@staticmethod
+	def identificar(imagen: Path, opciones: str) -> Tuple[str, str, os.stat_result]:
+		"""La clave de una imagen (su ruta absoluta, su tamaño y su fecha de modificación, más las opciones que cambian el rawdata), su ruta absoluta y su stat."""
+		estado: os.stat_result = imagen.stat()
+		ruta: str = str(Path(imagen).resolve())
+		clave: str = hashlib.sha256(f"{ruta}|{estado.st_size}|{estado.st_mtime_ns}|{opciones}".encode(encoding="utf-8")).hexdigest()[:32]
+		return clave, ruta, estado
+
+	def contiene(self, imagen: Path, opciones: str) -> bool:
+		"""Indica, sin leer su rawdata, si una imagen está en la caché (para no leerla por adelantado)."""
+		clave, _, _ = self.identificar(imagen=imagen, opciones=opciones)
+		return clave in self.entradas
+
+	def buscar(self, imagen: Path, opciones: str) -> Tuple[Dict[str, Any], bytes] | None:
+		"""
+		Busca una imagen en la caché.
+
+		Args:
+			imagen (Path): La ruta de la imagen.
+			opciones (str): Las opciones de empaquetado que cambian el rawdata (transformación y reducción).
+
+		Returns:
+			Tuple[Dict[str, Any], bytes] | None: Una copia de sus propiedades y su rawdata, o None si no está o su archivo ya no está completo.
+		"""
+		clave, _, _ = self.identificar(imagen=imagen, opciones=opciones)
+		entrada: Dict[str, Any] | None = self.entradas.get(clave)
+		if entrada is not None:
+			try:
+				with open(file=self._ruta_raw(datos=entrada["data"]), mode="rb") as f:
+					rawdata: bytes = f.read()
+			except OSError:
+				rawdata = b""
+			if len(rawdata) == entrada["length"]:
+				self.entradas.move_to_end(clave)
+				self.aciertos += 1
+				return json.loads(entrada["properties"], object_hook=decodificar_valor_json), rawdata
+			self._descartar(clave=clave)
+		return None
+
+	def guardar(self, imagen: Path, opciones: str, propiedades: Dict[str, Any], rawdata: bytes) -> None:
+		"""Anota una imagen recién decodificada: primero su rawdata (si no lo tiene ya otra imagen idéntica) y después su línea del diario."""
+		if len(rawdata) > self.tamaño_maximo:
+			return
+		clave, ruta, estado = self.identificar(imagen=imagen, opciones=opciones)
+		datos: str = identificar_contenido(propiedades=propiedades, opciones=opciones, longitud=len(rawdata))
+
+		# La versión anterior de la misma imagen ya no volverá a servir
+		anterior: str | None = self.claves_por_ruta.get((ruta, opciones))
+		if anterior is not None and self.entradas[anterior]["data"] != datos:
+			self._descartar(clave=anterior)
+
+		if datos in self.referencias:
+			self.compartidas += anterior is None
+		else:
+			self._liberar(necesarios=len(rawdata))
+			ruta_raw: Path = self._ruta_raw(datos=datos)
+			ruta_temporal: Path = ruta_raw.with_name(ruta_raw.name + ".tmp")
+			with open(file=ruta_temporal, mode="wb") as f:
+				f.write(rawdata)
+			os.replace(ruta_temporal, ruta_raw)
+
+		entrada: Dict[str, Any] = {"key": clave, "path": ruta, "size": estado.st_size, "mtime": estado.st_mtime_ns, "options": opciones,
+			"data": datos, "length": len(rawdata), "properties": json.dumps(obj=propiedades, default=codificar_valor_json, separators=(",", ":"))}
+		self.diario.write(json.dumps(obj=entrada, separators=(",", ":")) + "\n")
+		self.diario.flush()
+		self._anotar(entrada=entrada)
+		self.anotadas += 1
+
+	def _anotar(self, entrada: Dict[str, Any]) -> None:
+		"""Añade una entrada como la usada más recientemente; sustituye a la anterior de la misma imagen y opciones."""
+		datos: str = entrada["data"]
+		if datos not in self.referencias:
+			self.bytes_guardados += entrada["length"]
+		self.referencias[datos] = self.referencias.get(datos, 0) + 1
+		anterior: str | None = self.claves_por_ruta.get((entrada["path"], entrada["options"]))
+		if anterior is not None:
+			self._descartar(clave=anterior)
+		self.entradas[entrada["key"]] = entrada
+		self.claves_por_ruta[(entrada["path"], entrada["options"])] = entrada["key"]
+
+	def _descartar(self, clave: str) -> None:
+		"""Quita una entrada y, si ninguna otra lo usa, borra su rawdata."""
+		entrada: Dict[str, Any] = self.entradas.pop(clave)
+		del self.claves_por_ruta[(entrada["path"], entrada["options"])]
+		datos: str = entrada["data"]
+		self.referencias[datos] -= 1
+		if not self.referencias[datos]:
+			del self.referencias[datos]
+			self.bytes_guardados -= entrada["length"]
+			self._ruta_raw(datos=datos).unlink(missing_ok=True)
+
+	def _liberar(self, necesarios: int) -> None:
+		"""Olvida las entradas usadas hace más tiempo hasta que quepan `necesarios` bytes más."""
+		while self.entradas and self.bytes_guardados + necesarios > self.tamaño_maximo:
+			self._descartar(clave=next(iter(self.entradas)))
+
+	def cerrar(self) -> None:
+		"""Cierra el diario, lo compacta y muestra cuántas imágenes no hubo que decodificar."""
+		self.diario.close()
+		self._compactar()
+		compartidas: str = f", {self.compartidas} con el rawdata de otra idéntica" if self.compartidas else ""
+		print(f"Caché: {self.aciertos} imágenes sin decodificar, {self.anotadas} anotadas{compartidas} ({self.bytes_guardados / 2**20:.1f} MB en {self.carpeta})")
@@ -0,0 +1,758 @@
+import base64, bisect, json, lzma, os, struct, zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+# Formato del contenedor nativo (.cgb):
+#
+#	Cabecera	MAGIA (4 bytes) + versión (uint16) + reservado (uint16)
+#	Bloques		Flujos XZ (LZMA2) consecutivos. Su contenido descomprimido forma un único
+#				flujo lógico de rawdata; cada bloque cubre un tramo contiguo de ese flujo.
+#	Índice		Tabla de bloques y tabla de entradas (ver _codificar_indice).
+#	Pie			Desplazamiento del índice (uint64) + longitud del índice (uint64) + MAGIA_INDICE
+#
+# Cada entrada (imagen) apunta a un tramo [inicio, inicio + longitud) del flujo lógico, por lo
+# que para leerla solo hay que descomprimir los bloques que cubren ese tramo.
+#
+# Desde la versión 2 el índice guarda lo que se consulta siempre (nombre, modo, tamaño, hash_pixel,
+# fechas...) en registros de tamaño fijo, y el resto de los metadatos (EXIF, XMP, ICC...) aparte, en
+# un trozo comprimido por entrada que solo se lee y se decodifica cuando se pide. Así, listar un
+# contenedor o buscar una imagen no obliga a decodificar los metadatos de todas.
+
+MAGIA: bytes = b"CGB\x00"
+MAGIA_INDICE: bytes = b"CGBI"
+VERSION: int = 2
+
+CABECERA = struct.Struct("<4sHH")
+PIE = struct.Struct("<QQ4s")
+REGISTRO_BLOQUE = struct.Struct("<QQQQ")	# desplazamiento, tamaño comprimido, inicio lógico, tamaño
+REGISTRO_ENTRADA_V1 = struct.Struct("<QQI")	# inicio lógico, longitud, longitud de los metadatos
+# inicio lógico, longitud, hash_pixel, creado, modificado, bytes del archivo, ancho, alto, modo, campos
+# presentes (CAMPO_*), posición y longitud del nombre, posición y longitud del resto de los metadatos
+REGISTRO_ENTRADA = struct.Struct("<QQ32sddQII8sBIHQI")
+CONTADOR = struct.Struct("<I")
+
+# Bits de REGISTRO_ENTRADA.campos: qué campos fijos tenía la entrada
+CAMPO_NOMBRE: int = 1
+CAMPO_MODO: int = 2
+CAMPO_TAMAÑO: int = 4
+CAMPO_HASH: int = 8
+CAMPO_CREADO: int = 16
+CAMPO_MODIFICADO: int = 32
+CAMPO_BYTES: int = 64
+
+# Nivel de compresión máximo (equivalente a -mx9 de 7-Zip)
+PRESET: int = 9 | lzma.PRESET_EXTREME
+
+# Límites del diccionario de LZMA2; se ajusta al tamaño previsto de cada bloque
+DICCIONARIO_MINIMO: int = 1 << 16
+DICCIONARIO_MAXIMO: int = 1 << 26
+
+# Tamaño de los trozos leídos del disco al descomprimir
+TAMAÑO_LECTURA: int = 1 << 20
+
+
+class Bloque(NamedTuple):
+	"""Un bloque comprimido dentro del contenedor."""
+	desplazamiento: int		# Posición del bloque en el archivo
+	comprimido: int			# Tamaño comprimido en bytes
+	inicio: int				# Posición del bloque en el flujo lógico
+	tamaño: int				# Tamaño descomprimido en bytes
+
+
+class RegistroEntrada(NamedTuple):
+	"""Los campos fijos de una entrada, que se leen sin decodificar el resto de sus metadatos (None si no los tenía)."""
+	nombre: str | None
+	modo: str | None
+	tamaño: Tuple[int, int] | None
+	hash_pixel: str | None
+	creado: float | None
+	modificado: float | None
+	bytes: int | None		# Tamaño del archivo de imagen original
+
+
+class Entrada:
+	"""
+	Una imagen dentro del contenedor.
+
+	Las entradas leídas de un índice de la versión 2 solo traen su registro fijo; el resto de los
+	metadatos se lee del contenedor (que debe seguir abierto) y se decodifica la primera vez que se pide.
+	"""
+
+	def __init__(self, inicio: int, longitud: int, metadatos: Dict[str, Any] | None = None, registro: RegistroEntrada | None = None, leer_resto: Callable[[], bytes] | None = None) -> None:
+		self.inicio: int = inicio			# Posición del rawdata en el flujo lógico
+		self.longitud: int = longitud		# Longitud del rawdata
+		self._metadatos: Dict[str, Any] | None = metadatos
+		self._registro: RegistroEntrada | None = registro
+		self._leer_resto: Callable[[], bytes] | None = leer_resto
+
+	@property
+	def registro(self) -> RegistroEntrada:
+		"""Los campos fijos de la entrada."""
+		if self._registro is None:
+			self._registro, _ = _separar_metadatos(metadatos=self._metadatos)
+		return self._registro
+
+	@property
+	def metadatos(self) -> Dict[str, Any]:
+		"""Los metadatos completos, con la misma forma que en images.json."""
+		if self._metadatos is None:
+			self._metadatos = _unir_metadatos(registro=self._registro, resto=_resto_desde_bytes(datos=self._leer_resto()))
+		return self._metadatos
+
+	def resto_codificado(self) -> bytes:
+		"""El resto de los metadatos tal y como se guarda en el índice; si aún no se decodificaron, se copia sin decodificar."""
+		if self._metadatos is None:
+			return self._leer_resto()
+		return _resto_a_bytes(resto=_separar_metadatos(metadatos=self._metadatos)[1])
+
+
+def codificar_valor_json(valor: Any) -> Any:
+	"""Convierte a JSON los valores que json no sabe serializar (bytes, racionales de EXIF, ...)."""
+	if isinstance(valor, (bytes, bytearray)):
+		return {"__bytes__": base64.b64encode(valor).decode(encoding="ascii")}
+	if hasattr(valor, "numerator") and hasattr(valor, "denominator"):
+		return f"{valor.numerator}/{valor.denominator}"
+	return str(valor)
+
+def decodificar_valor_json(objeto: Dict[str, Any]) -> Any:
+	"""Revierte la conversión de codificar_valor_json al leer JSON."""
+	if len(objeto) == 1 and "__bytes__" in objeto:
+		return base64.b64decode(objeto["__bytes__"])
+	return objeto
+
+def metadatos_a_bytes(metadatos: Dict[str, Any]) -> bytes:
+	"""Serializa los metadatos de una entrada como JSON compacto en UTF-8."""
+	return json.dumps(obj=metadatos, default=codificar_valor_json, separators=(",", ":")).encode(encoding="utf-8")
+
+def metadatos_desde_bytes(datos: bytes) -> Dict[str, Any]:
+	"""Deserializa los metadatos de una entrada."""
+	return json.loads(datos, object_hook=decodificar_valor_json)
+
+def _separar_metadatos(metadatos: Dict[str, Any]) -> Tuple[RegistroEntrada, Dict[str, Any]]:
+	"""
+	Separa los campos fijos de una entrada del resto de sus metadatos.
+
+	Un campo solo pasa al registro si se puede recuperar tal cual (un modo de más de 8 bytes o un hash
+	que no es SHA-256 en hexadecimal se quedan en el resto).
+	"""
+	resto: Dict[str, Any] = dict(metadatos)
+	propiedades: Dict[str, Any] = dict(resto.get("properties") or {})
+
+	def tomar(origen: Dict[str, Any], clave: str, valido: Callable[[Any], bool]) -> Any:
+		if clave in origen and valido(origen[clave]):
+			return origen.pop(clave)
+		return None
+
+	nombre: str | None = tomar(origen=resto, clave="name", valido=lambda valor: isinstance(valor, str) and len(valor.encode(encoding="utf-8")) <= 0xFFFF)
+	modo: str | None = tomar(origen=resto, clave="mode", valido=lambda valor: isinstance(valor, str) and valor.isascii() and len(valor) <= 8)
+	tamaño: Any = tomar(origen=propiedades, clave="size", valido=lambda valor: isinstance(valor, (list, tuple)) and len(valor) == 2 and all(isinstance(lado, int) and 0 <= lado < 1 << 32 for lado in valor))
+	hash_pixel: str | None = tomar(origen=propiedades, clave="hash_pixel", valido=lambda valor: isinstance(valor, str) and len(valor) == 64 and all(c in "0123456789abcdef" for c in valor))
+	creado: float | None = tomar(origen=propiedades, clave="created", valido=lambda valor: isinstance(valor, float))
+	modificado: float | None = tomar(origen=propiedades, clave="modified", valido=lambda valor: isinstance(valor, float))
+	bytes_archivo: int | None = tomar(origen=propiedades, clave="bytes", valido=lambda valor: isinstance(valor, int) and 0 <= valor < 1 << 64)
+	if "properties" in resto:
+		resto["properties"] = propiedades
+
+	registro = RegistroEntrada(nombre=nombre, modo=modo, tamaño=None if tamaño is None else tuple(tamaño), hash_pixel=hash_pixel,
+		creado=creado, modificado=modificado, bytes=bytes_archivo)
+	return registro, resto
+
+def _unir_metadatos(registro: RegistroEntrada, resto: Dict[str, Any]) -> Dict[str, Any]:
+	"""Invierte _separar_metadatos, con el mismo orden de claves que images.json."""
+	metadatos: Dict[str, Any] = {}
+	if registro.nombre is not None:
+		metadatos["name"] = registro.nombre
+	if registro.modo is not None:
+		metadatos["mode"] = registro.modo
+	metadatos.update(resto)
+	if "properties" in resto:
+		propiedades: Dict[str, Any] = {}
+		for clave, valor in (("created", registro.creado), ("modified", registro.modificado), ("bytes", registro.bytes), ("hash_pixel", registro.hash_pixel), ("size", registro.tamaño)):
+			if valor is not None:
+				propiedades[clave] = list(valor) if clave == "size" else valor
+		propiedades.update(resto["properties"])
+		metadatos["properties"] = propiedades
+	return metadatos
+
+def _resto_a_bytes(resto: Dict[str, Any]) -> bytes:
+	"""Serializa y comprime el resto de los metadatos de una entrada."""
+	return zlib.compress(metadatos_a_bytes(metadatos=resto))
+
+def _resto_desde_bytes(datos: bytes) -> Dict[str, Any]:
+	"""Descomprime y deserializa el resto de los metadatos de una entrada."""
+	return metadatos_desde_bytes(datos=zlib.decompress(datos))
+
+def filtros_lzma2(tamaño_previsto: int | None = None, preset: int = PRESET, diccionario_maximo: int = DICCIONARIO_MAXIMO) -> List[Dict[str, Any]]:
+	"""
+	Devuelve la cadena de filtros LZMA2 para un bloque.
+
+	Args:
+		tamaño_previsto (int | None): Tamaño aproximado del bloque; un diccionario mayor que el bloque
+			no mejora la compresión y encarece la inicialización del compresor.
+		preset (int): Nivel de compresión para lzma.
+		diccionario_maximo (int): Tamaño máximo del diccionario.
+
+	Returns:
+		List[Dict[str, Any]]: La cadena de filtros para lzma.
+	"""
+	diccionario: int = diccionario_maximo
+	if tamaño_previsto is not None:
+		diccionario = min(diccionario_maximo, max(DICCIONARIO_MINIMO, 1 << max(tamaño_previsto - 1, 1).bit_length()))
+	return [{"id": lzma.FILTER_LZMA2, "preset": preset, "dict_size": diccionario}]
+
+def comprimir_bloque(partes: List[bytes | memoryview], preset: int = PRESET, diccionario_maximo: int = DICCIONARIO_MAXIMO) -> bytes:
+	"""
+	Comprime un bloque completo como un flujo XZ.
+
+	lzma libera el GIL mientras comprime, así que varios bloques se pueden comprimir a la vez en hilos.
+
+	Args:
+		partes (List[bytes | memoryview]): El contenido del bloque, en trozos consecutivos.
+		preset (int): Nivel de compresión para lzma.
+		diccionario_maximo (int): Tamaño máximo del diccionario.
+
+	Returns:
+		bytes: El bloque comprimido.
+	"""
+	tamaño: int = sum(len(parte) for parte in partes)
+	compresor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, check=lzma.CHECK_CRC32, filters=filtros_lzma2(tamaño_previsto=tamaño, preset=preset, diccionario_maximo=diccionario_maximo))
+	comprimido: List[bytes] = [compresor.compress(parte) for parte in partes]
+	comprimido.append(compresor.flush())
+	return b"".join(comprimido)
+
+def es_cgb_nativo(ruta: Path) -> bool:
+	"""Indica si el archivo es un contenedor .cgb nativo (y no un archivo 7z)."""
+	with open(file=ruta, mode="rb") as f:
+		return f.read(len(MAGIA)) == MAGIA
+
+
+class EscritorCGB:
+	"""
+	Escribe un contenedor .cgb nativo.
+
+	El rawdata se comprime a medida que llega, así que nunca se guarda entero en memoria ni en disco.
+	Con varios hilos, los bloques se comprimen en segundo plano y solo se retienen en memoria los
+	que están en vuelo.
+	"""
+
+	def __init__(self, ruta: Path, anexar: bool = False, preset: int = PRESET, diccionario: int = DICCIONARIO_MAXIMO, tamaño_bloque: int | None = None, hilos: int = 1) -> None:
+		"""
+		Args:
+			ruta (Path): La ruta del contenedor.
+			anexar (bool): Si es True, abre un contenedor existente para añadirle bloques y entradas sin
+				recomprimir lo que ya contiene; si algo falla antes de cerrar, el archivo queda como estaba.
+				Si es False, el contenedor se escribe en <ruta>.tmp y solo sustituye al de la ruta al cerrarlo,
+				así que un empaquetado fallido tampoco destruye un contenedor anterior.
+			preset (int): Nivel de compresión para lzma.
+			diccionario (int): Tamaño máximo del diccionario.
+			tamaño_bloque (int | None): Tamaño de los bloques sólidos que forma agregar; None para un bloque por imagen.
+			hilos (int): Bloques que se comprimen a la vez.
+		"""
+		self.ruta: Path = ruta
+		self.preset: int = preset
+		self.diccionario: int = diccionario
+		self.tamaño_bloque: int | None = tamaño_bloque
+		self.hilos: int = max(hilos, 1)
+		self.bloques: List[Bloque] = []
+		self.entradas: List[Entrada] = []
+		self.posicion: int = 0				# Posición actual en el flujo lógico
+		self._compresor: lzma.LZMACompressor | None = None
+		self._bloque_desplazamiento: int = 0
+		self._bloque_inicio: int = 0
+		self._tamaño_final: int = 0
+		self._tamaño_original: int | None = None
+		self._ruta_temporal: Path | None = None
+		self._solido: List[bytes | memoryview] = []		# Rawdata del bloque sólido que se está llenando (con varios hilos)
+		self._solido_tamaño: int = 0
+		self._en_vuelo: Deque[Tuple[Future, int, int]] = deque()		# Bloques comprimiéndose: futuro, inicio lógico, tamaño
+		self._ejecutor: ThreadPoolExecutor | None = None
+
+		if anexar:
+			# Los bloques nuevos se escriben después del pie actual; el índice viejo queda como espacio muerto
+			self.archivo: BinaryIO = open(file=ruta, mode="r+b")
+			self.bloques, self.entradas, _ = _leer_indice(archivo=self.archivo, ruta=ruta)
+			self.posicion = max((bloque.inicio + bloque.tamaño for bloque in self.bloques), default=0)
+			self._tamaño_original = self.archivo.seek(0, os.SEEK_END)
+		else:
+			self._ruta_temporal = ruta.with_name(ruta.name + ".tmp")
+			self.archivo = open(file=self._ruta_temporal, mode="wb")
+			self.archivo.write(CABECERA.pack(MAGIA, VERSION, 0))
+
+	@property
+	def bytes_sin_comprimir(self) -> int:
+		"""Total de rawdata escrito."""
+		return self.posicion
+
+	@property
+	def bytes_comprimidos(self) -> int:
+		"""Tamaño actual del archivo."""
+		return self._tamaño_final if self.archivo.closed else self.archivo.tell()
+
+	def abrir_bloque(self, tamaño_previsto: int | None = None) -> None:
+		"""Empieza un bloque comprimido nuevo, cerrando el anterior si lo hubiera."""
+		self.cerrar_bloque()
+		self._vaciar()
+		self._compresor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, check=lzma.CHECK_CRC32, filters=filtros_lzma2(tamaño_previsto=tamaño_previsto, preset=self.preset, diccionario_maximo=self.diccionario))
+		self._bloque_desplazamiento = self.archivo.tell()
+		self._bloque_inicio = self.posicion
+
+	def escribir(self, datos: bytes) -> None:
+		"""Añade rawdata al bloque actual."""
+		if self._compresor is None:
+			self.abrir_bloque(tamaño_previsto=len(datos))
+		self.archivo.write(self._compresor.compress(datos))
+		self.posicion += len(datos)
+
+	def cerrar_bloque(self) -> None:
+		"""Termina el bloque actual y lo registra en la tabla de bloques."""
+		if self._compresor is None:
+			return
+		self.archivo.write(self._compresor.flush())
+		self._compresor = None
+		self.bloques.append(Bloque(
+			desplazamiento=self._bloque_desplazamiento,
+			comprimido=self.archivo.tell() - self._bloque_desplazamiento,
+			inicio=self._bloque_inicio,
+			tamaño=self.posicion - self._bloque_inicio,
+		))
+
+	def agregar_entrada(self, inicio: int, longitud: int, metadatos: Dict[str, Any], indice: int | None = None) -> None:
+		"""
+		Registra una imagen cuyo rawdata ocupa [inicio, inicio + longitud) del flujo lógico.
+
+		Si se indica un índice, la entrada sustituye a la que ocupaba esa posición.
+		"""
+		entrada = Entrada(inicio=inicio, longitud=longitud, metadatos=metadatos)
+		if indice is None:
+			self.entradas.append(entrada)
+		else:
+			self.entradas[indice] = entrada
+
+	def agregar(self, datos: bytes | Iterable[bytes], metadatos: Dict[str, Any], indice: int | None = None) -> None:
+		"""
+		Guarda el rawdata de una imagen y registra (o sustituye) su entrada.
+
+		Sin tamaño de bloque, cada imagen va en su propio bloque. Con él, las imágenes se acumulan en bloques
+		sólidos de ese tamaño, y una imagen puede quedar repartida entre dos bloques.
+
+		El rawdata también puede llegar como un iterable de trozos consecutivos (imágenes que no caben en
+		memoria); en ese caso nunca se retiene más de un bloque.
+		"""
+		if self.hilos > 1:
+			self.cerrar_bloque()
+		inicio: int = self.posicion
+		en_memoria: bool = isinstance(datos, (bytes, bytearray, memoryview))
+
+		if self.tamaño_bloque is None:
+			if self.hilos > 1 and en_memoria:
+				self.posicion += len(datos)
+				self._encolar(partes=[datos])
+			else:
+				self.abrir_bloque(tamaño_previsto=len(datos) if en_memoria else None)
+				for trozo in ([datos] if en_memoria else datos):
+					self.escribir(datos=trozo)
+				self.cerrar_bloque()
+		else:
+			for trozo in ([datos] if en_memoria else datos):
+				self._acumular(datos=trozo)
+
+		self.agregar_entrada(inicio=inicio, longitud=self.posicion - inicio, metadatos=metadatos, indice=indice)
+
+	def _acumular(self, datos: bytes) -> None:
+		"""Añade rawdata a los bloques sólidos, cerrando cada bloque al llegar a su tamaño."""
+		vista = memoryview(datos)
+		while vista:
+			if self.hilos > 1:
+				# Se acumula en memoria hasta llenar el bloque, que se comprime en segundo plano
+				parte: memoryview = vista[:self.tamaño_bloque - self._solido_tamaño]
+				self._solido.append(parte)
+				self._solido_tamaño += len(parte)
+				self.posicion += len(parte)
+				if self._solido_tamaño >= self.tamaño_bloque:
+					self._encolar_solido()
+			else:
+				# Con un hilo el bloque se comprime en flujo, sin guardarlo en memoria
+				if self._compresor is None:
+					self.abrir_bloque(tamaño_previsto=self.tamaño_bloque)
+				parte = vista[:self.tamaño_bloque - (self.posicion - self._bloque_inicio)]
+				self.escribir(datos=parte)
+				if self.posicion - self._bloque_inicio >= self.tamaño_bloque:
+					self.cerrar_bloque()
+			vista = vista[len(parte):]
+
+	def _encolar(self, partes: List[bytes | memoryview]) -> None:
+		"""Manda a comprimir un bloque que termina en la posición actual y escribe los terminados para acotar la memoria."""
+		tamaño: int = sum(len(parte) for parte in partes)
+		if self._ejecutor is None:
+			self._ejecutor = ThreadPoolExecutor(max_workers=self.hilos)
+		futuro: Future = self._ejecutor.submit(comprimir_bloque, partes, self.preset, self.diccionario)
+		self._en_vuelo.append((futuro, self.posicion - tamaño, tamaño))
+		while len(self._en_vuelo) > self.hilos:
+			self._escribir_comprimido()
+
+	def _encolar_solido(self) -> None:
+		"""Manda a comprimir el bloque sólido acumulado."""
+		if not self._solido_tamaño:
+			return
+		partes, self._solido, self._solido_tamaño = self._solido, [], 0
+		self._encolar(partes=partes)
+
+	def _escribir_comprimido(self) -> None:
+		"""Escribe el bloque en vuelo más antiguo cuando termina de comprimirse (los bloques se escriben en orden)."""
+		futuro, inicio, tamaño = self._en_vuelo.popleft()
+		comprimido: bytes = futuro.result()
+		desplazamiento: int = self.archivo.tell()
+		self.archivo.write(comprimido)
+		self.bloques.append(Bloque(desplazamiento=desplazamiento, comprimido=len(comprimido), inicio=inicio, tamaño=tamaño))
+
+	def _vaciar(self) -> None:
+		"""Comprime lo acumulado y espera a que se escriban todos los bloques en vuelo."""
+		self._encolar_solido()
+		while self._en_vuelo:
+			self._escribir_comprimido()
+
+	def cerrar(self) -> None:
+		"""Cierra el último bloque y escribe el índice y el pie."""
+		self.cerrar_bloque()
+		self._vaciar()
+		if self._ejecutor is not None:
+			self._ejecutor.shutdown()
+		indice: bytes = _codificar_indice(bloques=self.bloques, entradas=self.entradas)
+		desplazamiento: int = self.archivo.tell()
+		self.archivo.write(indice)
+		self.archivo.write(PIE.pack(desplazamiento, len(indice), MAGIA_INDICE))
+		self._tamaño_final = self.archivo.tell()
+		if self._tamaño_original is not None:
+			# Al anexar a un contenedor antiguo, el índice nuevo es de la versión actual
+			self.archivo.seek(0)
+			self.archivo.write(CABECERA.pack(MAGIA, VERSION, 0))
+		self.archivo.close()
+		if self._ruta_temporal is not None:
+			os.replace(self._ruta_temporal, self.ruta)
+
+	def __enter__(self) -> "EscritorCGB":
+		return self
+
+	def __exit__(self, *excepcion: Any) -> None:
+		if excepcion[0] is None:
+			try:
+				self.cerrar()
+			except BaseException:
+				self._descartar()
+				raise
+			return
+		self._descartar()
+
+	def _descartar(self) -> None:
+		"""Deshace lo escrito tras un error, dejando en la ruta lo que había antes."""
+		if self._ejecutor is not None:
+			self._ejecutor.shutdown(cancel_futures=True)
+		if not self.archivo.closed:
+			# Al anexar, descartar lo escrito para que el contenedor siga siendo válido
+			if self._tamaño_original is not None:
+				self.archivo.truncate(self._tamaño_original)
+			self.archivo.close()
+		# Si no, borrar el contenedor a medias; el de la ruta, si había uno, no se ha tocado
+		if self._ruta_temporal is not None:
+			self._ruta_temporal.unlink(missing_ok=True)
+
+
+class LectorCGB:
+	"""Lee un contenedor .cgb nativo con acceso aleatorio a cada entrada."""
+
+	def __init__(self, ruta: Path) -> None:
+		self.ruta: Path = ruta
+		self.archivo: BinaryIO = open(file=ruta, mode="rb")
+
+		self.bloques, self.entradas, _ = _leer_indice(archivo=self.archivo, ruta=ruta)
+		self._inicios: List[int] = [bloque.inicio for bloque in self.bloques]
+
+	def __len__(self) -> int:
+		return len(self.entradas)
+
+	def bloque_de(self, posicion: int) -> int:
+		"""Devuelve el índice del bloque que contiene una posición del flujo lógico."""
+		return max(bisect.bisect_right(self._inicios, posicion) - 1, 0)
+
+	def metadatos(self) -> List[Dict[str, Any]]:
+		"""Devuelve los metadatos de todas las entradas, con la misma forma que images.json."""
+		return [entrada.metadatos for entrada in self.entradas]
+
+	def nombres(self) -> List[str | None]:
+		"""Devuelve los nombres de todas las entradas, sin decodificar sus metadatos."""
+		return [entrada.registro.nombre for entrada in self.entradas]
+
+	def exportar_json(self, ruta: Path) -> None:
+		"""Escribe los metadatos de todas las entradas en un JSON legible, como images.json (solo para depurar)."""
+		elementos: List[Dict[str, Any]] = [{**entrada.metadatos, "offset": entrada.inicio, "length": entrada.longitud} for entrada in self.entradas]
+		with open(file=ruta, mode="w", encoding="utf-8") as f:
+			json.dump(obj=elementos, fp=f, indent=4, default=codificar_valor_json)
+
+	def iterar(self, indice: int, tamaño_trozo: int = TAMAÑO_LECTURA) -> Iterator[bytes]:
+		"""
+		Entrega el rawdata de una entrada en trozos, descomprimiendo solo los bloques que la contienen.
+
+		Args:
+			indice (int): Índice de la entrada.
+			tamaño_trozo (int): Tamaño máximo de cada trozo entregado.
+
+		Returns:
+			Iterator[bytes]: Trozos consecutivos del rawdata.
+		"""
+		entrada: Entrada = self.entradas[indice]
+		return self.iterar_tramo(inicio=entrada.inicio, longitud=entrada.longitud, tamaño_trozo=tamaño_trozo)
+
+	def iterar_tramo(self, inicio: int, longitud: int, tamaño_trozo: int = TAMAÑO_LECTURA) -> Iterator[bytes]:
+		"""
+		Entrega en trozos un tramo cualquiera del flujo lógico, descomprimiendo solo los bloques que lo contienen.
+
+		Args:
+			inicio (int): Posición del tramo en el flujo lógico.
+			longitud (int): Longitud del tramo.
+			tamaño_trozo (int): Tamaño máximo de cada trozo entregado.
+
+		Yields:
+			bytes: Trozos consecutivos del tramo.
+		"""
+		fin: int = inicio + longitud
+
+		# Primer bloque que contiene el inicio del tramo
+		b: int = self.bloque_de(posicion=inicio)
+		while inicio < fin and b < len(self.bloques):
+			bloque: Bloque = self.bloques[b]
+			saltar: int = inicio - bloque.inicio
+			pendiente: int = min(fin, bloque.inicio + bloque.tamaño) - inicio
+			for trozo in self._iterar_bloque(bloque=bloque, saltar=saltar, longitud=pendiente, tamaño_trozo=tamaño_trozo):
+				inicio += len(trozo)
+				yield trozo
+			b += 1
+
+	def leer(self, indice: int) -> bytes:
+		"""Devuelve el rawdata completo de una entrada."""
+		return b"".join(self.iterar(indice=indice))
+
+	def leer_tramo(self, inicio: int, longitud: int) -> bytes:
+		"""Devuelve un tramo completo del flujo lógico (por ejemplo, la referencia de un delta)."""
+		return b"".join(self.iterar_tramo(inicio=inicio, longitud=longitud))
+
+	def iterar_varias(self, indices: List[int], tamaño_trozo: int = TAMAÑO_LECTURA) -> Iterator[Tuple[List[int], bytes]]:
+		"""
+		Entrega el rawdata de varias entradas descomprimiendo cada bloque como mucho una vez.
+
+		Con bloques sólidos, leer las entradas una a una obligaría a descomprimir el principio del bloque
+		para cada una. Aquí se recorren en el orden del flujo lógico y el descompresor de un bloque se
+		reutiliza mientras las entradas sigan dentro de él. Las entradas que comparten tramo (imágenes
+		deduplicadas) se entregan juntas.
+
+		Args:
+			indices (List[int]): Índices de las entradas.
+			tamaño_trozo (int): Tamaño de los trozos descomprimidos de cada vez.
+
+		Yields:
+			Tuple[List[int], bytes]: Los índices de las entradas que comparten un tramo y su rawdata.
+		"""
+		tramos: Dict[Tuple[int, int], List[int]] = {}
+		for indice in indices:
+			entrada: Entrada = self.entradas[indice]
+			tramos.setdefault((entrada.inicio, entrada.longitud), []).append(indice)
+
+		fuente: Iterator[bytes] | None = None	# Trozos del bloque en curso
+		posicion: int = 0						# Posición lógica del principio de `pendiente`
+		fin_bloque: int = 0
+		pendiente: bytes = b""
+		for (inicio, longitud), grupo in sorted(tramos.items()):
+			partes: List[bytes] = []
+			while longitud > 0:
+				# Abrir el bloque que contiene `inicio` si no es el que se está recorriendo
+				if fuente is None or not posicion <= inicio < fin_bloque:
+					bloque: Bloque = self.bloques[self.bloque_de(posicion=inicio)]
+					fin_bloque = bloque.inicio + bloque.tamaño
+					fuente = self._iterar_bloque(bloque=bloque, saltar=inicio - bloque.inicio, longitud=fin_bloque - inicio, tamaño_trozo=tamaño_trozo)
+					posicion = inicio
+					pendiente = b""
+				if not pendiente:
+					pendiente = next(fuente)
+
+				# Descartar lo que precede al tramo y tomar lo que le corresponde
+				descartar: int = min(inicio - posicion, len(pendiente))
+				tomar: bytes = pendiente[descartar:descartar + longitud]
+				pendiente = pendiente[descartar + len(tomar):]
+				posicion += descartar + len(tomar)
+				if tomar:
+					partes.append(tomar)
+					inicio += len(tomar)
+					longitud -= len(tomar)
+			yield grupo, b"".join(partes)
+
+	def _iterar_bloque(self, bloque: Bloque, saltar: int, longitud: int, tamaño_trozo: int) -> Iterator[bytes]:
+		"""Descomprime un tramo de un bloque sin producir más salida de la necesaria."""
+		descompresor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+		leido: int = 0
+		restante_comprimido: int = bloque.comprimido
+		entrada_pendiente: bytes = b""
+
+		while longitud > 0:
+			# Alimentar el descompresor solo cuando ya no puede producir más salida
+			if descompresor.needs_input:
+				if restante_comprimido <= 0:
+					raise ValueError(f"Bloque truncado en {bloque.desplazamiento}")
+				# Se reposiciona en cada lectura porque puede haber otras lecturas intercaladas
+				self.archivo.seek(bloque.desplazamiento + leido)
+				entrada_pendiente = self.archivo.read(min(TAMAÑO_LECTURA, restante_comprimido))
+				leido += len(entrada_pendiente)
+				restante_comprimido -= len(entrada_pendiente)
+			datos: bytes = descompresor.decompress(entrada_pendiente, max_length=tamaño_trozo if saltar == 0 else min(tamaño_trozo, saltar))
+			entrada_pendiente = b""
+
+			# Descartar lo que precede al tramo pedido
+			if saltar:
+				descartados: int = min(saltar, len(datos))
+				saltar -= descartados
+				datos = datos[descartados:]
+			if datos:
+				datos = datos[:longitud]
+				longitud -= len(datos)
+				yield datos
+
+	def cerrar(self) -> None:
+		"""Cierra el archivo."""
+		self.archivo.close()
+
+	def __enter__(self) -> "LectorCGB":
+		return self
+
+	def __exit__(self, *excepcion: Any) -> None:
+		self.cerrar()
+
+
+def _leer_indice(archivo: BinaryIO, ruta: Path) -> tuple[List[Bloque], List[Entrada], int]:
+	"""
+	Verifica la cabecera y lee el índice de un contenedor abierto.
+
+	En la versión 2 solo se leen las tablas y los nombres; el resto de los metadatos de cada entrada se
+	lee del archivo cuando se pide.
+
+	Returns:
+		tuple[List[Bloque], List[Entrada], int]: Los bloques, las entradas y la posición del índice en el archivo.
+	"""
+	# Verificar la cabecera
+	archivo.seek(0)
+	magia, version, _ = CABECERA.unpack(archivo.read(CABECERA.size))
+	if magia != MAGIA:
+		raise ValueError(f"{ruta} no es un contenedor .cgb nativo")
+	if version > VERSION:
+		raise ValueError(f"Versión de contenedor no soportada: {version}")
+
+	# Leer el pie y el índice
+	archivo.seek(-PIE.size, os.SEEK_END)
+	desplazamiento, longitud, magia_indice = PIE.unpack(archivo.read(PIE.size))
+	if magia_indice != MAGIA_INDICE:
+		raise ValueError(f"{ruta} no tiene índice (¿archivo incompleto?)")
+	archivo.seek(desplazamiento)
+	if version == 1:
+		bloques, entradas = _decodificar_indice_v1(datos=archivo.read(longitud))
+	else:
+		bloques, entradas = _leer_indice_v2(archivo=archivo)
+	return bloques, entradas, desplazamiento
+
+def _leer_tramo(archivo: BinaryIO, desplazamiento: int, longitud: int) -> bytes:
+	"""Lee un tramo del archivo sin mover su posición (el escritor sigue escribiendo donde estaba)."""
+	posicion: int = archivo.tell()
+	archivo.seek(desplazamiento)
+	datos: bytes = archivo.read(longitud)
+	archivo.seek(posicion)
+	return datos
+
+def _codificar_indice(bloques: List[Bloque], entradas: List[Entrada]) -> bytes:
+	"""
+	Codifica el índice binario del contenedor (versión 2).
+
+	Tabla de bloques: número de bloques (uint32) y un REGISTRO_BLOQUE por bloque.
+	Tabla de entradas: número de entradas (uint32) y un REGISTRO_ENTRADA por entrada.
+	Nombres: longitud total (uint32) y los nombres en UTF-8, uno tras otro.
+	Resto de los metadatos: un JSON comprimido con zlib por entrada, uno tras otro.
+	"""
+	registros: List[bytes] = []
+	nombres: List[bytes] = []
+	restos: List[bytes] = []
+	posicion_nombres: int = 0
+	posicion_restos: int = 0
+	for entrada in entradas:
+		registro: RegistroEntrada = entrada.registro
+		resto: bytes = entrada.resto_codificado()
+		nombre: bytes = (registro.nombre or "").encode(encoding="utf-8")
+		campos: int = 0
+		for bit, valor in ((CAMPO_NOMBRE, registro.nombre), (CAMPO_MODO, registro.modo), (CAMPO_TAMAÑO, registro.tamaño), (CAMPO_HASH, registro.hash_pixel),
+				(CAMPO_CREADO, registro.creado), (CAMPO_MODIFICADO, registro.modificado), (CAMPO_BYTES, registro.bytes)):
+			if valor is not None:
+				campos |= bit
+		ancho, alto = registro.tamaño or (0, 0)
+		registros.append(REGISTRO_ENTRADA.pack(entrada.inicio, entrada.longitud, bytes.fromhex(registro.hash_pixel or "00" * 32),
+			registro.creado or 0.0, registro.modificado or 0.0, registro.bytes or 0, ancho, alto, (registro.modo or "").encode(encoding="ascii"),
+			campos, posicion_nombres, len(nombre), posicion_restos, len(resto)))
+		nombres.append(nombre)
+		restos.append(resto)
+		posicion_nombres += len(nombre)
+		posicion_restos += len(resto)
+
+	partes: List[bytes] = [CONTADOR.pack(len(bloques))]
+	for bloque in bloques:
+		partes.append(REGISTRO_BLOQUE.pack(*bloque))
+	partes.append(CONTADOR.pack(len(entradas)))
+	partes.extend(registros)
+	partes.append(CONTADOR.pack(posicion_nombres))
+	partes.extend(nombres)
+	partes.extend(restos)
+	return b"".join(partes)
+
+def _leer_indice_v2(archivo: BinaryIO) -> tuple[List[Bloque], List[Entrada]]:
+	"""Lee las tablas y los nombres del índice escrito por _codificar_indice, desde la posición actual del archivo."""
+	numero_bloques, = CONTADOR.unpack(archivo.read(CONTADOR.size))
+	tabla: bytes = archivo.read(numero_bloques * REGISTRO_BLOQUE.size)
+	bloques: List[Bloque] = [Bloque(*campos) for campos in REGISTRO_BLOQUE.iter_unpack(tabla)]
+
+	numero_entradas, = CONTADOR.unpack(archivo.read(CONTADOR.size))
+	tabla = archivo.read(numero_entradas * REGISTRO_ENTRADA.size)
+	longitud_nombres, = CONTADOR.unpack(archivo.read(CONTADOR.size))
+	nombres: bytes = archivo.read(longitud_nombres)
+	inicio_restos: int = archivo.tell()
+
+	entradas: List[Entrada] = []
+	for (inicio, longitud, hash_pixel, creado, modificado, bytes_archivo, ancho, alto, modo, campos,
+			posicion_nombre, longitud_nombre, posicion_resto, longitud_resto) in REGISTRO_ENTRADA.iter_unpack(tabla):
+		registro = RegistroEntrada(
+			nombre=nombres[posicion_nombre:posicion_nombre + longitud_nombre].decode(encoding="utf-8") if campos & CAMPO_NOMBRE else None,
+			modo=modo.rstrip(b"\x00").decode(encoding="ascii") if campos & CAMPO_MODO else None,
+			tamaño=(ancho, alto) if campos & CAMPO_TAMAÑO else None,
+			hash_pixel=hash_pixel.hex() if campos & CAMPO_HASH else None,
+			creado=creado if campos & CAMPO_CREADO else None,
+			modificado=modificado if campos & CAMPO_MODIFICADO else None,
+			bytes=bytes_archivo if campos & CAMPO_BYTES else None,
+		)
+		leer_resto: Callable[[], bytes] = partial(_leer_tramo, archivo, inicio_restos + posicion_resto, longitud_resto)
+		entradas.append(Entrada(inicio=inicio, longitud=longitud, registro=registro, leer_resto=leer_resto))
+	return bloques, entradas
+
+def _decodificar_indice_v1(datos: bytes) -> tuple[List[Bloque], List[Entrada]]:
+	"""Decodifica el índice de la versión 1: cada REGISTRO_ENTRADA_V1 va seguido de todos sus metadatos en JSON."""
+	posicion: int = 0
+	numero_bloques, = CONTADOR.unpack_from(datos, posicion)
+	posicion += CONTADOR.size
+	bloques: List[Bloque] = []
+	for _ in range(numero_bloques):
+		bloques.append(Bloque(*REGISTRO_BLOQUE.unpack_from(datos, posicion)))
+		posicion += REGISTRO_BLOQUE.size
+
+	numero_entradas, = CONTADOR.unpack_from(datos, posicion)
+	posicion += CONTADOR.size
+	entradas: List[Entrada] = []
+	for _ in range(numero_entradas):
+		inicio, longitud, longitud_metadatos = REGISTRO_ENTRADA_V1.unpack_from(datos, posicion)
+		posicion += REGISTRO_ENTRADA_V1.size
+		metadatos: Dict[str, Any] = metadatos_desde_bytes(datos=datos[posicion:posicion + longitud_metadatos])
+		posicion += longitud_metadatos
+		entradas.append(Entrada(inicio=inicio, longitud=longitud, metadatos=metadatos))
+	return bloques, entradas
@@ -0,0 +1,166 @@
+import numpy as np
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Hashable, NamedTuple, Tuple
+
+# Codificación de una imagen como diferencia (XOR) con otra del mismo contenedor.
+#
+# Las páginas de un cómic, los fotogramas de una animación o una serie de capturas son imágenes
+# seguidas del mismo modo y tamaño que solo cambian en zonas pequeñas. Guardadas como XOR con una
+# imagen anterior parecida, casi todos sus bytes son cero y se comprimen casi gratis.
+#
+# El XOR se hace sobre el rawdata tal como se guarda (ya reducido o transformado, si es el caso),
+# y la referencia se identifica por su tramo del flujo lógico, que nunca cambia (tampoco al anexar).
+# Si la referencia es a su vez un delta, su descripción va anidada en "base", así que la cadena se
+# resuelve sin consultar el índice. La profundidad de las cadenas está acotada: leer una imagen
+# suelta nunca obliga a leer más de PROFUNDIDAD_MAXIMA imágenes más.
+
+# Profundidad máxima de una cadena de referencias
+PROFUNDIDAD_MAXIMA: int = 4
+
+# Imágenes anteriores de cada modo y tamaño entre las que se elige la referencia
+CANDIDATOS: int = 4
+
+# Rawdata de candidatos que se guarda en memoria al empaquetar, sumando todos los modos y tamaños;
+# al superarlo se olvidan los candidatos de los modos y tamaños usados hace más tiempo
+BYTES_CANDIDATOS: int = 256 << 20
+
+# Proporción mínima de bytes iguales (ceros en el XOR) para guardar una imagen como delta
+PROPORCION_MINIMA: float = 0.5
+
+# Rawdata de referencias que se recuerdan al leer (ver Referencias)
+TRAMOS_RECORDADOS: int = 8
+
+
+def xor(datos: bytes, referencia: bytes) -> bytes:
+	"""El XOR byte a byte de dos rawdata de la misma longitud (es su propia inversa)."""
+	return np.bitwise_xor(np.frombuffer(datos, dtype=np.uint8), np.frombuffer(referencia, dtype=np.uint8)).tobytes()
+
+def profundidad(delta: Dict[str, Any] | None) -> int:
+	"""Cuántas referencias hay que leer para resolver un delta (0 si la imagen no es un delta)."""
+	niveles: int = 0
+	while delta is not None:
+		niveles += 1
+		delta = delta.get("base")
+	return niveles
+
+
+class Candidato(NamedTuple):
+	"""Una imagen ya guardada que puede servir de referencia."""
+	pixeles: np.ndarray
+	inicio: int
+	delta: Dict[str, Any] | None
+
+
+class SelectorDeReferencias:
+	"""
+	Elige, al empaquetar, la referencia de cada imagen entre las últimas guardadas del mismo modo y tamaño.
+
+	Guarda como mucho CANDIDATOS imágenes por modo y tamaño y BYTES_CANDIDATOS de rawdata en total: en
+	una galería de tamaños muy variados, casi cada imagen tendría su propio modo y tamaño y su rawdata
+	seguiría en memoria hasta el final del empaquetado.
+	"""
+
+	def __init__(self) -> None:
+		self.candidatos: OrderedDict[Hashable, Deque[Candidato]] = OrderedDict()
+		self.bytes_candidatos: int = 0
+		self.deltas: int = 0
+		self.bytes_iguales: int = 0
+
+	def codificar(self, datos: bytes, clave: Hashable) -> Tuple[bytes, Dict[str, Any] | None]:
+		"""
+		Codifica una imagen como XOR con el candidato que más bytes comparte con ella.
+
+		Args:
+			datos (bytes): El rawdata que se va a guardar.
+			clave (Hashable): Identifica las imágenes comparables (modo, tamaño y longitud del rawdata).
+
+		Returns:
+			Tuple[bytes, Dict[str, Any] | None]: Lo que hay que guardar y la descripción del delta, o el rawdata
+				tal cual y None si ningún candidato comparte al menos PROPORCION_MINIMA de los bytes.
+		"""
+		actual: np.ndarray = np.frombuffer(datos, dtype=np.uint8)
+		mejor: Tuple[Candidato, np.ndarray] | None = None
+		iguales_mejor: int = int(len(actual) * PROPORCION_MINIMA)
+		for candidato in self.candidatos.get(clave, ()):
+			if profundidad(delta=candidato.delta) >= PROFUNDIDAD_MAXIMA:
+				continue
+			diferencia: np.ndarray = np.bitwise_xor(actual, candidato.pixeles)
+			iguales: int = len(diferencia) - int(np.count_nonzero(diferencia))
+			if iguales > iguales_mejor:
+				mejor, iguales_mejor = (candidato, diferencia), iguales
+		if mejor is None:
+			return datos, None
+
+		candidato, diferencia = mejor
+		delta: Dict[str, Any] = {"start": candidato.inicio, "length": len(actual)}
+		if candidato.delta is not None:
+			delta["base"] = candidato.delta
+		self.deltas += 1
+		self.bytes_iguales += iguales_mejor
+		return diferencia.tobytes(), delta
+
+	def recordar(self, datos: bytes, clave: Hashable, inicio: int, delta: Dict[str, Any] | None) -> None:
+		"""Anota una imagen recién guardada (su rawdata antes del XOR y dónde empieza) como posible referencia."""
+		if len(datos) > BYTES_CANDIDATOS:
+			return
+		candidatos: Deque[Candidato] = self.candidatos.setdefault(clave, deque())
+		self.candidatos.move_to_end(clave)
+		if len(candidatos) == CANDIDATOS:
+			self.bytes_candidatos -= len(candidatos.popleft().pixeles)
+		candidatos.append(Candidato(pixeles=np.frombuffer(datos, dtype=np.uint8), inicio=inicio, delta=delta))
+		self.bytes_candidatos += len(datos)
+
+		# Se olvidan primero los candidatos más antiguos del modo y tamaño usado hace más tiempo
+		while self.bytes_candidatos > BYTES_CANDIDATOS:
+			clave_antigua, antiguos = next(iter(self.candidatos.items()))
+			self.bytes_candidatos -= len(antiguos.popleft().pixeles)
+			if not antiguos:
+				del self.candidatos[clave_antigua]
+
+	def informar(self) -> None:
+		"""Muestra cuántas imágenes se guardaron como delta."""
+		if self.deltas:
+			print(f"Deltas: {self.deltas} imágenes guardadas como XOR con otra ({self.bytes_iguales / 2**20:.1f} MB de bytes iguales)")
+
+
+class Referencias:
+	"""
+	Resuelve, al leer, los deltas de un contenedor.
+
+	Recuerda el rawdata guardado (ya sin XOR) de las últimas imágenes leídas por su tramo: al recorrer
+	el contenedor en orden, la referencia de un delta suele ser una imagen recién leída y no hay que
+	volver a descomprimirla.
+	"""
+
+	def __init__(self, leer_tramo: Callable[[int, int], bytes]) -> None:
+		self.leer_tramo: Callable[[int, int], bytes] = leer_tramo
+		self.recordados: OrderedDict[Tuple[int, int], bytes] = OrderedDict()
+
+	def resolver(self, datos: bytes, delta: Dict[str, Any] | None, inicio: int, longitud: int) -> bytes:
+		"""
+		Deshace el delta de una imagen, si lo tiene, y recuerda el resultado por su tramo.
+
+		Args:
+			datos (bytes): Lo guardado en el tramo de la imagen.
+			delta (Dict[str, Any] | None): La descripción del delta, o None si la imagen no es un delta.
+			inicio (int): Dónde empieza el tramo en el flujo lógico.
+			longitud (int): La longitud del tramo.
+
+		Returns:
+			bytes: El rawdata guardado de la imagen (reducido o transformado, si se guardó así).
+		"""
+		if delta is not None:
+			datos = xor(datos=datos, referencia=self._referencia(delta=delta))
+		self.recordados[(inicio, longitud)] = datos
+		self.recordados.move_to_end((inicio, longitud))
+		while len(self.recordados) > TRAMOS_RECORDADOS:
+			self.recordados.popitem(last=False)
+		return datos
+
+	def _referencia(self, delta: Dict[str, Any]) -> bytes:
+		"""El rawdata guardado de la referencia de un delta, resolviendo su propia cadena si hace falta."""
+		tramo: Tuple[int, int] = (delta["start"], delta["length"])
+		if tramo in self.recordados:
+			self.recordados.move_to_end(tramo)
+			return self.recordados[tramo]
+		return self.resolver(datos=self.leer_tramo(*tramo), delta=delta.get("base"), inicio=tramo[0], longitud=tramo[1])
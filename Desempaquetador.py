@@ -1,11 +1,31 @@
-import argparse, json, os, subprocess, filedate
+import argparse, hashlib, json, lzma, os, shutil, struct, subprocess, time, zlib, filedate
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from PIL import Image
-from datetime import datetime
+from PIL import ExifTags, Image, TiffImagePlugin
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
 
-def reconstruir_imagen(elemento: dict) -> None:
+from Animaciones import escribir_apng, recomponer
+from Contenedor import LectorCGB, RegistroEntrada, decodificar_valor_json, es_cgb_nativo
+from Franjas import TIPOS_PNG, bytes_por_fila, chunk_png, es_grande, escribir_png_en_franjas, leer_en_trozos
+from Instrumentacion import Etapas, Instrumentacion
+
+# Ruta al ejecutable de 7-Zip
+RUTA_7Z = Path("C:/Program Files/7-Zip/7z.exe")
+
+# Lector del contenedor abierto en cada proceso reconstructor (ver _abrir_lector)
+_lector: LectorCGB | None = None
+
+def reconstruir_imagen(elemento: dict, rawdata: bytes | Iterable[bytes] | None = None, hilos_oxipng: int = 1, etapas: Etapas | None = None) -> Etapas:
     '''
-    Función en proceso, fallan los metadatos
+    Reconstruye una imagen a partir de su rawdata y sus propiedades.
+
+    Si se recibe rawdata se usa directamente; si no, se lee (y elimina) el archivo RAW del elemento.
+    El rawdata puede llegar por trozos: las imágenes grandes (ver se_reconstruye_en_franjas) se
+    escriben a medida que llegan, sin tenerlas enteras en memoria.
+    hilos_oxipng indica cuántos hilos puede usar oxipng para esta imagen.
+    Devuelve las etapas medidas (leer, invertir, ampliar, codificar, oxipng, metadatos), añadidas a `etapas` si se indica.
     '''
     # Obtener los datos del elemento
     nombre_archivo: Path = elemento["name"]
@@ -15,47 +35,211 @@ def reconstruir_imagen(elemento: dict) -> None:
     creado: float = elemento["properties"]["created"]
     modificado: float = elemento["properties"]["modified"]
     metadata = elemento["properties"]["metadata"]
+    etapas = Etapas(nombre=Path(nombre_archivo).name) if etapas is None else etapas
     
-    # Abrir el archivo RAW y asignar los datos a la imagen
-    with open(file=ruta_raw, mode="rb") as f:
-        rawdata: bytes = f.read()
+    # Abrir el archivo RAW (se elimina al terminar)
+    eliminar_raw: bool = rawdata is None
+    if eliminar_raw:
+        rawdata = leer_en_trozos(ruta=ruta_raw)
+
+    if se_reconstruye_en_franjas(elemento=elemento):
+        # Imagen grande: las filas pasan al codificador PNG a medida que llegan. oxipng no se usa
+        # porque cargaría la imagen entera en memoria
+        # El tiempo de leer o descomprimir los trozos queda dentro de codificar
+        trozos: Iterable[bytes] = [rawdata] if isinstance(rawdata, bytes) else rawdata
+        with etapas.medir(etapa="codificar", procesados=bytes_por_fila(modo=modo, ancho=dimensiones[0]) * dimensiones[1]):
+            escribir_png_en_franjas(ruta=nombre_archivo, modo=modo, tamaño=dimensiones, trozos=trozos, chunks=chunks_de_metadatos(elemento=elemento))
+        if eliminar_raw:
+            os.remove(path=ruta_raw)
+        with etapas.medir(etapa="metadatos"):
+            establecer_fechas(ruta=nombre_archivo, creado=creado, modificado=modificado)
+        return etapas
+
+    if not isinstance(rawdata, bytes):
+        inicio: float = time.perf_counter()
+        rawdata = b"".join(rawdata)
+        etapas.anotar(etapa="leer", segundos=time.perf_counter() - inicio, procesados=len(rawdata))
+    if eliminar_raw:
+        os.remove(path=ruta_raw)
     
+    # Deshacer la transformación y la reducción de modo aplicadas al empaquetar, si las hubo
+    rawdata = restaurar_rawdata(elemento=elemento, rawdata=rawdata, etapas=etapas)
+
+    if "animation" in elemento:
+        # PNG animado: cada fotograma se escribe a partir de su recorte, sin componer los lienzos
+        with etapas.medir(etapa="codificar", procesados=len(rawdata)):
+            escribir_apng(ruta=nombre_archivo, modo=modo, tamaño=dimensiones, animacion=elemento["animation"], rawdata=rawdata, chunks=chunks_de_metadatos(elemento=elemento))
+        with etapas.medir(etapa="metadatos"):
+            establecer_fechas(ruta=nombre_archivo, creado=creado, modificado=modificado)
+        return etapas
+
     # Crear una nueva imagen con los datos RAW
+    inicio = time.perf_counter()
     img: Image.Image = Image.frombytes(mode=modo, size=dimensiones, data=rawdata)
 
-    # Eliminar el archivo RAW
-    os.remove(path=ruta_raw)
-    
-    # Guardar la imagen reconstruida
-    img.save(fp=nombre_archivo)
+    if nombre_archivo.suffix.lower() == ".png":
+        # Los píxeles se codifican una sola vez (con compresión rápida, oxipng hace el trabajo fino)
+        # y los metadatos se insertan después como chunks en el PNG ya optimizado
+        img.save(fp=nombre_archivo, compress_level=1)
+        etapas.anotar(etapa="codificar", segundos=time.perf_counter() - inicio, procesados=len(rawdata))
+        with etapas.medir(etapa="oxipng", procesados=len(rawdata)):
+            subprocess.run(args=["oxipng", "-t", str(hilos_oxipng), "-o", "max", nombre_archivo])
+        with etapas.medir(etapa="metadatos"):
+            insertar_chunks_png(ruta=nombre_archivo, chunks=chunks_de_metadatos(elemento=elemento))
+    else:
+        # Otros formatos: Pillow escribe los metadatos en la misma y única codificación
+        opciones: dict[str, Any] = {}
+        exif_bytes: bytes = exif_original(metadata=metadata)
+        if exif_bytes:
+            opciones["exif"] = b"Exif\x00\x00" + exif_bytes
+        if isinstance(metadata.get("icc_profile"), bytes):
+            opciones["icc_profile"] = metadata["icc_profile"]
+        if "dpi" in metadata:
+            opciones["dpi"] = tuple(metadata["dpi"])
+        img.save(fp=nombre_archivo, **opciones)
+        etapas.anotar(etapa="codificar", segundos=time.perf_counter() - inicio, procesados=len(rawdata))
+
+    with etapas.medir(etapa="metadatos"):
+        establecer_fechas(ruta=nombre_archivo, creado=creado, modificado=modificado)
+    return etapas
+
+def guarda_rawdata_original(elemento: dict) -> bool:
+    """Indica si el rawdata guardado de una imagen es el de Pillow tal cual: sin transformación, reducción de modo ni delta, y no es una animación."""
+    return "transform" not in elemento and "reduction" not in elemento and "delta" not in elemento and "animation" not in elemento
 
+def restaurar_rawdata(elemento: dict, rawdata: bytes, etapas: Etapas) -> bytes:
+    """
+    Deshace la transformación y la reducción de modo aplicadas al empaquetar, si las hubo.
 
-    # Optimizar imagen
-    subprocess.run(args=["oxipng", "-t", "1", "-o", "max", nombre_archivo])
+    La transformación se aplicó al rawdata ya reducido, así que se deshace primero y en el modo reducido.
+    Las etapas reciben el tiempo de invertir y de ampliar.
+    """
+    modo: str = elemento["mode"]
+    dimensiones = tuple(elemento["properties"]["size"])
+    if "transform" in elemento:
+        from Transformaciones import invertir
+        modo_transformado: str = modo
+        if "reduction" in elemento:
+            from Reducciones import modo_guardado
+            modo_transformado = modo_guardado(reduccion=elemento["reduction"])
+        with etapas.medir(etapa="invertir", procesados=len(rawdata)):
+            rawdata = invertir(datos=rawdata, modo=modo_transformado, tamaño=dimensiones, transformacion=elemento["transform"])
+    if "reduction" in elemento:
+        from Reducciones import ampliar
+        with etapas.medir(etapa="ampliar", procesados=len(rawdata)):
+            rawdata = ampliar(datos=rawdata, modo=modo, tamaño=dimensiones, reduccion=elemento["reduction"])
+    return rawdata
 
-    # Agregar metadatos EXIF si están disponibles
-    if "exif" in metadata:
-        exif_data: dict[str, any] = metadata["exif"]
-        exif_bytes: bytes = json.dumps(obj=exif_data).encode(encoding='utf-8')  # Convertir el diccionario a bytes
-        img.save(fp=nombre_archivo, exif=exif_bytes)
+def se_reconstruye_en_franjas(elemento: dict) -> bool:
+    """
+    Indica si una imagen se reconstruye por franjas: PNG grande, con el rawdata original y de un modo que se escribe por franjas.
 
-        # Agregar metadatos XMP si están disponibles
-    if "XML:com.adobe.xmp" in elemento["properties"]["metadata"]:
-        xmp_data = elemento["properties"]["metadata"]["XML:com.adobe.xmp"]
-        xmp_bytes = xmp_data.encode('utf-8')  # Convertir la cadena a bytes
-        with open(file=nombre_archivo, mode="rb+") as img_file:
-            img_file.seek(0, os.SEEK_END)
-            img_file.write(xmp_bytes)
+    Las imágenes grandes de otros formatos se reconstruyen en memoria, porque Pillow necesita la imagen entera para codificarlas.
+    """
+    return (Path(elemento["name"]).suffix.lower() == ".png" and guarda_rawdata_original(elemento=elemento) and elemento["mode"] in TIPOS_PNG
+            and es_grande(modo=elemento["mode"], tamaño=tuple(elemento["properties"]["size"])))
 
+def establecer_fechas(ruta: Path, creado: float, modificado: float) -> None:
+    """Restaura las fechas de creación y modificación de una imagen reconstruida."""
     # Establecer la fecha de modificación del archivo
     fecha_modificacion: datetime = datetime.fromtimestamp(timestamp=modificado)
-    file_obj = filedate.File(nombre_archivo)
+    file_obj = filedate.File(ruta)
     file_obj.modified = fecha_modificacion
 
     # Establecer la fecha de creación del archivo
     fecha_creacion: datetime = datetime.fromtimestamp(timestamp=creado)
     file_obj.created = fecha_creacion
 
+def exif_original(metadata: dict) -> bytes:
+    """
+    Devuelve el EXIF de la imagen original en formato TIFF.
+
+    Los archivos recientes guardan el EXIF original en "exif_raw"; en los antiguos solo está el
+    diccionario decodificado, del que se reconstruye lo posible.
+    """
+    exif_bytes: bytes = metadata.get("exif_raw", b"")
+    if exif_bytes:
+        # El EXIF de los JPEG lleva la cabecera de APP1 delante del TIFF
+        return exif_bytes[6:] if exif_bytes.startswith(b"Exif\x00\x00") else exif_bytes
+
+    exif_data: dict = metadata.get("exif") or {}
+    if not exif_data:
+        return b""
+    etiquetas: dict[str, int] = {nombre: etiqueta for etiqueta, nombre in ExifTags.TAGS.items()}
+    exif = Image.Exif()
+    for nombre, valor in exif_data.items():
+        etiqueta: int | None = etiquetas.get(nombre)
+        if etiqueta is None or isinstance(valor, (dict, list)):
+            continue
+        # Los racionales se guardaron como "numerador/denominador"
+        if isinstance(valor, str) and valor.count("/") == 1 and valor.replace("/", "").isdigit():
+            numerador, denominador = valor.split("/")
+            valor = TiffImagePlugin.IFDRational(int(numerador), int(denominador))
+        exif[etiqueta] = valor
+    try:
+        return exif.tobytes()[6:]
+    except Exception:
+        return b""
+
+def chunks_de_metadatos(elemento: dict) -> list[bytes]:
+    """
+    Construye los chunks PNG de metadatos de una imagen: iCCP, pHYs, eXIf, iTXt (XMP) y tIME.
+
+    Args:
+        elemento (dict): Las propiedades de la imagen.
+
+    Returns:
+        list[bytes]: Los chunks, en un orden válido para insertarlos justo después de IHDR.
+    """
+    metadata: dict = elemento["properties"]["metadata"]
+    chunks: list[bytes] = []
+
+    # Perfil de color (debe ir antes de PLTE e IDAT)
+    perfil: bytes | None = metadata.get("icc_profile")
+    if isinstance(perfil, bytes) and perfil:
+        chunks.append(chunk_png(tipo=b"iCCP", datos=b"ICC Profile\x00\x00" + zlib.compress(perfil, 9)))
+
+    # Resolución, en píxeles por metro
+    if "dpi" in metadata:
+        dpi_x, dpi_y = metadata["dpi"]
+        chunks.append(chunk_png(tipo=b"pHYs", datos=struct.pack(">IIB", round(float(dpi_x) / 0.0254), round(float(dpi_y) / 0.0254), 1)))
+
+    # EXIF
+    exif_bytes: bytes = exif_original(metadata=metadata)
+    if exif_bytes:
+        chunks.append(chunk_png(tipo=b"eXIf", datos=exif_bytes))
+
+    # XMP (PNG lo guarda como texto, JPEG como bytes)
+    xmp: str | bytes | None = metadata.get("XML:com.adobe.xmp") or metadata.get("xmp")
+    if xmp:
+        xmp_bytes: bytes = xmp.encode(encoding="utf-8") if isinstance(xmp, str) else xmp
+        chunks.append(chunk_png(tipo=b"iTXt", datos=b"XML:com.adobe.xmp\x00\x00\x00\x00\x00" + xmp_bytes))
+
+    # Fecha de la última modificación, en UTC
+    fecha: datetime = datetime.fromtimestamp(elemento["properties"]["modified"], tz=timezone.utc)
+    chunks.append(chunk_png(tipo=b"tIME", datos=struct.pack(">HBBBBB", fecha.year, fecha.month, fecha.day, fecha.hour, fecha.minute, fecha.second)))
+
+    return chunks
+
+def insertar_chunks_png(ruta: Path, chunks: list[bytes]) -> None:
+    """
+    Inserta chunks justo después de IHDR en un PNG, sin volver a codificar los píxeles.
+
+    El resto del archivo se copia por trozos, así que no se carga entero en memoria.
+    """
+    if not chunks:
+        return
+    ruta_temporal: Path = ruta.with_name(ruta.name + ".tmp")
+    with open(file=ruta, mode="rb") as origen, open(file=ruta_temporal, mode="wb") as destino:
+        # Firma (8 bytes) + IHDR (longitud, tipo, 13 bytes de datos y CRC)
+        cabecera: bytes = origen.read(8 + 4 + 4 + 13 + 4)
+        if cabecera[12:16] != b"IHDR":
+            raise ValueError(f"{ruta} no es un PNG válido")
+        destino.write(cabecera)
+        destino.write(b"".join(chunks))
+        shutil.copyfileobj(origen, destino)
+    os.replace(ruta_temporal, ruta)
+
 def cargar_datos_desde_json(archivo_json: Path) -> dict:
     """
     Carga los datos de un archivo JSON y los devuelve como un diccionario.
@@ -67,26 +251,26 @@ def cargar_datos_desde_json(archivo_json: Path) -> dict:
         dict: Los datos del archivo JSON como un diccionario.
     """
     with open(archivo_json, 'r') as f:
-        datos = json.load(f)
+        datos = json.load(f, object_hook=decodificar_valor_json)
     return datos
 
-def extraer_con_7z(archivo_comprimido: Path) -> None:
+def extraer_con_7z(archivo_comprimido: Path, elementos: list[str] | None = None, carpeta_destino: Path | None = None) -> None:
     """
     Extrae los archivos de un archivo comprimido utilizando 7-Zip.
 
     Args:
         archivo_comprimido (Path): Ruta al archivo comprimido.
+        elementos (list[str] | None): Nombres de las entradas a extraer; si es None se extraen todas.
+        carpeta_destino (Path | None): Carpeta de destino; por defecto, la del nombre del archivo.
     """
-    # Ruta al ejecutable de 7-Zip
-    ruta_7z = Path("C:/Program Files/7-Zip/7z.exe")
-
     # Carpeta de destino para la extracción
-    carpeta_destino: Path = archivo_comprimido.parent / archivo_comprimido.stem
-    carpeta_destino: Path = carpeta_destino.parent / carpeta_destino.stem
+    if carpeta_destino is None:
+        carpeta_destino = archivo_comprimido.parent / archivo_comprimido.stem
+        carpeta_destino = carpeta_destino.parent / carpeta_destino.stem
 
     # Parámetros para la extracción
     parametros: list[str] = [
-        ruta_7z,
+        RUTA_7Z,
         "x",                            # Comando para extraer archivos
         str(archivo_comprimido), # Ruta al archivo comprimido
         f"-o{carpeta_destino}",         # Carpeta de destino para la extracción
@@ -94,9 +278,232 @@ def extraer_con_7z(archivo_comprimido: Path) -> None:
         "-y",                           # Aceptar todo sin preguntar
     ]
 
+    # Limitar la extracción a las entradas indicadas
+    if elementos:
+        parametros.extend(elementos)
+
     # Ejecutar el comando de 7-Zip para extraer los archivos
     subprocess.run(args=parametros, stdout=subprocess.DEVNULL)
 
+def abrir_flujo_7z(archivo_comprimido: Path, elemento: str) -> subprocess.Popen:
+    """
+    Abre una entrada de un archivo comprimido como un flujo, sin escribirla en disco.
+
+    Args:
+        archivo_comprimido (Path): Ruta al archivo comprimido.
+        elemento (str): Nombre de la entrada a leer.
+
+    Returns:
+        subprocess.Popen: El proceso de 7-Zip, cuya salida estándar entrega el contenido de la entrada.
+    """
+    parametros: list[str] = [
+        RUTA_7Z,
+        "e",                            # Comando para extraer sin rutas
+        str(archivo_comprimido), # Ruta al archivo comprimido
+        "-so",                          # Escribir el contenido en la salida estándar
+        elemento,                       # Entrada a extraer
+    ]
+    return subprocess.Popen(args=parametros, stdout=subprocess.PIPE)
+
+def iterar_flujo_7z(flujo: BinaryIO, elementos: list[dict], indices: list[int]) -> Iterator[tuple[int, bytes]]:
+    """
+    Lee del flujo de un archivo empaquetado en flujo el rawdata de las entradas indicadas.
+
+    El flujo se recorre una sola vez en orden de offset, descartando lo que no se pidió. Las entradas
+    deduplicadas comparten offset, así que quedan seguidas y reutilizan el rawdata ya leído.
+
+    Args:
+        flujo (BinaryIO): La salida estándar de abrir_flujo_7z.
+        elementos (list[dict]): Las propiedades de todas las imágenes del archivo.
+        indices (list[int]): Los índices de las entradas a leer.
+
+    Yields:
+        tuple[int, bytes]: El índice de cada entrada y su rawdata.
+    """
+    posicion: int = 0
+    offset_anterior: int | None = None
+    rawdata: bytes = b""
+    for indice in sorted(set(indices), key=lambda i: elementos[i]["offset"]):
+        elemento: dict = elementos[indice]
+        if elemento["offset"] != offset_anterior:
+            # Descartar lo que precede al rawdata pedido
+            while posicion < elemento["offset"]:
+                posicion += len(flujo.read(min(elemento["offset"] - posicion, 1 << 20)))
+            rawdata = flujo.read(elemento["length"])
+            posicion += len(rawdata)
+            offset_anterior = elemento["offset"]
+        yield indice, rawdata
+
+def reconstruir_desde_raws(elementos: list[dict], indices: list[int], carpeta: Path, instrumentacion: Instrumentacion | None = None) -> list[Path]:
+    """
+    Reconstruye imágenes a partir de archivos N.raw ya extraídos.
+
+    Un mismo archivo RAW puede estar compartido por varias imágenes (deduplicación); solo se
+    elimina después de su último uso.
+
+    Args:
+        elementos (list[dict]): Las propiedades de todas las imágenes del archivo.
+        indices (list[int]): Los índices de las entradas a reconstruir.
+        carpeta (Path): La carpeta donde están los RAW y donde se reconstruyen las imágenes.
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+
+    Returns:
+        list[Path]: Las rutas de las imágenes reconstruidas.
+    """
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+    rutas: list[Path] = []
+    usos: Counter = Counter(elementos[indice]["raw"] for indice in indices)
+    for numero, indice in enumerate(iterable=indices):
+        elemento: dict = elementos[indice]
+        nombre_raw: str = elemento["raw"]
+        elemento["name"] = carpeta / elemento["name"]
+        elemento["raw"] = carpeta / nombre_raw
+        usos[nombre_raw] -= 1
+        if usos[nombre_raw] > 0:
+            # Aún hay imágenes que usan este RAW: leerlo sin eliminarlo
+            etapas: Etapas = reconstruir_imagen(elemento=elemento, rawdata=leer_en_trozos(ruta=elemento["raw"]))
+        else:
+            etapas = reconstruir_imagen(elemento=elemento)
+        instrumentacion.imagen(etapas=etapas)
+        instrumentacion.progreso(actual=numero + 1, total=len(indices), accion="Procesando archivo")
+        rutas.append(elemento["name"])
+    return rutas
+
+def repartir_nucleos(nucleos: int, imagenes: int) -> tuple[int, int]:
+    """
+    Reparte un presupuesto de núcleos entre imágenes reconstruidas a la vez e hilos de oxipng por imagen.
+
+    Args:
+        nucleos (int): Núcleos disponibles en total.
+        imagenes (int): Imágenes que quedan por reconstruir.
+
+    Returns:
+        tuple[int, int]: Número de imágenes simultáneas e hilos de oxipng para cada una.
+    """
+    simultaneas: int = max(1, min(nucleos, imagenes))
+    return simultaneas, max(1, nucleos // simultaneas)
+
+def reconstruir_en_paralelo(tareas: list[tuple[int, Callable, tuple]], trabajadores: int, inicializador: Callable | None = None, argumentos_inicializador: tuple = (),
+                            instrumentacion: Instrumentacion | None = None, total: int | None = None) -> None:
+    """
+    Ejecuta reconstrucciones en un grupo de procesos, de la más grande a la más pequeña.
+
+    Empezar por las imágenes grandes evita que una de ellas quede sola al final alargando el tiempo
+    total. Los hilos de oxipng de cada tarea se calculan con las tareas que quedan cuando empieza, así
+    que las últimas (cuando ya no hay imágenes para todos los núcleos) reciben más hilos.
+
+    Args:
+        tareas (list[tuple[int, Callable, tuple]]): Peso (bytes de rawdata), función y argumentos de cada tarea.
+            La función recibe además el número de hilos de oxipng como último argumento y devuelve
+            las etapas de las imágenes que reconstruyó.
+        trabajadores (int): Presupuesto total de núcleos (0 = todos).
+        inicializador (Callable | None): Función que prepara cada proceso.
+        argumentos_inicializador (tuple): Argumentos del inicializador.
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+        total (int | None): Número de imágenes de todas las tareas, para el progreso; por defecto, el de tareas.
+    """
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+    nucleos: int = trabajadores or os.cpu_count() or 1
+    tareas = sorted(tareas, key=lambda tarea: tarea[0], reverse=True)
+    simultaneas, _ = repartir_nucleos(nucleos=nucleos, imagenes=len(tareas))
+
+    with ProcessPoolExecutor(max_workers=simultaneas, initializer=inicializador, initargs=argumentos_inicializador) as ejecutor:
+        futuros: list[Future] = []
+        for numero, (_, funcion, argumentos) in enumerate(iterable=tareas):
+            _, hilos = repartir_nucleos(nucleos=nucleos, imagenes=len(tareas) - numero)
+            futuros.append(ejecutor.submit(funcion, *argumentos, hilos))
+        terminadas: int = 0
+        for futuro in as_completed(futuros):
+            for etapas in futuro.result():
+                instrumentacion.imagen(etapas=etapas)
+                terminadas += 1
+                instrumentacion.progreso(actual=terminadas, total=total or len(tareas), accion="Procesando archivo")
+
+def _abrir_lector(ruta: Path) -> None:
+    """Abre el contenedor una vez por proceso reconstructor."""
+    global _lector
+    _lector = LectorCGB(ruta=ruta)
+
+def resolver_deltas(lector: LectorCGB, elementos: dict[int, dict], leidas: Iterator[tuple[list[int], bytes]]) -> Iterator[tuple[list[int], bytes]]:
+    """
+    Deshace los deltas (ver Deltas.py) del rawdata leído con LectorCGB.iterar_varias.
+
+    Las referencias que no se acaban de leer se leen del contenedor por su tramo. Si ninguna de las
+    entradas es un delta, el rawdata pasa tal cual y no hace falta NumPy.
+
+    Args:
+        lector (LectorCGB): El contenedor abierto.
+        elementos (dict[int, dict]): Las propiedades de las entradas leídas, por índice.
+        leidas (Iterator[tuple[list[int], bytes]]): Lo que entrega iterar_varias.
+
+    Yields:
+        tuple[list[int], bytes]: Los índices de cada tramo y su rawdata guardado, sin el XOR.
+    """
+    if not any("delta" in elemento for elemento in elementos.values()):
+        yield from leidas
+        return
+    from Deltas import Referencias
+    referencias = Referencias(leer_tramo=lector.leer_tramo)
+    for indices, datos in leidas:
+        entrada = lector.entradas[indices[0]]
+        yield indices, referencias.resolver(datos=datos, delta=elementos[indices[0]].get("delta"), inicio=entrada.inicio, longitud=entrada.longitud)
+
+def reconstruir_entradas_cgb(lector: LectorCGB, elementos: dict[int, dict], hilos_oxipng: int = 1) -> Iterator[tuple[int, Etapas]]:
+    """
+    Reconstruye varias entradas de un contenedor nativo.
+
+    Las entradas normales se leen juntas, descomprimiendo cada bloque una sola vez; las que se
+    reconstruyen por franjas se leen por trozos, sin tenerlas enteras en memoria. El tiempo de
+    descomprimir un rawdata compartido por varias entradas (y de deshacer su delta) se anota en la primera.
+
+    Args:
+        lector (LectorCGB): El contenedor abierto.
+        elementos (dict[int, dict]): Las propiedades de las entradas a reconstruir, por índice.
+        hilos_oxipng (int): Hilos de oxipng para cada imagen.
+
+    Yields:
+        tuple[int, Etapas]: El índice de cada entrada reconstruida y sus etapas.
+    """
+    grandes: list[int] = [indice for indice, elemento in elementos.items() if se_reconstruye_en_franjas(elemento=elemento)]
+    normales: list[int] = sorted(set(elementos) - set(grandes))
+    leidas: Iterator[tuple[list[int], bytes]] = resolver_deltas(lector=lector, elementos=elementos, leidas=lector.iterar_varias(indices=normales))
+    while True:
+        inicio: float = time.perf_counter()
+        siguiente: tuple[list[int], bytes] | None = next(leidas, None)
+        if siguiente is None:
+            break
+        indices, rawdata = siguiente
+        segundos: float = time.perf_counter() - inicio
+        for indice in indices:
+            etapas = Etapas(nombre=Path(elementos[indice]["name"]).name)
+            if indice == indices[0]:
+                etapas.anotar(etapa="descomprimir", segundos=segundos, procesados=len(rawdata))
+            yield indice, reconstruir_imagen(elemento=elementos[indice], rawdata=rawdata, hilos_oxipng=hilos_oxipng, etapas=etapas)
+    for indice in grandes:
+        yield indice, reconstruir_imagen(elemento=elementos[indice], rawdata=lector.iterar(indice=indice), hilos_oxipng=hilos_oxipng)
+
+def _reconstruir_entradas_cgb(elementos: dict[int, dict], hilos_oxipng: int) -> list[Etapas]:
+    """Reconstruye varias entradas del contenedor abierto por _abrir_lector."""
+    return [etapas for _, etapas in reconstruir_entradas_cgb(lector=_lector, elementos=elementos, hilos_oxipng=hilos_oxipng)]
+
+def _reconstruir_grupo_raw(elementos: list[dict], hilos_oxipng: int) -> list[Etapas]:
+    """Reconstruye las imágenes que comparten un archivo RAW, que se lee una vez y se elimina al final."""
+    ruta_raw: Path = elementos[0]["raw"]
+    rawdata: bytes | None = None
+    reconstruidas: list[Etapas] = []
+    for elemento in elementos:
+        etapas = Etapas(nombre=Path(elemento["name"]).name)
+        if se_reconstruye_en_franjas(elemento=elemento):
+            reconstruidas.append(reconstruir_imagen(elemento=elemento, rawdata=leer_en_trozos(ruta=ruta_raw), hilos_oxipng=hilos_oxipng, etapas=etapas))
+            continue
+        if rawdata is None:
+            with etapas.medir(etapa="leer", procesados=ruta_raw.stat().st_size):
+                with open(file=ruta_raw, mode="rb") as f:
+                    rawdata = f.read()
+        reconstruidas.append(reconstruir_imagen(elemento=elemento, rawdata=rawdata, hilos_oxipng=hilos_oxipng, etapas=etapas))
+    os.remove(path=ruta_raw)
+    return reconstruidas
+
 def validador(archivo: Path) -> bool:
     """
     Valida si el archivo especificado existe, es un archivo y tiene la extensión .cgb/CGB.
@@ -121,43 +528,526 @@ def validador(archivo: Path) -> bool:
         return False
     return True
 
-def desempaquetar(archivo: Path) -> None:
+def desempaquetar_cgb(archivo: Path, carpeta: Path, trabajadores: int = 1, instrumentacion: Instrumentacion | None = None) -> None:
+    """
+    Reconstruye las imágenes de un contenedor .cgb nativo.
+
+    Args:
+        archivo (Path): La ruta del contenedor.
+        carpeta (Path): La carpeta donde se reconstruyen las imágenes.
+        trabajadores (int): Presupuesto de núcleos para reconstruir (1 = modo serie, 0 = todos los núcleos).
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+    """
+    carpeta.mkdir(exist_ok=True)
+    inicio: float = time.perf_counter()
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+
+    with LectorCGB(ruta=archivo) as lector:
+        elementos: list[dict] = lector.metadatos()
+        for elemento in elementos:
+            elemento["name"] = carpeta / elemento["name"]
+        sin_comprimir: int = sum(entrada.longitud for entrada in lector.entradas)
+
+        if trabajadores == 1:
+            # Un recorrido del flujo lógico: cada bloque sólido se descomprime una sola vez
+            reconstruidas: Iterator[tuple[int, Etapas]] = reconstruir_entradas_cgb(lector=lector, elementos=dict(enumerate(iterable=elementos)))
+            for numero, (_, etapas) in enumerate(iterable=reconstruidas):
+                instrumentacion.imagen(etapas=etapas)
+                instrumentacion.progreso(actual=numero + 1, total=len(elementos), accion="Procesando archivo")
+        else:
+            # Una tarea por bloque con las imágenes que empiezan en él; cada proceso abre su propio
+            # lector y descomprime solo los bloques de sus imágenes
+            grupos: dict[int, dict[int, dict]] = {}
+            for indice, entrada in enumerate(iterable=lector.entradas):
+                grupos.setdefault(lector.bloque_de(posicion=entrada.inicio), {})[indice] = elementos[indice]
+            tareas: list[tuple[int, Callable, tuple]] = [(sum(lector.entradas[indice].longitud for indice in grupo), _reconstruir_entradas_cgb, (grupo,)) for grupo in grupos.values()]
+            reconstruir_en_paralelo(tareas=tareas, trabajadores=trabajadores, inicializador=_abrir_lector, argumentos_inicializador=(archivo,),
+                                    instrumentacion=instrumentacion, total=len(elementos))
+
+    # Resumen de rendimiento
+    duracion: float = time.perf_counter() - inicio
+    print(f"{sin_comprimir / 2**20:.1f} MB reconstruidos en {duracion:.1f} s ({sin_comprimir / 2**20 / max(duracion, 1e-9):.1f} MB/s)")
+
+def seleccionar_entradas(nombres: list[str], seleccion: list[str | int]) -> list[int]:
+    """
+    Convierte una selección de imágenes en índices de entrada.
+
+    Args:
+        nombres (list[str]): Los nombres de las imágenes del archivo, en orden.
+        seleccion (list[str | int]): Nombres de archivo o índices (enteros, desde 0).
+
+    Returns:
+        list[int]: Los índices de las entradas seleccionadas, en el orden pedido.
+    """
+    por_nombre: dict[str, int] = {nombre: indice for indice, nombre in enumerate(iterable=nombres)}
+    indices: list[int] = []
+    for seleccionado in seleccion:
+        if isinstance(seleccionado, int):
+            if not 0 <= seleccionado < len(nombres):
+                raise IndexError(f"El archivo solo contiene {len(nombres)} imágenes")
+            indices.append(seleccionado)
+        elif seleccionado in por_nombre:
+            indices.append(por_nombre[seleccionado])
+        else:
+            raise KeyError(f"La imagen {seleccionado} no está en el archivo")
+    return indices
+
+def extraer_imagenes(archivo: Path, seleccion: list[str | int], carpeta: Path | None = None, instrumentacion: Instrumentacion | None = None) -> list[Path]:
+    """
+    Extrae y reconstruye solo las imágenes indicadas, sin desempaquetar el archivo completo.
+
+    En un contenedor nativo solo se descomprimen los bloques que contienen cada imagen, así que el
+    tiempo depende del tamaño de las imágenes pedidas y no del tamaño del archivo.
+
+    Args:
+        archivo (Path): La ruta del archivo comprimido.
+        seleccion (list[str | int]): Nombres de archivo o índices (enteros, desde 0) de las imágenes.
+        carpeta (Path | None): Carpeta de destino; por defecto la misma que usa desempaquetar.
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+
+    Returns:
+        list[Path]: Las rutas de las imágenes reconstruidas.
+    """
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+    if carpeta is None:
+        carpeta = archivo.parent / archivo.stem
+        carpeta = carpeta.parent / carpeta.stem
+    carpeta.mkdir(exist_ok=True)
+    rutas: list[Path] = []
+
+    # Contenedor nativo: acceso aleatorio a los bloques de cada imagen; solo se decodifican los
+    # metadatos de las imágenes pedidas
+    if es_cgb_nativo(ruta=archivo):
+        with LectorCGB(ruta=archivo) as lector:
+            seleccionados: list[int] = seleccionar_entradas(nombres=lector.nombres(), seleccion=seleccion)
+            pedidos: dict[int, dict] = {}
+            for indice in seleccionados:
+                pedidos[indice] = lector.entradas[indice].metadatos
+                pedidos[indice]["name"] = carpeta / Path(pedidos[indice]["name"]).name
+            for numero, (_, etapas) in enumerate(iterable=reconstruir_entradas_cgb(lector=lector, elementos=pedidos)):
+                instrumentacion.imagen(etapas=etapas)
+                instrumentacion.progreso(actual=numero + 1, total=len(pedidos), accion="Extrayendo imagen")
+        instrumentacion.terminar()
+        return [pedidos[indice]["name"] for indice in seleccionados]
+
+    # Archivo 7z: se extrae images.json y después solo lo necesario
+    inicio: float = time.perf_counter()
+    extraer_con_7z(archivo_comprimido=archivo, elementos=["images.json"], carpeta_destino=carpeta)
+    elementos = cargar_datos_desde_json(archivo_json=carpeta / "images.json")
+    indices: list[int] = seleccionar_entradas(nombres=[elemento["name"] for elemento in elementos], seleccion=seleccion)
+
+    if elementos and "offset" in elementos[0]:
+        # Empaquetado en flujo: se recorre el flujo una vez, descartando lo que no se pidió
+        proceso = abrir_flujo_7z(archivo_comprimido=archivo, elemento=elementos[0]["raw"])
+        for numero, (indice, rawdata) in enumerate(iterable=iterar_flujo_7z(flujo=proceso.stdout, elementos=elementos, indices=indices)):
+            elemento = elementos[indice]
+            elemento["name"] = carpeta / elemento["name"]
+            instrumentacion.imagen(etapas=reconstruir_imagen(elemento=elemento, rawdata=rawdata))
+            instrumentacion.progreso(actual=numero + 1, total=len(indices), accion="Extrayendo imagen")
+            rutas.append(elemento["name"])
+        proceso.stdout.close()
+        proceso.wait()
+    else:
+        # Un archivo RAW por imagen: 7-Zip extrae solo los seleccionados
+        extraer_con_7z(archivo_comprimido=archivo, elementos=sorted({elementos[indice]["raw"] for indice in indices}), carpeta_destino=carpeta)
+        instrumentacion.etapa(etapa="7z", segundos=time.perf_counter() - inicio)
+        rutas = reconstruir_desde_raws(elementos=elementos, indices=indices, carpeta=carpeta, instrumentacion=instrumentacion)
+
+    os.remove(path=carpeta / "images.json")
+    instrumentacion.terminar()
+    return rutas
+
+def resumir_rawdata(elemento: dict, trozos: Iterable[bytes], etapas: Etapas) -> str:
+    """
+    Calcula el hash_pixel del rawdata de una imagen a medida que llega, deshaciendo antes su transformación y su reducción si las tiene (o recomponiendo los lienzos si es una animación).
+
+    Args:
+        elemento (dict): Las propiedades de la imagen.
+        trozos (Iterable[bytes]): El rawdata guardado, por trozos (puede descomprimirse mientras se recorre).
+        etapas (Etapas): Recibe el tiempo de leer (o descomprimir), invertir, ampliar y calcular el hash.
+
+    Returns:
+        str: El hash_pixel calculado, en hexadecimal.
+    """
+    resumen = hashlib.sha256()
+    if not guarda_rawdata_original(elemento=elemento):
+        # La transformación y la reducción se deshacen sobre la imagen entera
+        with etapas.medir(etapa="leer"):
+            rawdata: bytes = b"".join(trozos)
+        if "animation" in elemento:
+            # Los lienzos de una animación se recomponen de uno en uno a partir de sus recortes
+            trozos = recomponer(modo=elemento["mode"], tamaño=tuple(elemento["properties"]["size"]), animacion=elemento["animation"], rawdata=rawdata)
+        else:
+            trozos = [restaurar_rawdata(elemento=elemento, rawdata=rawdata, etapas=etapas)]
+    fuente: Iterator[bytes] = iter(trozos)
+    while True:
+        inicio: float = time.perf_counter()
+        trozo: bytes | None = next(fuente, None)
+        if trozo is None:
+            break
+        etapas.anotar(etapa="leer", segundos=time.perf_counter() - inicio, procesados=len(trozo))
+        with etapas.medir(etapa="hash", procesados=len(trozo)):
+            resumen.update(trozo)
+    return resumen.hexdigest()
+
+def comprobar_entrada(indice: int, elemento: dict, trozos: Iterable[bytes], etapas: Etapas | None = None) -> tuple[dict, Etapas]:
+    """
+    Compara el hash_pixel del rawdata guardado de una imagen con el de sus propiedades.
+
+    Args:
+        indice (int): El índice de la imagen en el archivo.
+        elemento (dict): Las propiedades de la imagen.
+        trozos (Iterable[bytes]): El rawdata guardado, por trozos.
+        etapas (Etapas | None): Si se indica, recibe los tiempos de la comprobación.
+
+    Returns:
+        tuple[dict, Etapas]: El resultado (índice, nombre, estado y detalle) y las etapas medidas. El estado
+            es "correcta", "dañada" (el rawdata no se pudo leer o su hash no coincide) o "sin_hash".
+    """
+    nombre: str = Path(elemento["name"]).name
+    etapas = Etapas(nombre=nombre) if etapas is None else etapas
+    resultado: dict = {"indice": indice, "nombre": nombre, "estado": "correcta", "detalle": ""}
+    esperado: str | None = elemento["properties"].get("hash_pixel")
+    if not esperado:
+        resultado.update(estado="sin_hash", detalle="No tiene hash_pixel con el que comparar")
+        return resultado, etapas
+    try:
+        obtenido: str = resumir_rawdata(elemento=elemento, trozos=trozos, etapas=etapas)
+    except (lzma.LZMAError, EOFError, ValueError) as error:
+        resultado.update(estado="dañada", detalle=f"No se pudo leer el rawdata: {error}")
+        return resultado, etapas
+    if obtenido != esperado:
+        resultado.update(estado="dañada", detalle=f"hash_pixel {obtenido} en lugar de {esperado}")
+    return resultado, etapas
+
+def verificar_entradas_cgb(lector: LectorCGB, indices: list[int]) -> Iterator[tuple[dict, Etapas]]:
+    """
+    Verifica varias entradas de un contenedor nativo sin escribir nada en disco.
+
+    Como al reconstruir, las entradas normales se leen juntas, descomprimiendo cada bloque una sola
+    vez, y las grandes con el rawdata original se resumen por trozos sin tenerlas enteras en memoria. Si un
+    bloque no se puede descomprimir, las entradas que faltaban por leer se dan por dañadas.
+
+    Args:
+        lector (LectorCGB): El contenedor abierto.
+        indices (list[int]): Los índices de las entradas a verificar.
+
+    Yields:
+        tuple[dict, Etapas]: El resultado de cada entrada (ver comprobar_entrada) y sus etapas.
+    """
+    elementos: dict[int, dict] = {indice: lector.entradas[indice].metadatos for indice in indices}
+    grandes: list[int] = [indice for indice, elemento in elementos.items()
+                          if guarda_rawdata_original(elemento=elemento) and es_grande(modo=elemento["mode"], tamaño=tuple(elemento["properties"]["size"]))]
+    normales: list[int] = sorted(set(elementos) - set(grandes))
+    pendientes: set[int] = set(normales)
+    leidas: Iterator[tuple[list[int], bytes]] = resolver_deltas(lector=lector, elementos=elementos, leidas=lector.iterar_varias(indices=normales))
+    while True:
+        inicio: float = time.perf_counter()
+        try:
+            siguiente: tuple[list[int], bytes] | None = next(leidas, None)
+        except (lzma.LZMAError, EOFError, ValueError) as error:
+            for indice in sorted(pendientes):
+                yield {"indice": indice, "nombre": Path(elementos[indice]["name"]).name, "estado": "dañada", "detalle": f"No se pudo descomprimir su bloque: {error}"}, Etapas(nombre=Path(elementos[indice]["name"]).name)
+            break
+        if siguiente is None:
+            break
+        grupo, rawdata = siguiente
+        segundos: float = time.perf_counter() - inicio
+        for indice in grupo:
+            etapas = Etapas(nombre=Path(elementos[indice]["name"]).name)
+            if indice == grupo[0]:
+                etapas.anotar(etapa="descomprimir", segundos=segundos, procesados=len(rawdata))
+            pendientes.discard(indice)
+            yield comprobar_entrada(indice=indice, elemento=elementos[indice], trozos=[rawdata], etapas=etapas)
+    for indice in grandes:
+        yield comprobar_entrada(indice=indice, elemento=elementos[indice], trozos=lector.iterar(indice=indice))
+
+def _verificar_entradas_cgb(indices: list[int]) -> list[tuple[dict, Etapas]]:
+    """Verifica varias entradas del contenedor abierto por _abrir_lector."""
+    return list(verificar_entradas_cgb(lector=_lector, indices=indices))
+
+def verificar_cgb(archivo: Path, trabajadores: int = 1) -> Iterator[tuple[dict, Etapas]]:
+    """
+    Verifica un contenedor nativo, en paralelo por bloques si hay varios trabajadores.
+
+    Las entradas cuyo tramo queda fuera del flujo lógico se dan por perdidas ("falta") sin leerlas.
+
+    Args:
+        archivo (Path): La ruta del contenedor.
+        trabajadores (int): Número de procesos (1 = modo serie, 0 = todos los núcleos).
+
+    Yields:
+        tuple[dict, Etapas]: El resultado de cada entrada, en el orden en que terminan, y sus etapas.
+    """
+    with LectorCGB(ruta=archivo) as lector:
+        fin_flujo: int = lector.bloques[-1].inicio + lector.bloques[-1].tamaño if lector.bloques else 0
+        indices: list[int] = []
+        for indice, entrada in enumerate(iterable=lector.entradas):
+            if entrada.inicio + entrada.longitud > fin_flujo:
+                nombre: str = entrada.registro.nombre or str(indice + 1)
+                yield {"indice": indice, "nombre": nombre, "estado": "falta", "detalle": "Su rawdata queda fuera de los bloques del contenedor"}, Etapas(nombre=nombre)
+            else:
+                indices.append(indice)
+
+        # Las entradas se agrupan por el bloque en el que empiezan: un bloque dañado solo afecta a las suyas
+        grupos: dict[int, list[int]] = {}
+        for indice in indices:
+            grupos.setdefault(lector.bloque_de(posicion=lector.entradas[indice].inicio), []).append(indice)
+        if trabajadores == 1:
+            for _, grupo in sorted(grupos.items()):
+                yield from verificar_entradas_cgb(lector=lector, indices=grupo)
+            return
+
+        # Una tarea por bloque, de la más pesada a la más ligera
+        tareas: list[list[int]] = sorted(grupos.values(), key=lambda grupo: sum(lector.entradas[indice].longitud for indice in grupo), reverse=True)
+
+    with ProcessPoolExecutor(max_workers=trabajadores or os.cpu_count() or 1, initializer=_abrir_lector, initargs=(archivo,)) as ejecutor:
+        futuros: list[Future] = [ejecutor.submit(_verificar_entradas_cgb, grupo) for grupo in tareas]
+        for futuro in as_completed(futuros):
+            yield from futuro.result()
+
+def leer_json_7z(archivo_comprimido: Path) -> list[dict]:
+    """Lee images.json de un archivo 7z por la salida estándar de 7-Zip, sin escribirlo en disco."""
+    proceso = abrir_flujo_7z(archivo_comprimido=archivo_comprimido, elemento="images.json")
+    elementos: list[dict] = json.load(proceso.stdout, object_hook=decodificar_valor_json)
+    proceso.stdout.close()
+    proceso.wait()
+    return elementos
+
+def listar_7z(archivo_comprimido: Path) -> list[tuple[str, int]]:
+    """
+    Lista las entradas de un archivo 7z en el orden en que están guardadas.
+
+    Args:
+        archivo_comprimido (Path): Ruta al archivo comprimido.
+
+    Returns:
+        list[tuple[str, int]]: El nombre y el tamaño sin comprimir de cada archivo (sin carpetas).
+    """
+    salida: str = subprocess.run(args=[RUTA_7Z, "l", "-slt", str(archivo_comprimido)], capture_output=True, text=True).stdout
+    entradas: list[tuple[str, int]] = []
+    # Las propiedades del archivo van antes de la primera línea de guiones; después, una entrada por párrafo
+    for parrafo in salida.split("----------", 1)[-1].split("\n\n"):
+        propiedades: dict[str, str] = dict(linea.split(" = ", 1) for linea in parrafo.strip().splitlines() if " = " in linea)
+        if "Path" in propiedades and propiedades.get("Folder") != "+" and not propiedades.get("Attributes", "").startswith("D"):
+            entradas.append((Path(propiedades["Path"]).name, int(propiedades.get("Size") or 0)))
+    return entradas
+
+def leer_del_flujo(flujo: BinaryIO, longitud: int) -> Iterator[bytes]:
+    """Entrega los siguientes `longitud` bytes de un flujo por trozos (menos si el flujo termina antes)."""
+    while longitud > 0:
+        trozo: bytes = flujo.read(min(longitud, 1 << 20))
+        if not trozo:
+            return
+        longitud -= len(trozo)
+        yield trozo
+
+def verificar_7z(archivo: Path, elementos: list[dict]) -> Iterator[tuple[dict, Etapas]]:
+    """
+    Verifica un archivo 7z leyendo su contenido de la salida estándar de 7-Zip, sin escribir nada en disco.
+
+    El contenido se recorre una sola vez: en los archivos empaquetados en flujo, datos.raw por sus
+    offsets; en los demás, todas las entradas en el orden en que están guardadas, resumiendo cada
+    N.raw a medida que llega. Las imágenes cuyo RAW no está en el archivo, o cuyo tramo de datos.raw
+    está incompleto, se dan por perdidas ("falta").
+
+    Args:
+        archivo (Path): La ruta del archivo comprimido.
+        elementos (list[dict]): Las propiedades de las imágenes (ver leer_json_7z).
+
+    Yields:
+        tuple[dict, Etapas]: El resultado de cada imagen (ver comprobar_entrada) y sus etapas.
+    """
+    if elementos and "offset" in elementos[0]:
+        # Empaquetado en flujo: datos.raw se recorre una vez en orden de offset
+        proceso = abrir_flujo_7z(archivo_comprimido=archivo, elemento=elementos[0]["raw"])
+        for indice, rawdata in iterar_flujo_7z(flujo=proceso.stdout, elementos=elementos, indices=list(range(len(elementos)))):
+            elemento: dict = elementos[indice]
+            if len(rawdata) < elemento["length"]:
+                yield {"indice": indice, "nombre": elemento["name"], "estado": "falta", "detalle": f"datos.raw termina {elemento['length'] - len(rawdata)} bytes antes del final de su tramo"}, Etapas(nombre=elemento["name"])
+            else:
+                yield comprobar_entrada(indice=indice, elemento=elemento, trozos=[rawdata])
+        proceso.stdout.close()
+        proceso.wait()
+        return
+
+    # Un archivo RAW por imagen (o por grupo de imágenes deduplicadas)
+    por_raw: dict[str, list[int]] = {}
+    for indice, elemento in enumerate(iterable=elementos):
+        por_raw.setdefault(elemento["raw"], []).append(indice)
+    contenido: list[tuple[str, int]] = listar_7z(archivo_comprimido=archivo)
+    proceso = subprocess.Popen(args=[RUTA_7Z, "e", str(archivo), "-so"], stdout=subprocess.PIPE)
+    for nombre_raw, tamaño in contenido:
+        indices: list[int] = por_raw.pop(nombre_raw, [])
+        trozos: Iterator[bytes] = leer_del_flujo(flujo=proceso.stdout, longitud=tamaño)
+        if len(indices) == 1 and guarda_rawdata_original(elemento=elementos[indices[0]]):
+            # Un solo uso: se resume a medida que se lee, sin tenerlo entero en memoria
+            yield comprobar_entrada(indice=indices[0], elemento=elementos[indices[0]], trozos=trozos)
+        elif indices:
+            rawdata: bytes = b"".join(trozos)
+            for indice in indices:
+                yield comprobar_entrada(indice=indice, elemento=elementos[indice], trozos=[rawdata])
+        # Descartar lo que no se haya leído (images.json o un RAW que no se pudo resumir)
+        for _ in trozos:
+            pass
+    proceso.stdout.close()
+    proceso.wait()
+
+    for nombre_raw, indices in por_raw.items():
+        for indice in indices:
+            yield {"indice": indice, "nombre": elementos[indice]["name"], "estado": "falta", "detalle": f"{nombre_raw} no está en el archivo"}, Etapas(nombre=elementos[indice]["name"])
+
+def verificar(archivo: Path, trabajadores: int = 1, instrumentacion: Instrumentacion | None = None) -> list[dict]:
+    """
+    Comprueba que un archivo comprimido (.cgb) está íntegro sin reconstruir ni escribir ninguna imagen.
+
+    El rawdata de cada imagen se descomprime en memoria y se resume a medida que llega, y el resultado
+    se compara con su hash_pixel. En el contenedor nativo se puede repartir por bloques entre varios
+    procesos; en los archivos 7z se recorre una sola vez la salida de 7-Zip.
+
+    Args:
+        archivo (Path): La ruta del archivo comprimido.
+        trabajadores (int): Procesos para el contenedor nativo (1 = modo serie, 0 = todos los núcleos).
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+
+    Returns:
+        list[dict]: El resultado de cada imagen, por índice: "indice", "nombre", "estado" ("correcta",
+            "dañada", "falta" o "sin_hash") y "detalle".
+    """
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+    if es_cgb_nativo(ruta=archivo):
+        with LectorCGB(ruta=archivo) as lector:
+            total: int = len(lector)
+        comprobadas: Iterator[tuple[dict, Etapas]] = verificar_cgb(archivo=archivo, trabajadores=trabajadores)
+    else:
+        elementos: list[dict] = leer_json_7z(archivo_comprimido=archivo)
+        total = len(elementos)
+        comprobadas = verificar_7z(archivo=archivo, elementos=elementos)
+
+    resultados: list[dict] = []
+    for resultado, etapas in comprobadas:
+        resultados.append(resultado)
+        instrumentacion.imagen(etapas=etapas)
+        instrumentacion.progreso(actual=len(resultados), total=total, accion="Verificando imagen")
+    instrumentacion.terminar()
+    return sorted(resultados, key=lambda resultado: resultado["indice"])
+
+def desempaquetar(archivo: Path, trabajadores: int = 1, instrumentacion: Instrumentacion | None = None) -> None:
     """
     Desempaqueta un archivo comprimido (.cgb) y reconstruye las imágenes.
 
     Args:
         archivo (Path): La ruta del archivo comprimido a desempaquetar.
+        trabajadores (int): Presupuesto de núcleos para reconstruir (1 = modo serie, 0 = todos los núcleos).
+        instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+            Al terminar se muestra el resumen de etapas e imágenes más lentas.
     """
     # Verificar que la ruta sea valida para ser procesada
     if not validador(archivo=archivo):
         exit()
-
-    # Extraer los archivos del archivo comprimido
-    extraer_con_7z(archivo_comprimido=archivo)
+    instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
 
     # Carpeta de trabajo
     carpeta: Path = archivo.parent / archivo.stem
     carpeta = carpeta.parent / carpeta.stem
 
+    # Contenedor nativo: el rawdata se descomprime en memoria, sin 7-Zip ni archivos intermedios
+    if es_cgb_nativo(ruta=archivo):
+        desempaquetar_cgb(archivo=archivo, carpeta=carpeta, trabajadores=trabajadores, instrumentacion=instrumentacion)
+        instrumentacion.terminar()
+        return
+
+    # Extraer primero solo images.json para saber cómo se guardó el rawdata
+    inicio: float = time.perf_counter()
+    extraer_con_7z(archivo_comprimido=archivo, elementos=["images.json"])
+
     # Cargar datos desde el archivo JSON
     archivo_json: Path = carpeta / "images.json"
     archivo_json: dict[str, any] = cargar_datos_desde_json(archivo_json=archivo_json)
 
-    # Convertir las claves "name" y "raw" a objetos Path
-    for indice, elemento in enumerate(iterable=archivo_json):
-        print(f"Procesando archivo {indice + 1} de {len(archivo_json) + 1}", end="\r")
-        elemento["name"] = carpeta / elemento["name"]
-        elemento["raw"] = carpeta / elemento["raw"]
-        reconstruir_imagen(elemento=archivo_json[indice])
+    # Archivo empaquetado en flujo: el rawdata se lee de la tubería de 7-Zip sin escribirlo en disco
+    if archivo_json and "offset" in archivo_json[0]:
+        proceso = abrir_flujo_7z(archivo_comprimido=archivo, elemento=archivo_json[0]["raw"])
+        todos: list[int] = list(range(len(archivo_json)))
+        imagenes_leidas: Iterator[tuple[int, bytes]] = iterar_flujo_7z(flujo=proceso.stdout, elementos=archivo_json, indices=todos)
+        if trabajadores == 1:
+            for numero, (indice, rawdata) in enumerate(iterable=imagenes_leidas):
+                elemento: dict = archivo_json[indice]
+                elemento["name"] = carpeta / elemento["name"]
+                instrumentacion.imagen(etapas=reconstruir_imagen(elemento=elemento, rawdata=rawdata))
+                instrumentacion.progreso(actual=numero + 1, total=len(archivo_json), accion="Procesando archivo")
+        else:
+            # El flujo se lee en orden; los reconstructores trabajan mientras se lee lo siguiente
+            simultaneas, hilos = repartir_nucleos(nucleos=trabajadores or os.cpu_count() or 1, imagenes=len(archivo_json))
+            with ProcessPoolExecutor(max_workers=simultaneas) as ejecutor:
+                pendientes: deque[Future] = deque()
+                terminadas: int = 0
+                for indice, rawdata in imagenes_leidas:
+                    elemento = archivo_json[indice]
+                    elemento["name"] = carpeta / elemento["name"]
+                    pendientes.append(ejecutor.submit(reconstruir_imagen, elemento, rawdata, hilos))
+                    # Limitar el rawdata en vuelo
+                    if len(pendientes) >= simultaneas * 2:
+                        instrumentacion.imagen(etapas=pendientes.popleft().result())
+                        terminadas += 1
+                        instrumentacion.progreso(actual=terminadas, total=len(archivo_json), accion="Procesando archivo")
+                while pendientes:
+                    instrumentacion.imagen(etapas=pendientes.popleft().result())
+                    terminadas += 1
+                    instrumentacion.progreso(actual=terminadas, total=len(archivo_json), accion="Procesando archivo")
+        proceso.stdout.close()
+        proceso.wait()
+    else:
+        # Extraer los archivos del archivo comprimido
+        extraer_con_7z(archivo_comprimido=archivo)
+        instrumentacion.etapa(etapa="7z", segundos=time.perf_counter() - inicio)
+        if trabajadores == 1:
+            reconstruir_desde_raws(elementos=archivo_json, indices=list(range(len(archivo_json))), carpeta=carpeta, instrumentacion=instrumentacion)
+        else:
+            # Una tarea por archivo RAW, con todas las imágenes que lo comparten
+            grupos: dict[str, list[dict]] = {}
+            for elemento in archivo_json:
+                nombre_raw: str = elemento["raw"]
+                elemento["name"] = carpeta / elemento["name"]
+                elemento["raw"] = carpeta / nombre_raw
+                grupos.setdefault(nombre_raw, []).append(elemento)
+            tareas: list[tuple[int, Callable, tuple]] = [((carpeta / nombre_raw).stat().st_size, _reconstruir_grupo_raw, (grupo,)) for nombre_raw, grupo in grupos.items()]
+            reconstruir_en_paralelo(tareas=tareas, trabajadores=trabajadores, instrumentacion=instrumentacion, total=len(archivo_json))
 
     # Eliminar el archivo JSON
     os.remove(path=carpeta / "images.json")
+    instrumentacion.terminar()
+
+def listar(archivo: Path) -> list[str]:
+    """
+    Describe las imágenes de un contenedor nativo leyendo solo los campos fijos de su índice.
+
+    Args:
+        archivo (Path): El contenedor .cgb nativo.
+
+    Returns:
+        list[str]: Una línea por imagen con su posición (desde 1), nombre, modo, tamaño y bytes originales.
+    """
+    with LectorCGB(ruta=archivo) as lector:
+        lineas: list[str] = []
+        for posicion, entrada in enumerate(iterable=lector.entradas, start=1):
+            registro: RegistroEntrada = entrada.registro
+            tamaño: str = f"{registro.tamaño[0]}x{registro.tamaño[1]}" if registro.tamaño else "?"
+            original: str = f"{registro.bytes} B" if registro.bytes is not None else "?"
+            lineas.append(f"{posicion:>6}  {registro.nombre}  {registro.modo or '?'}  {tamaño}  {original}")
+        return lineas
 
 if __name__ == "__main__":
     os.system(command="cls")
     # Configura el parser de argumentos
     parser = argparse.ArgumentParser(description='Script para extraer archivos de un contenedor binario y reconstruir las imágenes de el.')
     parser.add_argument('archivo', nargs='?', help='Archivo comprimido (.cgb) a procesar')
+    parser.add_argument('-t', '--trabajadores', type=int, default=1, help='Núcleos para reconstruir en paralelo, repartidos entre imágenes simultáneas e hilos de oxipng (1 = serie, 0 = todos)')
+    parser.add_argument('-e', '--extraer', nargs='+', metavar='IMAGEN', help='Extrae solo estas imágenes, por nombre o por posición (desde 1, como los N.raw)')
+    parser.add_argument('-v', '--verificar', action='store_true', help='Comprueba el hash_pixel de cada imagen descomprimiendo en memoria, sin escribir nada; termina con código 1 si alguna está dañada o falta')
+    parser.add_argument('-l', '--listar', action='store_true', help='Lista las imágenes de un contenedor nativo sin extraerlas')
+    parser.add_argument('--json', metavar='RUTA', help='Exporta el índice de un contenedor nativo a un JSON legible, para depurar')
+    parser.add_argument('--registro', help='Añade a este archivo un evento JSON por línea con el progreso y las etapas de cada imagen')
     args: argparse.Namespace = parser.parse_args()
 
     if args.archivo:
@@ -167,4 +1057,35 @@ if __name__ == "__main__":
         # Modo interactivo: pedir al usuario que ingrese la carpeta
         archivo: Path = Path(input("Ingrese el archivo a desempaquetar: "))
 
-    desempaquetar(archivo=archivo)
\ No newline at end of file
+    if args.listar or args.json:
+        # Consultas sobre el índice: no se extrae nada
+        if not es_cgb_nativo(ruta=archivo):
+            print("El listado y la exportación del índice solo están disponibles para contenedores nativos")
+            exit()
+        if args.listar:
+            print("\n".join(listar(archivo=archivo)))
+        if args.json:
+            with LectorCGB(ruta=archivo) as lector:
+                lector.exportar_json(ruta=Path(args.json))
+        exit()
+
+    instrumentacion = Instrumentacion.consola(registro=Path(args.registro) if args.registro else None)
+    if args.verificar:
+        # Verificación del archivo: no se reconstruye ni se escribe ninguna imagen
+        if not validador(archivo=archivo):
+            exit()
+        resultados: list[dict] = verificar(archivo=archivo, trabajadores=args.trabajadores, instrumentacion=instrumentacion)
+        problemas: list[dict] = [resultado for resultado in resultados if resultado["estado"] != "correcta"]
+        for problema in problemas:
+            print(f"{problema['indice'] + 1:>6}  {problema['nombre']}  {problema['estado']}: {problema['detalle']}")
+        print(f"{len(resultados) - len(problemas)} de {len(resultados)} imágenes correctas")
+        exit(1 if problemas else 0)
+    if args.extraer:
+        # Extracción de imágenes sueltas: las posiciones se indican desde 1
+        if not validador(archivo=archivo):
+            exit()
+        seleccion: list[str | int] = [int(valor) - 1 if valor.isdigit() else valor for valor in args.extraer]
+        for ruta in extraer_imagenes(archivo=archivo, seleccion=seleccion, instrumentacion=instrumentacion):
+            print(f"Extraída: {ruta}")
+    else:
+        desempaquetar(archivo=archivo, trabajadores=args.trabajadores, instrumentacion=instrumentacion)
\ No newline at end of file
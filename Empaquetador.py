@@ -1,25 +1,148 @@
-import argparse, hashlib, json, os, re, subprocess
+import argparse, hashlib, json, os, re, subprocess, time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 from PIL import ExifTags, Image
-from typing import List, Dict, Any
+from typing import Deque, Iterator, List, Dict, Any, Tuple
 
+from Animaciones import descomponer, es_animada, modo_lienzo
+from Cache import TAMAÑO_MAXIMO_CACHE, CacheDecodificacion
+from Contenedor import EscritorCGB, LectorCGB, RegistroEntrada, codificar_valor_json
+from Franjas import RawdataEnFranjas, es_grande, se_puede_leer_en_franjas, trozos
+from Instrumentacion import Etapas, Instrumentacion
+from Perfiles import MB, PERFIL_POR_DEFECTO, PERFILES, Parametros, ajustar_perfil, parametros_7z
+from Tuberia import BYTES_EN_COLA, en_segundo_plano, preleer
 
-def comprimir_con_7z(elementos: List[Path]) -> None:
+
+# Ruta al ejecutable de 7-Zip
+RUTA_7Z = Path("C:/Program Files/7-Zip/7z.exe")
+
+# Las galerías son locales y las imágenes enormes se procesan por franjas (ver Franjas.py), así que
+# no se aplica el límite de Pillow contra imágenes de descompresión maliciosa
+Image.MAX_IMAGE_PIXELS = None
+
+# Nombre de la entrada que recibe el flujo de rawdata en el modo de empaquetado en flujo
+NOMBRE_FLUJO: str = "datos.raw"
+
+# Extensiones de los archivos que se empaquetan
+EXTENSIONES_IMAGEN: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Parámetros de compresión comunes a todos los modos; el nivel, el diccionario, el bloque sólido
+# y los hilos salen del perfil de compresión (ver Perfiles.parametros_7z)
+PARAMETROS_7Z: List[str] = [
+	"-t7z",							# Formato de archivo 7z
+	"-m0=lzma2",					# Modo LZMA2
+	"-mtm=off",						# No guardar las fechas de los archivos
+	"-mta=off",						# No guardar las propiedades NTFS
+]
+
+class Deduplicador:
+	"""
+	Recuerda dónde se guardó cada rawdata, identificado por su hash_pixel, para no guardarlo dos veces.
+
+	También mide el ritmo de escritura para estimar el tiempo que ahorran los duplicados.
+	"""
+
+	def __init__(self) -> None:
+		self.ubicaciones: Dict[str, Any] = {}
+		self.duplicados: int = 0
+		self.bytes_ahorrados: int = 0
+		self.bytes_escritos: int = 0
+		self.segundos_escritura: float = 0.0
+
+	@staticmethod
+	def _clave(propiedades: Dict[str, Any]) -> str:
+		"""Identifica el contenido guardado: los mismos píxeles pueden guardarse distinto si se redujeron o se transformaron."""
+		transformacion: Dict[str, Any] = propiedades.get("transform") or {}
+		reduccion: Dict[str, Any] = propiedades.get("reduction") or {}
+		if not transformacion and not reduccion:
+			return propiedades["properties"]["hash_pixel"]
+		return f'{propiedades["properties"]["hash_pixel"]}:{propiedades["mode"]}:{tuple(propiedades["properties"]["size"])}:{transformacion.get("filtro")}:{reduccion.get("mode")}:{reduccion.get("bits")}'
+
+	def buscar(self, propiedades: Dict[str, Any], longitud: int) -> Any:
+		"""Devuelve la ubicación de un rawdata idéntico ya guardado, o None si es nuevo."""
+		ubicacion: Any = self.ubicaciones.get(self._clave(propiedades=propiedades))
+		if ubicacion is not None:
+			self.duplicados += 1
+			self.bytes_ahorrados += longitud
+		return ubicacion
+
+	def conocer(self, propiedades: Dict[str, Any], ubicacion: Any) -> None:
+		"""Anota dónde está un rawdata que ya estaba guardado antes de empezar (por ejemplo, al anexar)."""
+		self.ubicaciones.setdefault(self._clave(propiedades=propiedades), ubicacion)
+
+	def registrar(self, propiedades: Dict[str, Any], ubicacion: Any, longitud: int, segundos: float) -> None:
+		"""Anota dónde se guardó un rawdata nuevo y cuánto tardó en escribirse."""
+		self.ubicaciones[self._clave(propiedades=propiedades)] = ubicacion
+		self.bytes_escritos += longitud
+		self.segundos_escritura += segundos
+
+	def informar(self) -> None:
+		"""Muestra los bytes y el tiempo (estimado con el ritmo de escritura medido) que se ahorraron."""
+		if not self.duplicados:
+			return
+		segundos: float = self.bytes_ahorrados * self.segundos_escritura / self.bytes_escritos if self.bytes_escritos else 0.0
+		print(f"Deduplicación: {self.duplicados} imágenes repetidas, {self.bytes_ahorrados / 2**20:.1f} MB y ~{segundos:.1f} s ahorrados")
+
+class RutaImagen(type(Path())):
+	"""
+	Ruta de una imagen que recuerda el stat obtenido al escanear su carpeta.
+
+	Sustituye a Path en las listas de imágenes: stat() devuelve el resultado guardado en lugar de volver
+	a consultar el sistema de archivos, también en los procesos trabajadores, a los que viaja con la ruta.
+	Las rutas derivadas (parent, with_suffix...) no lo heredan y consultan el disco como cualquier Path.
+	"""
+
+	@classmethod
+	def con_estado(cls, ruta: str, estado: os.stat_result) -> "RutaImagen":
+		"""Crea la ruta con su stat ya leído (por ejemplo, el de os.DirEntry.stat())."""
+		ruta_imagen = cls(ruta)
+		ruta_imagen.estado = estado
+		return ruta_imagen
+
+	def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+		estado: os.stat_result | None = getattr(self, "estado", None)
+		return super().stat(follow_symlinks=follow_symlinks) if estado is None else estado
+
+	def __reduce__(self) -> Tuple[Any, ...]:
+		return (RutaImagen.con_estado, (str(self), getattr(self, "estado", None)))
+
+def fecha_creacion(estado: os.stat_result) -> float:
+	"""La fecha de creación del archivo; donde el sistema no la guarda (la mayoría de los de Linux), la del último cambio de su inodo."""
+	return getattr(estado, "st_birthtime", estado.st_ctime)
+
+def en_orden(elementos: List[Any], orden: List[int] | None) -> List[Any]:
+	"""Los elementos en el orden indicado (índices de la lista); sin orden, la lista tal cual."""
+	return elementos if orden is None else [elementos[indice] for indice in orden]
+
+def restaurar_orden(elementos: List[Any], orden: List[int] | None) -> List[Any]:
+	"""Invierte en_orden: devuelve cada elemento escrito en el orden `orden` a su posición original."""
+	if orden is None:
+		return elementos
+	restaurados: List[Any] = [None] * len(elementos)
+	for elemento, posicion in zip(elementos, orden):
+		restaurados[posicion] = elemento
+	return restaurados
+
+def comprimir_con_7z(elementos: List[Path], configuracion: Parametros, instrumentacion: Instrumentacion | None = None) -> None:
 	"""
 	Comprime los elementos utilizando 7-Zip.
 
 	Args:
 		elementos (List[Path]): Lista de rutas de archivos a comprimir.
-	"""
-	# Ruta al ejecutable de 7-Zip
-	ruta_7z = Path("C:/Program Files/7-Zip/7z.exe")
+		configuracion (Parametros): Parámetros de compresión (ver Perfiles.ajustar_perfil).
+		instrumentacion (Instrumentacion | None): Si se indica, recibe el tiempo de 7-Zip.
 
+	Raises:
+		RuntimeError: Si 7-Zip termina con un código distinto de 0.
+	"""
 	# Ruta para el archivo comprimido
 	ruta_comprimido = elementos[0].parent / f"{elementos[0].parent.name}.7z.cgb"
 
 	# Parámetros para la compresión
 	parametros: List[str] = [
-		str(object=ruta_7z),
+		str(object=RUTA_7Z),
 		"a",							# Comando para añadir archivos a un archivo comprimido
 		str(object=ruta_comprimido),	# Ruta al archivo comprimido de salida
 	]
@@ -29,59 +152,270 @@ def comprimir_con_7z(elementos: List[Path]) -> None:
 		parametros.append(str(object=elemento.resolve()))
 
 	# Agrega los parámetros adicionales
-	parametros.extend([
-		"-t7z",							# Formato de archivo 7z
-		"-mx9",							# Nivel de compresión máximo (Ultra)
-		"-m0=lzma2",					# Modo LZMA2
-		"-mfb=273",						# Tamaño de palabra
-		"-md=1536m",					# Diccionario de 1536 MB
-		"-ms=on",						# Tamaño de bloque sólido (compacto)
-		"-mtm=off",						# No guardar las fechas de los archivos
-		"-mta=off",						# No guardar las propiedades NTFS
-		"-sdel",						# Eliminar archivos después de la compresión
-	])
+	parametros.extend(PARAMETROS_7Z)
+	parametros.extend(parametros_7z(parametros=configuracion))
+	parametros.append("-sdel")			# Eliminar archivos después de la compresión
 
 	# Ejecutar el comando de 7-Zip
-	subprocess.run(args=parametros)
+	inicio: float = time.perf_counter()
+	resultado = subprocess.run(args=parametros)
+	if resultado.returncode != 0:
+		raise RuntimeError(f"7-Zip terminó con el código {resultado.returncode}")
+	if instrumentacion is not None:
+		instrumentacion.etapa(etapa="7z", segundos=time.perf_counter() - inicio)
 
-def procesar_imagen(imagen: Path, Raw: Path) -> Dict[str, Any]:
+def comprimir_en_flujo_con_7z(lista_imagenes: List[Path], configuracion: Parametros, trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, instrumentacion: Instrumentacion | None = None, ejecutor: ProcessPoolExecutor | None = None, orden: List[int] | None = None, cache: CacheDecodificacion | None = None) -> None:
 	"""
-	Procesa una imagen dada y guarda el contenido de rawdata en un archivo RAW especificado.
+	Decodifica las imágenes y envía su rawdata directamente a 7-Zip por una tubería, sin archivos RAW intermedios.
+
+	Todo el rawdata se guarda como una única entrada (NOMBRE_FLUJO); cada imagen registra en
+	images.json su desplazamiento y longitud dentro de ella. Si algo falla por el camino, 7-Zip se
+	detiene y se borra el archivo a medias (un archivo anterior que 7-Zip no llegó a tocar se conserva).
 
 	Args:
-		imagen (Path): La ruta de la imagen a procesar.
-		Raw (Path): La ruta donde se guardará el archivo RAW.
+		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+		configuracion (Parametros): Parámetros de compresión (ver Perfiles.ajustar_perfil).
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+		ejecutor (ProcessPoolExecutor | None): Grupo de procesos decodificadores compartido entre galerías; None para crear uno propio.
+		orden (List[int] | None): Orden en que se comprimen las imágenes (índices de lista_imagenes, ver Similitud.py); None para el de la lista.
+		cache (CacheDecodificacion | None): Caché de imágenes ya decodificadas (ver Cache.py); None para decodificarlas todas.
+	"""
+	carpeta: Path = lista_imagenes[0].parent
+	ruta_comprimido: Path = carpeta / f"{carpeta.name}.7z.cgb"
+	imagenes_propiedades: List[Dict[str, Any]] = []
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+
+	# 7-Zip lee la entrada NOMBRE_FLUJO desde su entrada estándar
+	parametros: List[str] = [str(object=RUTA_7Z), "a", str(object=ruta_comprimido), f"-si{NOMBRE_FLUJO}"]
+	parametros.extend(PARAMETROS_7Z)
+	parametros.extend(parametros_7z(parametros=configuracion))
+	# Estado del archivo antes de empezar, para saber si lo que quede tras un error es nuestro
+	anterior: Tuple[int, int] | None = (ruta_comprimido.stat().st_size, ruta_comprimido.stat().st_mtime_ns) if ruta_comprimido.exists() else None
+	proceso = subprocess.Popen(args=parametros, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+	try:
+		desplazamiento: int = 0
+		deduplicador = Deduplicador()
+		imagenes_decodificadas = iterar_imagenes_decodificadas(lista_imagenes=en_orden(elementos=lista_imagenes, orden=orden), trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, ejecutor=ejecutor, cache=cache)
+		for i, (propiedades, rawdata, etapas) in enumerate(iterable=imagenes_decodificadas):
+			instrumentacion.progreso(actual=i + 1, total=len(lista_imagenes))
+			propiedades["raw"] = NOMBRE_FLUJO
+			propiedades["length"] = len(rawdata)
+			imagenes_propiedades.append(propiedades)
+
+			# Un rawdata repetido apunta a la posición donde ya se escribió
+			offset_existente: int | None = deduplicador.buscar(propiedades=propiedades, longitud=len(rawdata))
+			if offset_existente is not None:
+				propiedades["offset"] = offset_existente
+				instrumentacion.imagen(etapas=etapas)
+				continue
+
+			# Registra la posición del rawdata dentro del flujo (7-Zip comprime mientras se escribe)
+			propiedades["offset"] = desplazamiento
+			inicio: float = time.perf_counter()
+			for trozo in trozos(rawdata=rawdata):
+				proceso.stdin.write(trozo)
+			segundos: float = time.perf_counter() - inicio
+			etapas.anotar(etapa="escribir", segundos=segundos, procesados=len(rawdata))
+			instrumentacion.imagen(etapas=etapas)
+			deduplicador.registrar(propiedades=propiedades, ubicacion=desplazamiento, longitud=len(rawdata), segundos=segundos)
+			desplazamiento += len(rawdata)
+
+		# Cierra la tubería para que 7-Zip termine de comprimir
+		inicio = time.perf_counter()
+		proceso.stdin.close()
+		if proceso.wait() != 0:
+			raise RuntimeError(f"7-Zip terminó con el código {proceso.returncode}")
+		instrumentacion.etapa(etapa="7z", segundos=time.perf_counter() - inicio)
+		deduplicador.informar()
+
+		# Guarda la lista de propiedades, en el orden de la galería, y la añade al mismo archivo comprimido
+		imagenjson: Path = carpeta / 'images.json'
+		with open(file=imagenjson, mode='w') as fp:
+			json.dump(obj=restaurar_orden(elementos=imagenes_propiedades, orden=orden), fp=fp, indent=4, default=codificar_valor_json)
+		comprimir_con_7z(elementos=[imagenjson], configuracion=configuracion, instrumentacion=instrumentacion)
+	except BaseException:
+		# Un archivo con el flujo a medias o sin images.json no sirve: se detiene 7-Zip y se borra
+		if proceso.poll() is None:
+			proceso.kill()
+		proceso.stdin.close()
+		proceso.wait()
+		if ruta_comprimido.exists() and (ruta_comprimido.stat().st_size, ruta_comprimido.stat().st_mtime_ns) != anterior:
+			ruta_comprimido.unlink()
+		raise
+
+def comprimir_en_cgb(lista_imagenes: List[Path], configuracion: Parametros, trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, instrumentacion: Instrumentacion | None = None, ejecutor: ProcessPoolExecutor | None = None, orden: List[int] | None = None, delta: bool = False, cache: CacheDecodificacion | None = None) -> Path:
+	"""
+	Decodifica las imágenes y las guarda en un contenedor .cgb nativo (LZMA2), sin programas externos.
+
+	Las imágenes se comprimen en bloques sólidos del tamaño que fija el perfil (o una por bloque) y el
+	índice del contenedor guarda su posición, su longitud y sus propiedades (lo que en el modo 7z va
+	en images.json).
+
+	Args:
+		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+		configuracion (Parametros): Parámetros de compresión (ver Perfiles.ajustar_perfil).
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+		ejecutor (ProcessPoolExecutor | None): Grupo de procesos decodificadores compartido entre galerías; None para crear uno propio.
+		orden (List[int] | None): Orden en que se comprimen las imágenes (índices de lista_imagenes, ver Similitud.py); None para el de la lista.
+		delta (bool): Si es True, guarda cada imagen como XOR con una anterior del mismo modo y tamaño cuando se parecen (ver Deltas.py).
+		cache (CacheDecodificacion | None): Caché de imágenes ya decodificadas (ver Cache.py); None para decodificarlas todas.
 
 	Returns:
-		dict: Un diccionario que contiene todas las propiedades de la imagen procesada.
+		Path: La ruta del contenedor creado.
+	"""
+	carpeta: Path = lista_imagenes[0].parent
+	ruta_comprimido: Path = carpeta / f"{carpeta.name}.cgb"
+	inicio: float = time.perf_counter()
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+
+	deduplicador = Deduplicador()
+	if delta:
+		from Deltas import SelectorDeReferencias
+		selector = SelectorDeReferencias()
+
+	with EscritorCGB(ruta=ruta_comprimido, preset=configuracion.preset, diccionario=configuracion.diccionario, tamaño_bloque=configuracion.bloque, hilos=configuracion.hilos) as escritor:
+		imagenes_decodificadas = iterar_imagenes_decodificadas(lista_imagenes=en_orden(elementos=lista_imagenes, orden=orden), trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, ejecutor=ejecutor, cache=cache)
+		for i, (propiedades, rawdata, etapas) in enumerate(iterable=imagenes_decodificadas):
+			instrumentacion.progreso(actual=i + 1, total=len(lista_imagenes))
+
+			# Un rawdata repetido apunta al tramo donde ya se guardó
+			inicio_existente: int | None = deduplicador.buscar(propiedades=propiedades, longitud=len(rawdata))
+			if inicio_existente is not None:
+				escritor.agregar_entrada(inicio=inicio_existente, longitud=len(rawdata), metadatos=propiedades)
+				instrumentacion.imagen(etapas=etapas)
+				continue
+
+			# Una imagen parecida a otra anterior del mismo modo y tamaño se guarda como XOR con ella
+			guardado: bytes | RawdataEnFranjas = rawdata
+			if delta and isinstance(rawdata, bytes):
+				clave: Tuple[Any, ...] = (propiedades["mode"], tuple(propiedades["properties"]["size"]), len(rawdata))
+				with etapas.medir(etapa="delta", procesados=len(rawdata)):
+					guardado, referencia = selector.codificar(datos=rawdata, clave=clave)
+				if referencia is not None:
+					propiedades["delta"] = referencia
+
+			# Con varios hilos, agregar solo espera a que haya sitio para el bloque en vuelo
+			inicio_escritura: float = time.perf_counter()
+			inicio_rawdata: int = escritor.posicion
+			escritor.agregar(datos=guardado, metadatos=propiedades)
+			segundos: float = time.perf_counter() - inicio_escritura
+			etapas.anotar(etapa="comprimir", segundos=segundos, procesados=len(rawdata))
+			instrumentacion.imagen(etapas=etapas)
+			if delta and isinstance(rawdata, bytes):
+				selector.recordar(datos=rawdata, clave=clave, inicio=inicio_rawdata, delta=propiedades.get("delta"))
+			# Un delta no se puede reutilizar como si fuera el rawdata de la imagen
+			if "delta" not in propiedades:
+				deduplicador.registrar(propiedades=propiedades, ubicacion=inicio_rawdata, longitud=len(rawdata), segundos=segundos)
+		fin_imagenes: float = time.perf_counter()
+
+		# El índice guarda las imágenes en el orden de la galería, sea cual sea el orden de su rawdata
+		escritor.entradas = restaurar_orden(elementos=escritor.entradas, orden=orden)
+
+	# Los bloques pendientes y el índice se escriben al cerrar el contenedor
+	instrumentacion.etapa(etapa="comprimir", segundos=time.perf_counter() - fin_imagenes)
+
+	# Resumen de rendimiento
+	duracion: float = time.perf_counter() - inicio
+	sin_comprimir: int = escritor.bytes_sin_comprimir
+	comprimido: int = escritor.bytes_comprimidos
+	print(f"{sin_comprimir / 2**20:.1f} MB -> {comprimido / 2**20:.1f} MB en {duracion:.1f} s ({sin_comprimir / 2**20 / max(duracion, 1e-9):.1f} MB/s)")
+	deduplicador.informar()
+	if delta:
+		selector.informar()
+
+	return ruta_comprimido
+
+def decodificar_imagen(imagen: Path, nombre_raw: str, transformacion: str = "ninguna", reducir: bool = False, etapas: Etapas | None = None) -> Tuple[Dict[str, Any], bytes | RawdataEnFranjas]:
+	"""
+	Decodifica una imagen y obtiene sus propiedades junto con el rawdata, sin escribir nada en disco.
+
+	Las imágenes grandes (ver Franjas.UMBRAL_FRANJAS) que se pueden decodificar por franjas no se cargan:
+	el hash se calcula franja a franja y en lugar del rawdata se devuelve un RawdataEnFranjas, que lo
+	vuelve a leer por franjas al comprimirlo. A estas imágenes no se les aplica la reducción ni la transformación.
+
+	De los PNG animados se guardan todos los fotogramas, recortados a lo que cambia en cada uno (ver
+	Animaciones.py); tampoco se reducen ni se transforman.
+
+	Args:
+		imagen (Path): La ruta de la imagen a decodificar.
+		nombre_raw (str): El nombre del archivo RAW que se asociará a la imagen.
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		etapas (Etapas | None): Si se indica, recibe el tiempo de decodificar, el hash, el EXIF, la reducción y la transformación.
+
+	Returns:
+		Tuple[Dict[str, Any], bytes | RawdataEnFranjas]: Las propiedades de la imagen y su rawdata.
 	"""
 	propiedades: dict = {}
+	etapas = Etapas(nombre=imagen.name) if etapas is None else etapas
 
 	# Abre la imagen y extrae el rawdata
+	inicio: float = time.perf_counter()
 	with Image.open(fp=imagen) as img:
-		rawdata: bytes = img.tobytes()
-
-		# Guarda el contenido de rawdata en el archivo RAW
-		with open(file=Raw, mode='wb') as f:
-			f.write(rawdata)
+		resumen = hashlib.sha256()
+		segundos_hash: float = 0.0
+		animacion: Dict[str, Any] | None = None
+		if es_grande(modo=img.mode, tamaño=img.size) and se_puede_leer_en_franjas(img=img, ruta=imagen):
+			rawdata: bytes | RawdataEnFranjas = RawdataEnFranjas(ruta=imagen, modo=img.mode, tamaño=img.size)
+			for franja in rawdata:
+				inicio_hash: float = time.perf_counter()
+				resumen.update(franja)
+				segundos_hash += time.perf_counter() - inicio_hash
+		elif es_animada(img=img):
+			# El hash resume los lienzos completos; se guardan los recortes
+			fotogramas: List[Dict[str, Any]] = []
+			recortes: List[bytes] = []
+			for fotograma, lienzo, recorte in descomponer(img=img):
+				inicio_hash = time.perf_counter()
+				resumen.update(lienzo)
+				segundos_hash += time.perf_counter() - inicio_hash
+				fotogramas.append(fotograma)
+				recortes.append(recorte)
+			rawdata = b"".join(recortes)
+			animacion = {"loop": img.info.get("loop", 0), "frames": fotogramas}
+			if img.info.get("default_image"):
+				animacion["default_image"] = True
+		else:
+			rawdata = img.tobytes()
+			inicio_hash = time.perf_counter()
+			resumen.update(rawdata)
+			segundos_hash = time.perf_counter() - inicio_hash
+		etapas.anotar(etapa="decodificar", segundos=time.perf_counter() - inicio - segundos_hash, procesados=len(rawdata))
+		etapas.anotar(etapa="hash", segundos=segundos_hash, procesados=len(rawdata))
 
 		# Obtiene las propiedades de la imagen
 		propiedades["name"] = imagen.name
-		propiedades["mode"] = img.mode
-		propiedades["raw"] = Raw.name
+		propiedades["mode"] = img.mode if animacion is None else modo_lienzo(modo=img.mode)
+		propiedades["raw"] = nombre_raw
+		estado: os.stat_result = imagen.stat()
 		propiedades["properties"] = {
-			"created": imagen.stat().st_birthtime,
-			"modified": imagen.stat().st_mtime,
-			"hash_pixel": hashlib.sha256(rawdata).hexdigest(),
+			"created": fecha_creacion(estado=estado),
+			"modified": estado.st_mtime,
+			"bytes": estado.st_size,
+			"hash_pixel": resumen.hexdigest(),
 			"size": img.size,
 			"metadata": img.info
 		}
+		if animacion is not None:
+			propiedades["animation"] = animacion
 
 		# Verifica si los datos EXIF están en formato bytes
+		inicio_exif: float = time.perf_counter()
 		exif_bytes: Any = propiedades["properties"]["metadata"].get("exif", b"")
 		if isinstance(exif_bytes, bytes):
+			# Conserva el EXIF original para reinsertarlo tal cual al reconstruir la imagen
+			if exif_bytes:
+				propiedades["properties"]["metadata"]["exif_raw"] = exif_bytes
+
 			# Decodifica los bytes de los metadatos EXIF y convierte los IFDRational a cadenas
-			exif_info: dict = img._getexif()  # Obtiene los metadatos EXIF
+			# Sin EXIF no se llama a _getexif: en PNG cargaría la imagen entera buscando un eXIf tras IDAT
+			exif_info: dict = img._getexif() if exif_bytes and hasattr(img, "_getexif") else None  # Obtiene los metadatos EXIF
 			exif_data: dict = {}
 
 			if exif_info:
@@ -112,15 +446,167 @@ def procesar_imagen(imagen: Path, Raw: Path) -> Dict[str, Any]:
 
 			# Actualiza los metadatos EXIF en el diccionario de propiedades
 			propiedades["properties"]["metadata"]["exif"] = exif_data
+		etapas.anotar(etapa="exif", segundos=time.perf_counter() - inicio_exif)
+
+	# Reduce el modo y transforma el rawdata (después de calcular hash_pixel, que siempre es del rawdata original);
+	# los recortes de una animación no forman una imagen de ese tamaño y se guardan tal cual
+	if animacion is not None:
+		return propiedades, rawdata
+	modo: str = propiedades["mode"]
+	if reducir and not isinstance(rawdata, RawdataEnFranjas):
+		from Reducciones import modo_guardado, reducir as reducir_modo
+		with etapas.medir(etapa="reducir", procesados=len(rawdata)):
+			rawdata, reduccion = reducir_modo(rawdata=rawdata, modo=modo, tamaño=propiedades["properties"]["size"])
+		if reduccion is not None:
+			propiedades["reduction"] = reduccion
+			modo = modo_guardado(reduccion=reduccion)
+	if transformacion != "ninguna" and not isinstance(rawdata, RawdataEnFranjas):
+		from Transformaciones import transformar
+		with etapas.medir(etapa="transformar", procesados=len(rawdata)):
+			rawdata, descripcion = transformar(rawdata=rawdata, modo=modo, tamaño=propiedades["properties"]["size"], filtro=transformacion)
+		if descripcion is not None:
+			propiedades["transform"] = descripcion
 			
+	return propiedades, rawdata
+
+def decodificar_imagen_con_etapas(imagen: Path, nombre_raw: str, transformacion: str = "ninguna", reducir: bool = False) -> Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]:
+	"""Como decodificar_imagen, pero devuelve también sus etapas (para los procesos trabajadores)."""
+	etapas = Etapas(nombre=imagen.name)
+	propiedades, rawdata = decodificar_imagen(imagen=imagen, nombre_raw=nombre_raw, transformacion=transformacion, reducir=reducir, etapas=etapas)
+	return propiedades, rawdata, etapas
+
+def procesar_imagen(imagen: Path, Raw: Path) -> Dict[str, Any]:
+	"""
+	Procesa una imagen dada y guarda el contenido de rawdata en un archivo RAW especificado.
+
+	Args:
+		imagen (Path): La ruta de la imagen a procesar.
+		Raw (Path): La ruta donde se guardará el archivo RAW.
+
+	Returns:
+		dict: Un diccionario que contiene todas las propiedades de la imagen procesada.
+	"""
+	propiedades, rawdata = decodificar_imagen(imagen=imagen, nombre_raw=Raw.name)
+
+	# Guarda el contenido de rawdata en el archivo RAW
+	with open(file=Raw, mode='wb') as f:
+		for trozo in trozos(rawdata=rawdata):
+			f.write(trozo)
+
 	return propiedades
 
-def guardar_propiedades_imagenes(lista_imagenes: List[Path]) -> List[Path]:
+def iterar_imagenes_decodificadas(lista_imagenes: List[Path], trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, ejecutor: ProcessPoolExecutor | None = None, cache: CacheDecodificacion | None = None) -> Iterator[Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]]:
+	"""
+	Decodifica las imágenes, en serie o con un grupo de procesos, y las entrega en el orden original.
+
+	La decodificación va por delante de quien recorre el resultado (ver Tuberia.py): un hilo lee los
+	archivos por adelantado y otro decodifica, o reparte y recoge el trabajo de los procesos, mientras
+	las imágenes anteriores se escriben o se comprimen. Como mucho BYTES_EN_COLA de rawdata esperan a
+	ser recogidos. Con una caché, las imágenes que ya están se leen de ella en lugar de decodificarse.
+
+	Args:
+		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		ejecutor (ProcessPoolExecutor | None): Grupo de procesos ya creado (por ejemplo, compartido entre galerías); None para crear uno propio.
+		cache (CacheDecodificacion | None): Caché de imágenes ya decodificadas (ver Cache.py): las que están no se decodifican y las demás se anotan.
+
+	Returns:
+		Iterator[Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]]: Las propiedades, el rawdata y las etapas medidas de cada imagen, en orden.
+	"""
+	decodificadas = _decodificar_en_orden(lista_imagenes=lista_imagenes, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, ejecutor=ejecutor, cache=cache)
+	# Un rawdata por franjas no ocupa memoria mientras espera: se lee del archivo al comprimirlo
+	return en_segundo_plano(elementos=decodificadas, tamaño=lambda decodificada: 0 if isinstance(decodificada[1], RawdataEnFranjas) else len(decodificada[1]), bytes_maximos=BYTES_EN_COLA)
+
+def _decodificar_en_orden(lista_imagenes: List[Path], trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, ejecutor: ProcessPoolExecutor | None = None, cache: CacheDecodificacion | None = None) -> Iterator[Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]]:
+	"""La etapa de decodificación de iterar_imagenes_decodificadas, que se recorre en su propio hilo."""
+	if trabajadores == 0:
+		trabajadores = os.cpu_count() or 1
+
+	# Sin un grupo de procesos compartido se crea uno solo para esta lista
+	if trabajadores > 1 and ejecutor is None:
+		with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+			yield from _decodificar_en_orden(lista_imagenes=lista_imagenes, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, ejecutor=ejecutor, cache=cache)
+		return
+
+	# Las imágenes que ya están en la caché no se leen por adelantado
+	opciones: str = f"{transformacion}:{reducir}"
+	en_cache: List[bool] = [cache is not None and cache.contiene(imagen=imagen, opciones=opciones) for imagen in lista_imagenes]
+	leidas: Iterator[Path] = preleer(rutas=[imagen for imagen, guardada in zip(lista_imagenes, en_cache) if not guardada])
+
+	# Modo serie: decodifica las imágenes una tras otra
+	if trabajadores <= 1:
+		for i, (imagen, guardada) in enumerate(iterable=zip(lista_imagenes, en_cache)):
+			decodificada = _buscar_en_cache(cache=cache, imagen=imagen, nombre_raw=f"{i+1}.raw", opciones=opciones) if guardada else None
+			if decodificada is None:
+				if not guardada:
+					next(leidas)
+				decodificada = decodificar_imagen_con_etapas(imagen=imagen, nombre_raw=f"{i+1}.raw", transformacion=transformacion, reducir=reducir)
+				_guardar_en_cache(cache=cache, imagen=imagen, opciones=opciones, decodificada=decodificada)
+			yield decodificada
+		return
+
+	# Modo paralelo: limita el trabajo en vuelo para acotar la memoria usada por los rawdata pendientes
+	limite_en_vuelo: int = trabajadores * 2
+	pendientes: Deque[Tuple[Path, bool, Future]] = deque()
+	for i, (imagen, guardada) in enumerate(iterable=zip(lista_imagenes, en_cache)):
+		decodificada = _buscar_en_cache(cache=cache, imagen=imagen, nombre_raw=f"{i+1}.raw", opciones=opciones) if guardada else None
+		if decodificada is None:
+			if not guardada:
+				next(leidas)
+			pendientes.append((imagen, False, ejecutor.submit(decodificar_imagen_con_etapas, imagen, f"{i+1}.raw", transformacion, reducir)))
+		else:
+			futuro = Future()
+			futuro.set_result(decodificada)
+			pendientes.append((imagen, True, futuro))
+		# Entrega los resultados en orden en cuanto se alcanza el límite
+		if len(pendientes) >= limite_en_vuelo:
+			yield _recoger(pendiente=pendientes.popleft(), cache=cache, opciones=opciones)
+	while pendientes:
+		yield _recoger(pendiente=pendientes.popleft(), cache=cache, opciones=opciones)
+
+def _buscar_en_cache(cache: CacheDecodificacion, imagen: Path, nombre_raw: str, opciones: str) -> Tuple[Dict[str, Any], bytes, Etapas] | None:
+	"""Una imagen decodificada en otra ejecución, como si se acabara de decodificar, o None si hay que decodificarla."""
+	inicio: float = time.perf_counter()
+	encontrada: Tuple[Dict[str, Any], bytes] | None = cache.buscar(imagen=imagen, opciones=opciones)
+	if encontrada is None:
+		return None
+	propiedades, rawdata = encontrada
+	propiedades["raw"] = nombre_raw
+	etapas = Etapas(nombre=imagen.name)
+	etapas.anotar(etapa="cache", segundos=time.perf_counter() - inicio, procesados=len(rawdata))
+	return propiedades, rawdata, etapas
+
+def _guardar_en_cache(cache: CacheDecodificacion | None, imagen: Path, opciones: str, decodificada: Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]) -> None:
+	"""Anota en la caché una imagen recién decodificada; las decodificadas por franjas no caben y no se anotan."""
+	propiedades, rawdata, etapas = decodificada
+	if cache is not None and not isinstance(rawdata, RawdataEnFranjas):
+		with etapas.medir(etapa="cache", procesados=len(rawdata)):
+			cache.guardar(imagen=imagen, opciones=opciones, propiedades=propiedades, rawdata=rawdata)
+
+def _recoger(pendiente: Tuple[Path, bool, Future], cache: CacheDecodificacion | None, opciones: str) -> Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas]:
+	"""Espera una imagen del modo paralelo y, si se acaba de decodificar, la anota en la caché."""
+	imagen, de_cache, futuro = pendiente
+	decodificada: Tuple[Dict[str, Any], bytes | RawdataEnFranjas, Etapas] = futuro.result()
+	if not de_cache:
+		_guardar_en_cache(cache=cache, imagen=imagen, opciones=opciones, decodificada=decodificada)
+	return decodificada
+
+
+def guardar_propiedades_imagenes(lista_imagenes: List[Path], trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, instrumentacion: Instrumentacion | None = None, ejecutor: ProcessPoolExecutor | None = None, orden: List[int] | None = None, cache: CacheDecodificacion | None = None) -> List[Path]:
 	"""
 	Guarda las propiedades de las imágenes en un archivo JSON y retorna una lista de rutas de archivos RAW.
 
 	Args:
 		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+		ejecutor (ProcessPoolExecutor | None): Grupo de procesos decodificadores compartido entre galerías; None para crear uno propio.
+		orden (List[int] | None): Orden en que se comprimen las imágenes (índices de lista_imagenes, ver Similitud.py); None para el de la lista.
+		cache (CacheDecodificacion | None): Caché de imágenes ya decodificadas (ver Cache.py); None para decodificarlas todas.
 
 	Returns:
 		List[Path]: Lista de rutas de archivos RAW generados.
@@ -129,26 +615,114 @@ def guardar_propiedades_imagenes(lista_imagenes: List[Path]) -> List[Path]:
 	imagenes_propiedades: List[Dict[str, Any]] = []
 	imagenjson: Path = lista_imagenes[0].parent / 'images.json'
 	lista_rutas_raw: List[Path] = [imagenjson]
+	deduplicador = Deduplicador()
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
 
-	# Itera sobre la lista de imágenes
-	for i, imagen in enumerate(iterable=lista_imagenes):
-		print(f"procesando imagen {i + 1} de {len(lista_imagenes) + 1}", end ="\r")
-		# Genera el nombre del archivo RAW basado en el índice
-		ruta_raw: Path = imagen.parent / f"{i+1}.raw"
-		lista_rutas_raw.append(ruta_raw)
-
-		# Procesa la imagen y guarda sus propiedades
-		propiedades: Dict[str, Any] = procesar_imagen(imagen=imagen, Raw=ruta_raw)
+	# Itera sobre las imágenes decodificadas, que llegan en el orden original
+	imagenes_decodificadas = iterar_imagenes_decodificadas(lista_imagenes=en_orden(elementos=lista_imagenes, orden=orden), trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, ejecutor=ejecutor, cache=cache)
+	for i, (propiedades, rawdata, etapas) in enumerate(iterable=imagenes_decodificadas):
+		instrumentacion.progreso(actual=i + 1, total=len(lista_imagenes))
 
 		# Agrega las propiedades a la lista
 		imagenes_propiedades.append(propiedades)
 
-	# Guarda la lista de propiedades en un archivo JSON
+		# Un rawdata repetido apunta al archivo RAW que ya lo contiene
+		raw_existente: str | None = deduplicador.buscar(propiedades=propiedades, longitud=len(rawdata))
+		if raw_existente is not None:
+			propiedades["raw"] = raw_existente
+			instrumentacion.imagen(etapas=etapas)
+			continue
+
+		# Genera el nombre del archivo RAW basado en el índice
+		ruta_raw: Path = lista_imagenes[i].parent / propiedades["raw"]
+		lista_rutas_raw.append(ruta_raw)
+
+		# Guarda el contenido de rawdata en el archivo RAW
+		inicio: float = time.perf_counter()
+		with open(file=ruta_raw, mode='wb') as f:
+			for trozo in trozos(rawdata=rawdata):
+				f.write(trozo)
+		segundos: float = time.perf_counter() - inicio
+		etapas.anotar(etapa="escribir", segundos=segundos, procesados=len(rawdata))
+		instrumentacion.imagen(etapas=etapas)
+		deduplicador.registrar(propiedades=propiedades, ubicacion=propiedades["raw"], longitud=len(rawdata), segundos=segundos)
+
+	# Guarda la lista de propiedades, en el orden de la galería, en un archivo JSON
 	with open(file=imagenjson, mode='w') as fp:
-		json.dump(obj=imagenes_propiedades, fp=fp, indent=4)
+		json.dump(obj=restaurar_orden(elementos=imagenes_propiedades, orden=orden), fp=fp, indent=4, default=codificar_valor_json)
+	deduplicador.informar()
 
 	return lista_rutas_raw
 
+def estimar_tamaño_raw(lista_imagenes: List[Path]) -> int:
+	"""
+	Estima el tamaño total del rawdata de las imágenes leyendo solo sus cabeceras.
+
+	Args:
+		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+
+	Returns:
+		int: Ancho por alto por canales, sumado para todas las imágenes.
+	"""
+	total: int = 0
+	for imagen in lista_imagenes:
+		with Image.open(fp=imagen) as img:
+			ancho, alto = img.size
+			total += ancho * alto * len(img.getbands())
+	return total
+
+def configurar_compresion(lista_imagenes: List[Path], perfil: str = PERFIL_POR_DEFECTO, memoria: int | None = None, hilos: int = 0) -> Parametros:
+	"""
+	Elige los parámetros de compresión para una galería y los muestra.
+
+	Args:
+		lista_imagenes (List[Path]): Lista de rutas de archivos de imagen.
+		perfil (str): El nombre del perfil de compresión (ver Perfiles.PERFILES).
+		memoria (int | None): Límite de memoria para comprimir, en MB; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+
+	Returns:
+		Parametros: Los parámetros ajustados al tamaño de la galería y a la memoria.
+	"""
+	tamaño_total: int = estimar_tamaño_raw(lista_imagenes=lista_imagenes)
+	configuracion: Parametros = ajustar_perfil(nombre=perfil, tamaño_total=tamaño_total, memoria=None if memoria is None else memoria * MB, hilos=hilos)
+	print(f"Perfil {perfil} para {tamaño_total / MB:.1f} MB de rawdata: {configuracion.describir()}")
+	if memoria is not None and configuracion.memoria_compresion > memoria * MB:
+		print(f"Aviso: la compresión necesitará más de {memoria} MB incluso con el diccionario mínimo")
+	return configuracion
+
+def clave_natural(texto: str) -> List[int | str]:
+	"""Clave para ordenar nombres como lo haría Windows (los números por su valor: 2 antes que 10)."""
+	return [int(c) if c.isdigit() else c.lower() for c in re.split(pattern=r'(\d+)', string=texto)]
+
+def escanear_directorio(carpeta: Path) -> Tuple[List[Path], List[Path]]:
+	"""
+	Lee una carpeta una sola vez con os.scandir.
+
+	Cada imagen se devuelve como RutaImagen con su stat: el de os.DirEntry, que en Windows viene con el
+	listado y en los demás sistemas se lee una sola vez. Así no vuelve a consultarse al decodificarla.
+
+	Args:
+		carpeta (Path): La ruta de la carpeta a leer.
+
+	Returns:
+		Tuple[List[Path], List[Path]]: Las imágenes de la carpeta, ordenadas como lo haría Windows, y sus subcarpetas
+			(sin seguir enlaces simbólicos).
+	"""
+	lista_imagenes: List[Path] = []
+	subcarpetas: List[Path] = []
+	with os.scandir(carpeta) as entradas:
+		for entrada in entradas:
+			if entrada.is_dir(follow_symlinks=False):
+				subcarpetas.append(Path(entrada.path))
+			elif os.path.splitext(entrada.name)[1].lower() in EXTENSIONES_IMAGEN and entrada.is_file():
+				lista_imagenes.append(RutaImagen.con_estado(ruta=entrada.path, estado=entrada.stat()))
+
+	# Ordenamos la lista de archivos como lo haría Windows
+	lista_imagenes.sort(key=lambda x: clave_natural(texto=x.stem))
+
+	return lista_imagenes, subcarpetas
+
 def escanear_carpeta(carpeta: Path) -> List[Path]:
 	"""
 	Escanea una carpeta en busca de archivos de imagen.
@@ -159,18 +733,37 @@ def escanear_carpeta(carpeta: Path) -> List[Path]:
 	Returns:
 		List[Path]: Una lista de rutas de archivos de imagen encontrados en la carpeta.
 	"""
-	lista_imagenes: List[Path] = []
-	
-	# Escanea la carpeta y filtra solo los archivos de imagen
-	for archivo in carpeta.glob(pattern='*'):
-		if archivo.is_file() and archivo.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp']:
-			lista_imagenes.append(archivo)
-
-	# Ordenamos la lista de archivos como lo haría Windows
-	lista_imagenes.sort(key=lambda x: [int(c) if c.isdigit() else c.lower() for c in re.split(pattern=r'(\d+)', string=x.stem)])
-	
+	lista_imagenes, _ = escanear_directorio(carpeta=carpeta)
 	return lista_imagenes
 
+def escanear_arbol(raiz: Path) -> Dict[Path, List[Path]]:
+	"""
+	Recorre una sola vez un árbol de carpetas y reúne sus galerías.
+
+	Una galería es una carpeta con imágenes directamente dentro; sus subcarpetas forman galerías aparte.
+	Las carpetas que no se pueden leer se avisan y se saltan.
+
+	Args:
+		raiz (Path): La carpeta raíz del árbol.
+
+	Returns:
+		Dict[Path, List[Path]]: Las imágenes de cada galería, con las galerías ordenadas por su ruta como lo haría Windows.
+	"""
+	galerias: Dict[Path, List[Path]] = {}
+	carpetas: List[Path] = [raiz]
+	while carpetas:
+		carpeta: Path = carpetas.pop()
+		try:
+			lista_imagenes, subcarpetas = escanear_directorio(carpeta=carpeta)
+		except OSError as error:
+			print(f"Aviso: no se puede leer {carpeta}: {error}")
+			continue
+		if lista_imagenes:
+			galerias[carpeta] = lista_imagenes
+		carpetas.extend(subcarpetas)
+
+	return dict(sorted(galerias.items(), key=lambda par: [clave_natural(texto=parte) for parte in par[0].relative_to(raiz).parts]))
+
 def validador(carpeta: Path) -> bool:
 	"""
 	Valida si la carpeta especificada existe y es una carpeta válida.
@@ -189,32 +782,267 @@ def validador(carpeta: Path) -> bool:
 		return False
 	return True
 
-def empaquetar(carpeta: Path) -> None:
+def anexar(carpeta: Path, trabajadores: int = 1, transformacion: str = "ninguna", reducir: bool = False, perfil: str = PERFIL_POR_DEFECTO, memoria: int | None = None, hilos: int = 0, instrumentacion: Instrumentacion | None = None) -> None:
+	"""
+	Añade a un contenedor .cgb existente las imágenes nuevas o modificadas de la carpeta, sin recomprimir lo que ya contiene.
+
+	Una imagen se da por igual si su tamaño en bytes y su fecha de modificación coinciden con los guardados. Si no,
+	se decodifica: si su hash_pixel coincide con un rawdata ya guardado solo se actualizan sus propiedades, y si no
+	se escribe en un bloque nuevo. Al final se escribe un índice nuevo. Las imágenes que ya no están en la carpeta
+	se conservan en el contenedor.
+
+	Args:
+		carpeta (Path): La ruta de la carpeta de la galería.
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		perfil (str): El perfil de compresión de los bloques nuevos (ver Perfiles.PERFILES).
+		memoria (int | None): Límite de memoria para comprimir, en MB; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+	"""
+	# Verificar que la ruta sea valida para ser procesada
+	if not validador(carpeta=carpeta):
+		exit()
+	ruta_comprimido: Path = carpeta / f"{carpeta.name}.cgb"
+	if not ruta_comprimido.exists():
+		print(f"No existe el contenedor {ruta_comprimido.name}; use el modo normal para crearlo.")
+		exit()
+
+	lista_imagenes: List[Path] = escanear_carpeta(carpeta=carpeta)
+	deduplicador = Deduplicador()
+	inicio: float = time.perf_counter()
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+
+	# Índice de las imágenes ya guardadas, por nombre (basta con los registros fijos, sin decodificar los metadatos)
+	with LectorCGB(ruta=ruta_comprimido) as lector:
+		registros: List[RegistroEntrada] = [entrada.registro for entrada in lector.entradas]
+	posiciones: Dict[str, int] = {registro.nombre: indice for indice, registro in enumerate(iterable=registros)}
+
+	# Solo se decodifican las imágenes nuevas o cuyo tamaño o fecha cambiaron
+	pendientes: List[Path] = []
+	for imagen in lista_imagenes:
+		indice: int | None = posiciones.get(imagen.name)
+		if indice is not None:
+			estado: os.stat_result = imagen.stat()
+			if registros[indice].bytes == estado.st_size and registros[indice].modificado == estado.st_mtime:
+				continue
+		pendientes.append(imagen)
+	print(f"{len(pendientes)} imágenes nuevas o modificadas de {len(lista_imagenes)}")
+	if not pendientes:
+		instrumentacion.terminar()
+		return
+	configuracion: Parametros = configurar_compresion(lista_imagenes=pendientes, perfil=perfil, memoria=memoria, hilos=hilos)
+
+	with EscritorCGB(ruta=ruta_comprimido, anexar=True, preset=configuracion.preset, diccionario=configuracion.diccionario, tamaño_bloque=configuracion.bloque, hilos=configuracion.hilos) as escritor:
+		# El rawdata ya guardado, por hash_pixel
+		for entrada in escritor.entradas:
+			if "delta" in entrada.metadatos:
+				continue
+			deduplicador.conocer(propiedades=entrada.metadatos, ubicacion=entrada.inicio)
+
+		imagenes_decodificadas = iterar_imagenes_decodificadas(lista_imagenes=pendientes, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir)
+		for i, (propiedades, rawdata, etapas) in enumerate(iterable=imagenes_decodificadas):
+			instrumentacion.progreso(actual=i + 1, total=len(pendientes))
+			indice = posiciones.get(propiedades["name"])
+			propiedades["raw"] = f"{(len(escritor.entradas) if indice is None else indice) + 1}.raw"
+
+			# Mismos píxeles que un rawdata ya guardado: solo se actualizan las propiedades
+			inicio_existente: int | None = deduplicador.buscar(propiedades=propiedades, longitud=len(rawdata))
+			if inicio_existente is not None:
+				escritor.agregar_entrada(inicio=inicio_existente, longitud=len(rawdata), metadatos=propiedades, indice=indice)
+				instrumentacion.imagen(etapas=etapas)
+				continue
+
+			inicio_escritura: float = time.perf_counter()
+			inicio_rawdata: int = escritor.posicion
+			escritor.agregar(datos=rawdata, metadatos=propiedades, indice=indice)
+			segundos: float = time.perf_counter() - inicio_escritura
+			etapas.anotar(etapa="comprimir", segundos=segundos, procesados=len(rawdata))
+			instrumentacion.imagen(etapas=etapas)
+			deduplicador.registrar(propiedades=propiedades, ubicacion=inicio_rawdata, longitud=len(rawdata), segundos=segundos)
+			if indice is None:
+				posiciones[propiedades["name"]] = len(escritor.entradas) - 1
+		fin_imagenes: float = time.perf_counter()
+	instrumentacion.etapa(etapa="comprimir", segundos=time.perf_counter() - fin_imagenes)
+
+	# Resumen de rendimiento
+	duracion: float = time.perf_counter() - inicio
+	print(f"{deduplicador.bytes_escritos / 2**20:.1f} MB añadidos en {duracion:.1f} s; el contenedor ocupa {escritor.bytes_comprimidos / 2**20:.1f} MB")
+	deduplicador.informar()
+	instrumentacion.terminar()
+
+def abrir_cache(carpeta: Path | None, tamaño_maximo: int | None = None) -> CacheDecodificacion | nullcontext:
+	"""Abre la caché de decodificación de esa carpeta (tamaño_maximo en MB), o nada si no se pidió caché."""
+	if carpeta is None:
+		return nullcontext()
+	return CacheDecodificacion(carpeta=carpeta, tamaño_maximo=TAMAÑO_MAXIMO_CACHE if tamaño_maximo is None else tamaño_maximo * MB)
+
+def empaquetar_galeria(lista_imagenes: List[Path], trabajadores: int = 1, flujo: bool = False, formato: str = "cgb", transformacion: str = "ninguna", reducir: bool = False, ordenar: bool = False, delta: bool = False, perfil: str = PERFIL_POR_DEFECTO, memoria: int | None = None, hilos: int = 0, instrumentacion: Instrumentacion | None = None, ejecutor: ProcessPoolExecutor | None = None, cache: CacheDecodificacion | None = None) -> None:
+	"""
+	Empaqueta una galería ya escaneada, en la carpeta de sus imágenes.
+
+	Args:
+		lista_imagenes (List[Path]): Las imágenes de la galería, en orden (ver escanear_carpeta).
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		flujo (bool): Si es True, envía el rawdata directamente a 7-Zip sin archivos RAW intermedios (solo formato 7z).
+		formato (str): "cgb" para el contenedor nativo o "7z" para usar 7-Zip.
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		ordenar (bool): Si es True, comprime las imágenes parecidas seguidas (ver Similitud.py); el índice o images.json conservan el orden de la galería.
+		delta (bool): Si es True, guarda cada imagen como XOR con una anterior parecida del mismo modo y tamaño (ver Deltas.py; solo formato cgb).
+		perfil (str): El perfil de compresión (ver Perfiles.PERFILES).
+		memoria (int | None): Límite de memoria para comprimir, en MB; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+		ejecutor (ProcessPoolExecutor | None): Grupo de procesos decodificadores compartido entre galerías; None para crear uno propio.
+		cache (CacheDecodificacion | None): Caché de imágenes ya decodificadas, compartida entre galerías (ver Cache.py); None para decodificarlas todas.
+	"""
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+	if trabajadores == 0:
+		trabajadores = os.cpu_count() or 1
+
+	# Las huellas y la decodificación comparten el mismo grupo de procesos
+	if ordenar and ejecutor is None and trabajadores > 1:
+		with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+			empaquetar_galeria(lista_imagenes=lista_imagenes, trabajadores=trabajadores, flujo=flujo, formato=formato, transformacion=transformacion, reducir=reducir, ordenar=ordenar, delta=delta, perfil=perfil, memoria=memoria, hilos=hilos, instrumentacion=instrumentacion, ejecutor=ejecutor, cache=cache)
+		return
+
+	# Diccionario, bloque sólido e hilos según el tamaño de la galería y la memoria disponible
+	configuracion: Parametros = configurar_compresion(lista_imagenes=lista_imagenes, perfil=perfil, memoria=memoria, hilos=hilos)
+
+	# Orden de compresión: las imágenes parecidas, seguidas
+	orden: List[int] | None = None
+	if ordenar:
+		from Similitud import ordenar_por_parecido
+		inicio: float = time.perf_counter()
+		orden = ordenar_por_parecido(lista_imagenes=lista_imagenes, ejecutor=ejecutor)
+		segundos: float = time.perf_counter() - inicio
+		instrumentacion.etapa(etapa="ordenar", segundos=segundos)
+		movidas: int = sum(posicion != indice for indice, posicion in enumerate(iterable=orden))
+		print(f"Orden por parecido: {movidas} de {len(orden)} imágenes cambian de posición ({segundos:.1f} s)")
+
+	# Contenedor nativo: no necesita archivos intermedios ni programas externos
+	if formato == "cgb":
+		comprimir_en_cgb(lista_imagenes=lista_imagenes, configuracion=configuracion, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, instrumentacion=instrumentacion, ejecutor=ejecutor, orden=orden, delta=delta, cache=cache)
+	elif flujo:
+		# Modo en flujo: el rawdata va directamente del decodificador al compresor
+		comprimir_en_flujo_con_7z(lista_imagenes=lista_imagenes, configuracion=configuracion, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, instrumentacion=instrumentacion, ejecutor=ejecutor, orden=orden, cache=cache)
+	else:
+		# Guarda las propiedades de las imágenes en images.json
+		lista_archivos_a_comprimir: List[Path] = guardar_propiedades_imagenes(lista_imagenes=lista_imagenes, trabajadores=trabajadores, transformacion=transformacion, reducir=reducir, instrumentacion=instrumentacion, ejecutor=ejecutor, orden=orden, cache=cache)
+
+		# Comprime los archivos utilizando 7-Zip
+		comprimir_con_7z(elementos=lista_archivos_a_comprimir, configuracion=configuracion, instrumentacion=instrumentacion)
+
+def empaquetar(carpeta: Path, trabajadores: int = 1, flujo: bool = False, formato: str = "cgb", transformacion: str = "ninguna", reducir: bool = False, ordenar: bool = False, delta: bool = False, perfil: str = PERFIL_POR_DEFECTO, memoria: int | None = None, hilos: int = 0, instrumentacion: Instrumentacion | None = None, cache: Path | None = None, cache_maximo: int | None = None) -> None:
 	"""
 	Empaqueta los archivos de imagen en la carpeta especificada.
 
 	Args:
 		carpeta (Path): La ruta de la carpeta que contiene los archivos de imagen a empaquetar.
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		flujo (bool): Si es True, envía el rawdata directamente a 7-Zip sin archivos RAW intermedios (solo formato 7z).
+		formato (str): "cgb" para el contenedor nativo o "7z" para usar 7-Zip.
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		ordenar (bool): Si es True, comprime las imágenes parecidas seguidas (ver Similitud.py); el índice o images.json conservan el orden de la galería.
+		delta (bool): Si es True, guarda cada imagen como XOR con una anterior parecida del mismo modo y tamaño (ver Deltas.py; solo formato cgb).
+		perfil (str): El perfil de compresión (ver Perfiles.PERFILES).
+		memoria (int | None): Límite de memoria para comprimir, en MB; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+			Al terminar se muestra el resumen de etapas e imágenes más lentas.
+		cache (Path | None): Carpeta de la caché de imágenes decodificadas (ver Cache.py); None para no usarla.
+		cache_maximo (int | None): Tamaño máximo de la caché, en MB; None para el de Cache.TAMAÑO_MAXIMO_CACHE.
 	"""
 	# Verificar que la ruta sea valida para ser procesada
 	if not validador(carpeta=carpeta):
 		exit()
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
 
 	# Escanea la carpeta y obtiene la lista de imágenes
 	lista_imagenes: List[Path] = escanear_carpeta(carpeta=carpeta)
 
-	# Guarda las propiedades de las imágenes en images.json
-	lista_archivos_a_comprimir: List[Path] = guardar_propiedades_imagenes(lista_imagenes=lista_imagenes)
+	with abrir_cache(carpeta=cache, tamaño_maximo=cache_maximo) as cache_decodificacion:
+		empaquetar_galeria(lista_imagenes=lista_imagenes, trabajadores=trabajadores, flujo=flujo, formato=formato, transformacion=transformacion, reducir=reducir, ordenar=ordenar, delta=delta, perfil=perfil, memoria=memoria, hilos=hilos, instrumentacion=instrumentacion, cache=cache_decodificacion)
+	instrumentacion.terminar()
+
+def empaquetar_arbol(raiz: Path, trabajadores: int = 1, flujo: bool = False, formato: str = "cgb", transformacion: str = "ninguna", reducir: bool = False, ordenar: bool = False, delta: bool = False, perfil: str = PERFIL_POR_DEFECTO, memoria: int | None = None, hilos: int = 0, instrumentacion: Instrumentacion | None = None, cache: Path | None = None, cache_maximo: int | None = None) -> None:
+	"""
+	Empaqueta por separado cada galería de un árbol de carpetas, cada una en su propia carpeta.
+
+	El árbol se recorre una sola vez (ver escanear_arbol) y todas las galerías comparten un mismo grupo de
+	procesos decodificadores, de modo que las galerías pequeñas no pagan cada una el arranque de los
+	trabajadores. Las galerías se empaquetan una tras otra, igual que con empaquetar.
+
+	Args:
+		raiz (Path): La carpeta raíz del árbol de galerías.
+		trabajadores (int): Número de procesos decodificadores (1 = modo serie, 0 = todos los núcleos).
+		flujo (bool): Si es True, envía el rawdata directamente a 7-Zip sin archivos RAW intermedios (solo formato 7z).
+		formato (str): "cgb" para el contenedor nativo o "7z" para usar 7-Zip.
+		transformacion (str): Transformación del rawdata antes de comprimirlo ("ninguna", "auto" o un filtro de Transformaciones.FILTROS).
+		reducir (bool): Si es True, guarda cada imagen en el modo más pequeño que conserva exactamente sus píxeles (ver Reducciones.py).
+		ordenar (bool): Si es True, comprime las imágenes parecidas seguidas (ver Similitud.py); el índice o images.json conservan el orden de la galería.
+		delta (bool): Si es True, guarda cada imagen como XOR con una anterior parecida del mismo modo y tamaño (ver Deltas.py; solo formato cgb).
+		perfil (str): El perfil de compresión (ver Perfiles.PERFILES).
+		memoria (int | None): Límite de memoria para comprimir, en MB; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+		instrumentacion (Instrumentacion | None): Recibe el progreso y las etapas de cada imagen; por defecto, progreso en la consola.
+			Al terminar se muestra el resumen de etapas e imágenes más lentas de todo el árbol.
+		cache (Path | None): Carpeta de la caché de imágenes decodificadas, compartida por todo el árbol (ver Cache.py); None para no usarla.
+		cache_maximo (int | None): Tamaño máximo de la caché, en MB; None para el de Cache.TAMAÑO_MAXIMO_CACHE.
+	"""
+	# Verificar que la ruta sea valida para ser procesada
+	if not validador(carpeta=raiz):
+		exit()
+	instrumentacion = Instrumentacion.consola() if instrumentacion is None else instrumentacion
+	if trabajadores == 0:
+		trabajadores = os.cpu_count() or 1
+
+	galerias: Dict[Path, List[Path]] = escanear_arbol(raiz=raiz)
+	print(f"{len(galerias)} galerías con {sum(len(lista_imagenes) for lista_imagenes in galerias.values())} imágenes en {raiz}")
+
+	with ProcessPoolExecutor(max_workers=trabajadores) if trabajadores > 1 else nullcontext() as ejecutor, abrir_cache(carpeta=cache, tamaño_maximo=cache_maximo) as cache_decodificacion:
+		for numero, (carpeta, lista_imagenes) in enumerate(iterable=galerias.items(), start=1):
+			print(f"[{numero}/{len(galerias)}] {carpeta.relative_to(raiz)}")
+			empaquetar_galeria(lista_imagenes=lista_imagenes, trabajadores=trabajadores, flujo=flujo, formato=formato, transformacion=transformacion, reducir=reducir, ordenar=ordenar, delta=delta, perfil=perfil, memoria=memoria, hilos=hilos, instrumentacion=instrumentacion, ejecutor=ejecutor, cache=cache_decodificacion)
 
-	# Comprime los archivos utilizando 7-Zip
-	comprimir_con_7z(elementos=lista_archivos_a_comprimir)
+	instrumentacion.terminar()
 
 if __name__ == "__main__":
 	os.system(command="cls")
     # Configura el parser de argumentos
 	parser = argparse.ArgumentParser(description='Script para escanear una carpeta, guardar propiedades de imágenes y comprimir archivos.')
 	parser.add_argument('carpeta', nargs='?', help='Carpeta a escanear')
+	parser.add_argument('-t', '--trabajadores', type=int, default=1, help='Procesos para decodificar imágenes en paralelo (1 = serie, 0 = todos los núcleos)')
+	parser.add_argument('-f', '--flujo', action='store_true', help='Envía el rawdata directamente a 7-Zip, sin archivos RAW intermedios (solo con --formato 7z)')
+	parser.add_argument('--formato', choices=['cgb', '7z'], default='cgb', help='Contenedor nativo (cgb, por defecto) o archivo 7-Zip (7z)')
+	parser.add_argument('-r', '--recursivo', action='store_true', help='Empaqueta por separado cada carpeta con imágenes del árbol, con un solo grupo de procesos para todas')
+	parser.add_argument('-a', '--anexar', action='store_true', help='Añade al contenedor .cgb existente solo las imágenes nuevas o modificadas')
+	parser.add_argument('--transformacion', choices=['ninguna', 'auto', 'planos', 'sub', 'up', 'average', 'paeth'], default='ninguna', help='Separa los canales en planos y aplica un filtro de predicción antes de comprimir (requiere NumPy)')
+	parser.add_argument('--reducir', action='store_true', help='Guarda cada imagen en el modo más pequeño que conserva sus píxeles: sin alfa opaco, en gris o con paleta (requiere NumPy)')
+	parser.add_argument('--ordenar', action='store_true', help='Comprime seguidas las imágenes parecidas (mismo modo y tamaño, huella parecida); el índice conserva el orden de la galería (requiere NumPy)')
+	parser.add_argument('--delta', action='store_true', help='Guarda cada imagen parecida a otra anterior del mismo modo y tamaño como XOR con ella, en cadenas de profundidad acotada (solo formato cgb, requiere NumPy)')
+	parser.add_argument('-p', '--perfil', choices=list(PERFILES), default=PERFIL_POR_DEFECTO, help='Perfil de compresión: relación frente a velocidad y memoria')
+	parser.add_argument('-m', '--memoria', type=int, default=None, help='Límite de memoria para comprimir, en MB (reduce hilos y diccionario si hace falta)')
+	parser.add_argument('--hilos', type=int, default=0, help='Hilos de compresión (0 = todos los núcleos)')
+	parser.add_argument('--cache', help='Carpeta donde se guardan las imágenes ya decodificadas; al repetir un empaquetado interrumpido o volver a empaquetar una carpeta con pocos cambios, no se vuelven a decodificar')
+	parser.add_argument('--cache-maximo', type=int, default=None, help=f'Tamaño máximo de la caché, en MB (por defecto {TAMAÑO_MAXIMO_CACHE // MB}); al superarlo se borran las imágenes usadas hace más tiempo')
+	parser.add_argument('--registro', help='Añade a este archivo un evento JSON por línea con el progreso y las etapas de cada imagen')
 	args: argparse.Namespace = parser.parse_args()
+	if args.recursivo and args.anexar:
+		parser.error("--recursivo no se puede combinar con --anexar")
+	if args.flujo and args.formato != "7z":
+		parser.error("--flujo solo está disponible con el formato 7z")
+	if args.delta and args.formato != "cgb":
+		parser.error("--delta solo está disponible con el formato cgb")
+	if args.cache and args.anexar:
+		parser.error("--cache no se puede combinar con --anexar")
+	if args.anexar and (args.formato != "cgb" or args.flujo):
+		parser.error("--anexar solo está disponible con el formato cgb (sin --flujo)")
+	if args.anexar and (args.ordenar or args.delta):
+		parser.error("--ordenar y --delta no se pueden combinar con --anexar: las imágenes nuevas se añaden en orden y sin delta")
 
 	if args.carpeta:
 		# Modo de argumento: se proporciona una carpeta en la línea de comandos
@@ -223,4 +1051,10 @@ if __name__ == "__main__":
 		# Modo interactivo: pedir al usuario que ingrese la carpeta
 		carpeta = Path(input("Ingrese la carpeta a escanear: "))
 	
-	empaquetar(carpeta=carpeta)
\ No newline at end of file
+	instrumentacion = Instrumentacion.consola(registro=Path(args.registro) if args.registro else None)
+	if args.anexar:
+		anexar(carpeta=carpeta, trabajadores=args.trabajadores, transformacion=args.transformacion, reducir=args.reducir, perfil=args.perfil, memoria=args.memoria, hilos=args.hilos, instrumentacion=instrumentacion)
+	elif args.recursivo:
+		empaquetar_arbol(raiz=carpeta, trabajadores=args.trabajadores, flujo=args.flujo, formato=args.formato, transformacion=args.transformacion, reducir=args.reducir, ordenar=args.ordenar, delta=args.delta, perfil=args.perfil, memoria=args.memoria, hilos=args.hilos, instrumentacion=instrumentacion, cache=Path(args.cache) if args.cache else None, cache_maximo=args.cache_maximo)
+	else:
+		empaquetar(carpeta=carpeta, trabajadores=args.trabajadores, flujo=args.flujo, formato=args.formato, transformacion=args.transformacion, reducir=args.reducir, ordenar=args.ordenar, delta=args.delta, perfil=args.perfil, memoria=args.memoria, hilos=args.hilos, instrumentacion=instrumentacion, cache=Path(args.cache) if args.cache else None, cache_maximo=args.cache_maximo)
\ No newline at end of file
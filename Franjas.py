@@ -0,0 +1,313 @@
+import io, struct, zlib
+from pathlib import Path
+from PIL import Image
+from typing import Iterable, Iterator, List, Tuple
+
+# Procesamiento por franjas de imágenes muy grandes.
+#
+# Un mapa escaneado o una panorámica de 30000x30000 RGBA son 3,6 GB de rawdata; tenerlo entero en
+# memoria (más la imagen de Pillow y la copia para el hash) agota la de los procesos. A partir de
+# UMBRAL_FRANJAS el rawdata se lee, se resume y se comprime por franjas de filas completas, y al
+# reconstruir las filas se van entregando al codificador PNG a medida que se descomprimen, así que
+# la memoria depende del tamaño de la franja y no del de la imagen.
+#
+# Pillow no sabe decodificar una parte de una imagen, así que cada franja se decodifica con sus
+# propios decodificadores en C: en los formatos sin comprimir (BMP, PPM, TIFF...) leyendo del archivo
+# solo las filas de la franja, y en PNG descomprimiendo IDAT poco a poco y pasando las filas de cada
+# franja a Pillow como un PNG pequeño, precedidas de la última fila ya decodificada para que los
+# filtros que miran la fila de arriba sigan funcionando.
+
+# Tamaño de rawdata a partir del cual una imagen se procesa por franjas
+UMBRAL_FRANJAS: int = 256 << 20
+
+# Tamaño aproximado de cada franja
+TAMAÑO_FRANJA: int = 4 << 20
+
+# Tamaño de los trozos leídos del disco
+TAMAÑO_LECTURA: int = 1 << 20
+
+FIRMA_PNG: bytes = b"\x89PNG\r\n\x1a\n"
+
+# Profundidad y tipo de color PNG de los modos que se escriben por franjas; su rawdata tiene la
+# misma disposición que las filas PNG sin filtrar
+TIPOS_PNG: dict[str, Tuple[int, int]] = {"1": (1, 0), "L": (8, 0), "LA": (8, 4), "RGB": (8, 2), "RGBA": (8, 6)}
+
+# Profundidad y tipo de color de los PNG que se leen por franjas (por la misma razón, más la paleta)
+TIPOS_PNG_LEGIBLES: set[Tuple[int, int]] = {*TIPOS_PNG.values(), (8, 3)}
+
+# Número de canales de cada tipo de color PNG
+CANALES_PNG: dict[int, int] = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class RawdataEnFranjas:
+	"""
+	Rawdata de una imagen grande que se lee del archivo original por franjas cada vez que se recorre.
+
+	Sustituye a los bytes del rawdata entre el decodificador y el compresor: len() es la longitud total
+	y al iterarlo entrega franjas de filas completas. Solo guarda la ruta, así que se puede enviar a
+	otros procesos.
+	"""
+
+	def __init__(self, ruta: Path, modo: str, tamaño: Tuple[int, int]) -> None:
+		self.ruta: Path = ruta
+		self.modo: str = modo
+		self.tamaño: Tuple[int, int] = tamaño
+		self.longitud: int = bytes_por_fila(modo=modo, ancho=tamaño[0]) * tamaño[1]
+
+	def __len__(self) -> int:
+		return self.longitud
+
+	def __iter__(self) -> Iterator[bytes]:
+		return iterar_franjas(ruta=self.ruta)
+
+
+def chunk_png(tipo: bytes, datos: bytes) -> bytes:
+	"""Construye un chunk PNG completo: longitud, tipo, datos y CRC."""
+	return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+
+def bytes_por_fila(modo: str, ancho: int) -> int:
+	"""Longitud de una fila de rawdata de Pillow."""
+	return len(Image.new(mode=modo, size=(ancho, 1)).tobytes())
+
+def filas_por_franja(bytes_fila: int) -> int:
+	"""Número de filas de una franja de unos TAMAÑO_FRANJA bytes."""
+	return max(1, TAMAÑO_FRANJA // max(bytes_fila, 1))
+
+def es_grande(modo: str, tamaño: Tuple[int, int]) -> bool:
+	"""Indica si el rawdata de una imagen es lo bastante grande para procesarla por franjas."""
+	return bytes_por_fila(modo=modo, ancho=tamaño[0]) * tamaño[1] >= UMBRAL_FRANJAS
+
+def trozos(rawdata: bytes | RawdataEnFranjas) -> Iterable[bytes]:
+	"""Recorre el rawdata por trozos, tanto si está en memoria como si se lee por franjas."""
+	return rawdata if isinstance(rawdata, RawdataEnFranjas) else (rawdata,)
+
+def leer_en_trozos(ruta: Path, tamaño_trozo: int = TAMAÑO_LECTURA) -> Iterator[bytes]:
+	"""Entrega el contenido de un archivo por trozos."""
+	with open(file=ruta, mode="rb") as f:
+		while trozo := f.read(tamaño_trozo):
+			yield trozo
+
+def agrupar_filas(trozos: Iterable[bytes], bytes_fila: int, filas: int) -> Iterator[bytes]:
+	"""
+	Reagrupa trozos de rawdata de cualquier tamaño en franjas de filas completas.
+
+	Args:
+		trozos (Iterable[bytes]): El rawdata, en trozos consecutivos.
+		bytes_fila (int): Longitud de una fila.
+		filas (int): Filas por franja (la última puede tener menos).
+
+	Yields:
+		bytes: Franjas de `filas` filas.
+	"""
+	tamaño: int = bytes_fila * filas
+	pendiente = bytearray()
+	for trozo in trozos:
+		pendiente += trozo
+		while len(pendiente) >= tamaño:
+			yield bytes(pendiente[:tamaño])
+			del pendiente[:tamaño]
+	if len(pendiente) % bytes_fila:
+		raise ValueError("El rawdata no contiene un número entero de filas")
+	if pendiente:
+		yield bytes(pendiente)
+
+def se_puede_leer_en_franjas(img: Image.Image, ruta: Path) -> bool:
+	"""
+	Indica si la imagen abierta (sin cargar) se puede decodificar por franjas.
+
+	Los PNG animados nunca: iterar_franjas solo lee los IDAT de la imagen por defecto, y los demás
+	fotogramas (en fdAT) se perderían; se guardan enteros, como cualquier animación (ver Animaciones.py).
+	"""
+	if getattr(img, "is_animated", False):
+		return False
+	if img.format == "PNG":
+		_, _, profundidad, tipo_color, entrelazado = _cabecera_png(ruta=ruta)
+		return (profundidad, tipo_color) in TIPOS_PNG_LEGIBLES and not entrelazado
+	ancho: int = img.size[0]
+	return bool(img.tile) and all(tesela[0] == "raw" and tesela[1][0] == 0 and tesela[1][2] == ancho for tesela in img.tile)
+
+def iterar_franjas(ruta: Path) -> Iterator[bytes]:
+	"""
+	Decodifica una imagen por franjas de filas completas, sin cargarla entera.
+
+	Args:
+		ruta (Path): La ruta de la imagen; debe cumplir se_puede_leer_en_franjas.
+
+	Yields:
+		bytes: Franjas consecutivas del mismo rawdata que devolvería img.tobytes().
+	"""
+	with Image.open(fp=ruta) as img:
+		modo: str = img.mode
+		ancho: int = img.size[0]
+		formato: str = img.format
+		teselas: List = sorted(img.tile, key=lambda tesela: tesela[1][1])
+	filas: int = filas_por_franja(bytes_fila=bytes_por_fila(modo=modo, ancho=ancho))
+	if formato == "PNG":
+		yield from _franjas_png(ruta=ruta, filas=filas)
+	else:
+		yield from _franjas_raw(ruta=ruta, modo=modo, ancho=ancho, teselas=teselas, filas=filas)
+
+def _cabecera_png(ruta: Path) -> Tuple[int, int, int, int, int]:
+	"""Lee IHDR: ancho, alto, profundidad, tipo de color y entrelazado."""
+	with open(file=ruta, mode="rb") as f:
+		cabecera: bytes = f.read(8 + 8 + 13)
+	if cabecera[:8] != FIRMA_PNG or cabecera[12:16] != b"IHDR":
+		raise ValueError(f"{ruta} no es un PNG válido")
+	ancho, alto, profundidad, tipo_color, _, _, entrelazado = struct.unpack(">IIBBBBB", cabecera[16:29])
+	return ancho, alto, profundidad, tipo_color, entrelazado
+
+def _franjas_png(ruta: Path, filas: int) -> Iterator[bytes]:
+	"""Decodifica un PNG no entrelazado por franjas (ver el comentario del módulo)."""
+	ancho, alto, profundidad, tipo_color, _ = _cabecera_png(ruta=ruta)
+	bytes_linea: int = 1 + (ancho * profundidad * CANALES_PNG[tipo_color] + 7) // 8		# Byte de filtro + fila
+	tamaño: int = bytes_linea * filas
+	paleta: List[bytes] = []			# PLTE y tRNS, necesarios para decodificar cada franja
+	descompresor = zlib.decompressobj()
+	lineas = bytearray()
+	anterior: bytes = b""				# Última fila (sin filtrar) de la franja anterior
+	fila: int = 0
+
+	def decodificar(datos: bytes) -> bytes:
+		"""Decodifica unas líneas filtradas con Pillow, precedidas de la fila anterior sin filtro."""
+		nonlocal anterior, fila
+		n: int = len(datos) // bytes_linea
+		previas: int = 1 if anterior else 0
+		mini: bytes = b"".join([
+			FIRMA_PNG,
+			chunk_png(tipo=b"IHDR", datos=struct.pack(">IIBBBBB", ancho, n + previas, profundidad, tipo_color, 0, 0, 0)),
+			*paleta,
+			chunk_png(tipo=b"IDAT", datos=zlib.compress((b"\x00" + anterior if anterior else b"") + datos, 0)),
+			chunk_png(tipo=b"IEND", datos=b""),
+		])
+		with Image.open(fp=io.BytesIO(mini)) as img:
+			rawdata: bytes = img.tobytes()
+		bytes_fila: int = len(rawdata) // (n + previas)
+		anterior = rawdata[-bytes_fila:]
+		fila += n
+		return rawdata[previas * bytes_fila:]
+
+	with open(file=ruta, mode="rb") as f:
+		f.seek(len(FIRMA_PNG))
+		while True:
+			longitud, tipo = struct.unpack(">I4s", f.read(8))
+			if tipo == b"IDAT":
+				restante: int = longitud
+				while restante:
+					entrada: bytes = f.read(min(TAMAÑO_LECTURA, restante))
+					restante -= len(entrada)
+					# Limitar la salida para no descomprimir más de una franja de cada vez
+					while entrada:
+						lineas += descompresor.decompress(entrada, tamaño)
+						entrada = descompresor.unconsumed_tail
+						while len(lineas) >= tamaño:
+							yield decodificar(datos=bytes(lineas[:tamaño]))
+							del lineas[:tamaño]
+				f.seek(4, 1)		# CRC
+			elif tipo == b"IEND":
+				break
+			else:
+				datos: bytes = f.read(longitud)
+				f.seek(4, 1)
+				if tipo in (b"PLTE", b"tRNS"):
+					paleta.append(chunk_png(tipo=tipo, datos=datos))
+
+	# Lo que quede en el descompresor
+	while not descompresor.eof and (salida := descompresor.decompress(descompresor.unconsumed_tail, tamaño)):
+		lineas += salida
+		while len(lineas) >= tamaño:
+			yield decodificar(datos=bytes(lineas[:tamaño]))
+			del lineas[:tamaño]
+	lineas += descompresor.flush()
+	lineas = lineas[:(alto - fila) * bytes_linea]
+	if len(lineas) < (alto - fila) * bytes_linea:
+		raise ValueError(f"{ruta}: faltan datos de imagen")
+	for inicio in range(0, len(lineas), tamaño):
+		yield decodificar(datos=bytes(lineas[inicio:inicio + tamaño]))
+
+def _bits_por_pixel(modo: str, modo_raw: str) -> int:
+	"""Averigua los bits por píxel de un modo raw de Pillow probando con cuántos bytes se decodifican 8 píxeles."""
+	for bits in range(1, 8 * 8 + 1):
+		try:
+			Image.frombytes(modo, (8, 1), bytes(bits), "raw", modo_raw)
+			return bits
+		except ValueError:
+			continue
+	raise ValueError(f"Modo raw no soportado: {modo_raw}")
+
+def _franjas_raw(ruta: Path, modo: str, ancho: int, teselas: List, filas: int) -> Iterator[bytes]:
+	"""Decodifica por franjas una imagen sin comprimir, leyendo del archivo solo las filas de cada franja."""
+	with open(file=ruta, mode="rb") as f:
+		for tesela in teselas:
+			_, (_, y0, _, y1), desplazamiento, argumentos = tesela
+			if not isinstance(argumentos, tuple):
+				argumentos = (argumentos,)
+			modo_raw: str = argumentos[0]
+			paso: int = argumentos[1] if len(argumentos) > 1 and argumentos[1] else (ancho * _bits_por_pixel(modo=modo, modo_raw=modo_raw) + 7) // 8
+			orientacion: int = argumentos[2] if len(argumentos) > 2 else 1
+			alto: int = y1 - y0
+
+			for inicio in range(0, alto, filas):
+				fin: int = min(inicio + filas, alto)
+				# Con orientación -1 (BMP) las filas están guardadas de abajo arriba
+				primera: int = inicio if orientacion > 0 else alto - fin
+				f.seek(desplazamiento + primera * paso)
+				datos: bytes = f.read((fin - inicio) * paso)
+				yield Image.frombytes(modo, (ancho, fin - inicio), datos, "raw", modo_raw, paso, orientacion).tobytes()
+
+def escribir_png_en_franjas(ruta: Path, modo: str, tamaño: Tuple[int, int], trozos: Iterable[bytes], chunks: Iterable[bytes] = (), nivel: int = 6) -> None:
+	"""
+	Escribe un PNG a partir del rawdata que va llegando, sin tenerlo entero en memoria.
+
+	Cada franja se filtra con el codificador de Pillow (filtros adaptativos, en C) precedida de la última
+	fila de la franja anterior, y sus líneas filtradas se añaden a un único flujo zlib.
+
+	Args:
+		ruta (Path): La ruta del PNG.
+		modo (str): El modo de la imagen; uno de TIPOS_PNG.
+		tamaño (Tuple[int, int]): Ancho y alto.
+		trozos (Iterable[bytes]): El rawdata, en trozos consecutivos de cualquier tamaño.
+		chunks (Iterable[bytes]): Chunks completos que se escriben entre IHDR e IDAT (metadatos).
+		nivel (int): Nivel de compresión de zlib.
+	"""
+	ancho, alto = tamaño
+	profundidad, tipo_color = TIPOS_PNG[modo]
+	bytes_fila: int = bytes_por_fila(modo=modo, ancho=ancho)
+	compresor = zlib.compressobj(level=nivel)
+	anterior: bytes = b""
+
+	with open(file=ruta, mode="wb") as f:
+		f.write(FIRMA_PNG)
+		f.write(chunk_png(tipo=b"IHDR", datos=struct.pack(">IIBBBBB", ancho, alto, profundidad, tipo_color, 0, 0, 0)))
+		for chunk in chunks:
+			f.write(chunk)
+
+		for franja in agrupar_filas(trozos=trozos, bytes_fila=bytes_fila, filas=filas_por_franja(bytes_fila=bytes_fila)):
+			filas: int = len(franja) // bytes_fila
+			previas: int = 1 if anterior else 0
+			lineas: bytes = _filtrar(modo=modo, ancho=ancho, filas=filas + previas, rawdata=anterior + franja)
+			anterior = franja[-bytes_fila:]
+			# Descartar la línea de la fila anterior, que ya se escribió con la franja previa
+			comprimido: bytes = compresor.compress(lineas[previas * (len(lineas) // (filas + previas)):])
+			if comprimido:
+				f.write(chunk_png(tipo=b"IDAT", datos=comprimido))
+
+		f.write(chunk_png(tipo=b"IDAT", datos=compresor.flush()))
+		f.write(chunk_png(tipo=b"IEND", datos=b""))
+
+def _filtrar(modo: str, ancho: int, filas: int, rawdata: bytes) -> bytes:
+	"""Devuelve las líneas filtradas (byte de filtro + fila) que escribe Pillow para un rawdata."""
+	salida = io.BytesIO()
+	Image.frombytes(mode=modo, size=(ancho, filas), data=rawdata).save(fp=salida, format="PNG", compress_level=0)
+	# compress_level=0 solo almacena
+	return zlib.decompress(datos_idat(png=salida.getvalue()))
+
+def datos_idat(png: bytes) -> bytes:
+	"""El flujo zlib de un PNG en memoria: los datos de todos sus IDAT, juntos."""
+	idat: List[bytes] = []
+	posicion: int = len(FIRMA_PNG)
+	while posicion < len(png):
+		longitud, tipo = struct.unpack(">I4s", png[posicion:posicion + 8])
+		if tipo == b"IDAT":
+			idat.append(png[posicion + 8:posicion + 8 + longitud])
+		posicion += 12 + longitud
+	return b"".join(idat)
@@ -1,6 +1,49 @@
-import argparse, exifread, io, os, struct, zlib
+import argparse, exifread, io, json, mmap, os, struct, time, zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+
+# Firma de los archivos PNG
+FIRMA_PNG: bytes = b'\x89PNG\r\n\x1a\n'
+
+# Bytes de los datos que se muestran de los chunks sin función específica
+VISTA_PREVIA: int = 128
+
+# Longitud y tipo al principio de cada chunk
+CABECERA_CHUNK = struct.Struct('>I4s')
+
+# Bytes que se leen de una vez al calcular el CRC de un chunk
+TROZO_CRC: int = 1 << 20
+
+# Bytes descomprimidos que se generan de una vez al verificar los IDAT; no se guardan, solo se cuentan
+TROZO_INFLADO: int = 1 << 20
+
+# Canales de cada tipo de color de IHDR
+CANALES_PNG: Dict[int, int] = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Pasadas del entrelazado Adam7: columna y fila iniciales y paso entre columnas y entre filas
+PASADAS_ADAM7: List[tuple[int, int, int, int]] = [(0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2)]
+
+# Chunks de la imagen en sí; el resto se cuentan como metadatos en el modo carpeta
+CHUNKS_IMAGEN: frozenset[bytes] = frozenset({b'IHDR', b'PLTE', b'IDAT', b'IEND', b'acTL', b'fcTL', b'fdAT'})
+
+# Metadatos que se buscan en el modo carpeta, con el chunk que los contiene
+METADATOS: Dict[str, bytes] = {"icc": b'iCCP', "exif": b'eXIf', "itxt": b'iTXt', "time": b'tIME', "apng": b'acTL'}
+
+# Palabra clave de los chunks iTXt que contienen XMP
+CLAVE_XMP: bytes = b'XML:com.adobe.xmp'
+
+# Archivos que recibe cada proceso trabajador de una vez en el modo carpeta
+ARCHIVOS_POR_TAREA: int = 64
+
+class Chunk(NamedTuple):
+	"""Un chunk de un PNG, sin sus datos: estos se leen del archivo solo cuando hacen falta (ver datos_chunk)."""
+	tipo: bytes
+	posicion: int		# Posición de los datos en el archivo
+	longitud: int
+	crc: int | None		# None si el archivo termina antes del CRC
 
 def colorHEX(hex_color: str) -> str:
 	"""Devuelve un color de consola al recibir una secuencia RGB."""
@@ -262,57 +305,76 @@ def imprimir_chunk_pHYs(datos_chunk) -> None:
 	print(f"\033[96mPíxeles por {unidad_pixel}, eje Y:\033[0m", f"\033[92m{pixeles_por_unidad_y}\033[0m")
 	print("\033[96mEspecificador de unidad:\033[0m", f"\033[92m{unidad}\033[0m")
 
-def imprimir_chunks(chunks) -> None:
-	"""Imprime todos los chunks."""
-	for chunk in chunks:
-		tipo_chunk: any = chunk["Tipo de Chunk"]
-		print("\033[96mTipo de Chunk:\033[0m", "\033[92m" + str(object=tipo_chunk) + "\033[0m")
-		print("\033[96mLongitud:\033[0m", "\033[92m" + str(object=chunk["Longitud"]) + "\033[0m")
-
-		nombre_funcion: str = f"imprimir_chunk_{tipo_chunk.decode('ascii')}"  # Decodifica el tipo de chunk a una cadena ASCII
-		if nombre_funcion in globals():
-			# Llamar a la función específica si está definida
-			globals()[nombre_funcion](chunk["Datos del Chunk"])
-		else:
-			# Si no hay una función definida para este tipo de chunk, imprimir genéricamente
-			print("\033[96mDatos del Chunk (hex):\033[0m", "\n\033[92m" + (chunk["Datos del Chunk"][:128].hex() if chunk["Longitud"] > 128 else chunk["Datos del Chunk"].hex()) + "\033[0m")
-
-		print("\033[91mCRC:\033[0m", "\033[91m" + str(object=chunk["CRC"]) + "\033[0m\n")
+def imprimir_chunks(mapa: mmap.mmap, chunks: Iterator[Chunk]) -> None:
+	"""
+	Imprime todos los chunks.
 
-def leer_chunks_png(bytes_imagen: bytes) -> List[Dict]:
-	"""Lee los chunks de un archivo PNG y los devuelve como una lista de diccionarios."""
-	chunks: List[dict] = []
+	Solo se leen enteros los datos de los chunks que tienen una función específica; del resto (IDAT,
+	chunks desconocidos...) se muestran los primeros VISTA_PREVIA bytes.
 
-	# Inicializar el índice de lectura
-	indice: int = 8  # El primer chunk comienza después de los primeros 8 bytes del archivo PNG
-
-	while indice < len(bytes_imagen):
-		# Leer el tamaño del chunk
-		longitud, = struct.unpack('>I', bytes_imagen[indice:indice+4])
-		indice += 4
-
-		# Leer el tipo del chunk
-		tipo_chunk: bytes = bytes_imagen[indice:indice+4]
-
-		# Leer los datos del chunk
-		datos_chunk: bytes = bytes_imagen[indice+4:indice+4+longitud]
-
-		# Leer el CRC
-		crc, = struct.unpack('>I', bytes_imagen[indice+4+longitud:indice+4+longitud+4])
-		indice += 4 + longitud + 4
-
-		# Guardar la información del chunk en un diccionario
-		info_chunk: dict[str, bytes] = {
-			"Tipo de Chunk": tipo_chunk,
-			"Longitud": longitud,
-			"Datos del Chunk": datos_chunk,
-			"CRC": crc
-		}
-
-		# print(repr(info_chunk))
-		chunks.append(info_chunk)
+	Args:
+		mapa (mmap.mmap): El archivo PNG mapeado en memoria.
+		chunks (Iterator[Chunk]): Los chunks a imprimir, en orden.
+	"""
+	for chunk in chunks:
+		print("\033[96mTipo de Chunk:\033[0m", "\033[92m" + str(object=chunk.tipo) + "\033[0m")
+		print("\033[96mLongitud:\033[0m", "\033[92m" + str(object=chunk.longitud) + "\033[0m")
 
-	return chunks
+		nombre_funcion: str = f"imprimir_chunk_{chunk.tipo.decode('ascii', errors='replace')}"  # Decodifica el tipo de chunk a una cadena ASCII
+		if nombre_funcion in globals() and chunk.crc is not None:
+			# Llamar a la función específica si está definida (y el chunk está completo)
+			globals()[nombre_funcion](datos_chunk(mapa=mapa, chunk=chunk))
+		else:
+			# Si no hay una función definida para este tipo de chunk, imprimir genéricamente
+			print("\033[96mDatos del Chunk (hex):\033[0m", "\n\033[92m" + datos_chunk(mapa=mapa, chunk=chunk, limite=VISTA_PREVIA).hex() + "\033[0m")
+
+		print("\033[91mCRC:\033[0m", "\033[91m" + str(object=chunk.crc) + "\033[0m\n")
+
+def iterar_chunks_png(mapa: mmap.mmap) -> Iterator[Chunk]:
+	"""
+	Recorre los chunks de un archivo PNG mapeado en memoria sin copiar sus datos.
+
+	Solo se leen la longitud, el tipo y el CRC de cada chunk, así que recorrer un PNG de varios GB
+	apenas lee unos bytes por chunk. Si el archivo está truncado, el último chunk se devuelve con
+	los datos que quedan (y sin CRC si falta) y el recorrido termina.
+
+	Args:
+		mapa (mmap.mmap): El archivo PNG mapeado en memoria.
+
+	Yields:
+		Chunk: El tipo, la posición de los datos, la longitud y el CRC de cada chunk.
+	"""
+	indice: int = len(FIRMA_PNG)  # El primer chunk comienza después de la firma del archivo PNG
+	fin: int = len(mapa)
+
+	while indice + CABECERA_CHUNK.size <= fin:
+		# Leer la longitud y el tipo del chunk
+		longitud, tipo_chunk = CABECERA_CHUNK.unpack_from(mapa, indice)
+		posicion: int = indice + CABECERA_CHUNK.size
+
+		# Leer el CRC, que va tras los datos
+		final_datos: int = posicion + longitud
+		if final_datos + 4 > fin:
+			yield Chunk(tipo=tipo_chunk, posicion=posicion, longitud=min(longitud, fin - posicion), crc=None)
+			return
+		crc, = struct.unpack_from('>I', mapa, final_datos)
+		yield Chunk(tipo=tipo_chunk, posicion=posicion, longitud=longitud, crc=crc)
+		indice = final_datos + 4
+
+def datos_chunk(mapa: mmap.mmap, chunk: Chunk, limite: int | None = None) -> bytes:
+	"""
+	Lee los datos de un chunk.
+
+	Args:
+		mapa (mmap.mmap): El archivo PNG mapeado en memoria.
+		chunk (Chunk): El chunk devuelto por iterar_chunks_png.
+		limite (int | None): Leer como mucho estos bytes; None para leerlos todos.
+
+	Returns:
+		bytes: Los datos del chunk (o sus primeros `limite` bytes).
+	"""
+	longitud: int = chunk.longitud if limite is None else min(chunk.longitud, limite)
+	return mapa[chunk.posicion:chunk.posicion + longitud]
 
 def validador(ruta: Path) -> bool:
 	"""Valida si el archivo es un PNG."""
@@ -327,36 +389,291 @@ def validador(ruta: Path) -> bool:
 
 	# Leer los primeros bytes para verificar la firma de un archivo PNG
 	with open(file=ruta, mode='rb') as f:
-		signature: bytes = f.read(8)
-		png_signature: bytes = b'\x89PNG\r\n\x1a\n'
-		if signature != png_signature:
+		signature: bytes = f.read(len(FIRMA_PNG))
+		if signature != FIRMA_PNG:
 			print("\033[91mError: El archivo no es una imagen PNG.\033[0m")
 			return False
 
 	return True
 
+def crc_chunk(mapa: mmap.mmap, chunk: Chunk, alimentar: Callable[[bytes, int], None] | None = None) -> int:
+	"""
+	Calcula el CRC del tipo y los datos de un chunk, leyéndolos por trozos de TROZO_CRC bytes.
+
+	Args:
+		mapa (mmap.mmap): El archivo PNG mapeado en memoria.
+		chunk (Chunk): El chunk devuelto por iterar_chunks_png.
+		alimentar (Callable[[bytes, int], None] | None): Recibe cada trozo y su posición en el archivo,
+			para procesar los datos en la misma lectura (ver VerificadorIDAT).
+
+	Returns:
+		int: El CRC calculado.
+	"""
+	crc: int = zlib.crc32(chunk.tipo)
+	for inicio in range(chunk.posicion, chunk.posicion + chunk.longitud, TROZO_CRC):
+		trozo: bytes = mapa[inicio:min(inicio + TROZO_CRC, chunk.posicion + chunk.longitud)]
+		crc = zlib.crc32(trozo, crc)
+		if alimentar is not None:
+			alimentar(trozo, inicio)
+	return crc
+
+def tamaño_descomprimido(ihdr: bytes) -> int | None:
+	"""
+	Calcula los bytes que deben dar los IDAT descomprimidos según IHDR: cada fila lleva un byte de filtro y,
+	en las imágenes entrelazadas, cada pasada de Adam7 tiene sus propias filas.
+
+	Args:
+		ihdr (bytes): Los datos del chunk IHDR.
+
+	Returns:
+		int | None: Los bytes esperados, o None si IHDR no es válido.
+	"""
+	if len(ihdr) != 13:
+		return None
+	ancho, alto, profundidad_bits, tipo_color, _, _, metodo_entrelazado = struct.unpack('>IIBBBBB', ihdr)
+	if tipo_color not in CANALES_PNG or metodo_entrelazado not in (0, 1):
+		return None
+	bits_pixel: int = profundidad_bits * CANALES_PNG[tipo_color]
+	if not metodo_entrelazado:
+		return alto * ((ancho * bits_pixel + 7) // 8 + 1)
+	total: int = 0
+	for columna, fila, paso_columna, paso_fila in PASADAS_ADAM7:
+		ancho_pasada: int = (ancho - columna + paso_columna - 1) // paso_columna
+		alto_pasada: int = (alto - fila + paso_fila - 1) // paso_fila
+		if ancho_pasada and alto_pasada:
+			total += alto_pasada * ((ancho_pasada * bits_pixel + 7) // 8 + 1)
+	return total
+
+class VerificadorIDAT:
+	"""
+	Descomprime el flujo zlib de los IDAT a medida que llega, sin guardar la imagen, y comprueba que es
+	válido, que termina y que da los bytes que indica IHDR.
+
+	La salida se genera por trozos de TROZO_INFLADO bytes, así que la memoria no depende del tamaño de la imagen.
+	"""
+
+	def __init__(self, esperado: int | None) -> None:
+		"""
+		Args:
+			esperado (int | None): Los bytes descomprimidos que indica IHDR (ver tamaño_descomprimido); None si se desconocen.
+		"""
+		self.esperado: int | None = esperado
+		self.descompresor = zlib.decompressobj()
+		self.descomprimidos: int = 0
+		self.final: int = 0				# Posición en el archivo tras el último trozo recibido
+		self.sobrante: int | None = None	# Posición de los primeros datos tras el final del flujo
+		self.problemas: List[Dict[str, Any]] = []
+
+	def alimentar(self, trozo: bytes, posicion: int) -> None:
+		"""Descomprime un trozo de los datos de los IDAT, que empieza en `posicion` del archivo."""
+		self.final = posicion + len(trozo)
+		if self.problemas or self.sobrante is not None:
+			return
+		try:
+			self.descomprimidos += len(self.descompresor.decompress(trozo, TROZO_INFLADO))
+			while self.descompresor.unconsumed_tail:
+				self.descomprimidos += len(self.descompresor.decompress(self.descompresor.unconsumed_tail, TROZO_INFLADO))
+		except zlib.error as error:
+			self.problemas.append({"tipo": "zlib", "posicion": posicion, "hasta": self.final, "detalle": str(error)})
+			return
+		if self.descompresor.eof and self.descompresor.unused_data:
+			self.sobrante = self.final - len(self.descompresor.unused_data)
+
+	def terminar(self) -> List[Dict[str, Any]]:
+		"""Comprueba el final del flujo y devuelve los problemas encontrados."""
+		if self.problemas:
+			return self.problemas
+		if not self.descompresor.eof:
+			self.problemas.append({"tipo": "zlib", "posicion": self.final, "detalle": "El flujo de los IDAT está incompleto"})
+		if self.sobrante is not None:
+			self.problemas.append({"tipo": "zlib", "posicion": self.sobrante, "detalle": "Hay datos tras el final del flujo de los IDAT"})
+		if self.esperado is not None and self.descomprimidos != self.esperado:
+			self.problemas.append({"tipo": "tamaño", "posicion": self.final, "detalle": f"Los IDAT dan {self.descomprimidos} bytes y IHDR indica {self.esperado}"})
+		return self.problemas
+
+def analizar_png(ruta: Path, verificar: bool = False) -> Dict[str, Any]:
+	"""
+	Analiza los chunks de un PNG para el modo carpeta, sin imprimir nada.
+
+	Args:
+		ruta (Path): El archivo PNG.
+		verificar (bool): Si es True, también descomprime los IDAT en la misma lectura (ver VerificadorIDAT)
+			y anota en "problemas" cada CRC erróneo, chunk truncado o error del flujo, con su posición en el archivo.
+
+	Returns:
+		Dict[str, Any]: El informe del archivo: su ruta y tamaño, los chunks (tipo, posición de los datos,
+			longitud y si su CRC es correcto), los metadatos presentes, los bytes de metadatos y de IDAT,
+			los problemas si se verificó y, si no se pudo leer, el error.
+	"""
+	informe: Dict[str, Any] = {"ruta": str(ruta), "bytes": 0, "error": None, "chunks": [], "metadatos": [], "xmp": False,
+		"bytes_metadatos": 0, "bytes_idat": 0, "crc_erroneos": 0, "truncado": False, "problemas": []}
+	verificador: VerificadorIDAT | None = None
+	try:
+		with open(file=ruta, mode='rb') as f:
+			informe["bytes"] = os.fstat(f.fileno()).st_size
+			if f.read(len(FIRMA_PNG)) != FIRMA_PNG:
+				informe["error"] = "El archivo no es una imagen PNG"
+				return informe
+			with mmap.mmap(fileno=f.fileno(), length=0, access=mmap.ACCESS_READ) as mapa:
+				for chunk in iterar_chunks_png(mapa=mapa):
+					if verificar and chunk.tipo == b'IHDR':
+						verificador = VerificadorIDAT(esperado=tamaño_descomprimido(ihdr=datos_chunk(mapa=mapa, chunk=chunk)))
+						if verificador.esperado is None:
+							informe["problemas"].append({"tipo": "ihdr", "posicion": chunk.posicion, "detalle": "IHDR no es válido"})
+					alimentar: Callable[[bytes, int], None] | None = verificador.alimentar if verificador is not None and chunk.tipo == b'IDAT' else None
+					if chunk.crc is None:
+						crc_correcto: bool | None = None
+						crc_chunk(mapa=mapa, chunk=chunk, alimentar=alimentar)
+						if verificar:
+							informe["problemas"].append({"tipo": "truncado", "posicion": chunk.posicion - CABECERA_CHUNK.size, "detalle": f"El chunk {chunk.tipo.decode('latin-1')} termina antes de tiempo"})
+					else:
+						crc: int = crc_chunk(mapa=mapa, chunk=chunk, alimentar=alimentar)
+						crc_correcto = crc == chunk.crc
+						if verificar and not crc_correcto:
+							informe["problemas"].append({"tipo": "crc", "posicion": chunk.posicion - CABECERA_CHUNK.size,
+								"detalle": f"CRC del chunk {chunk.tipo.decode('latin-1')}: guardado {chunk.crc:08x}, calculado {crc:08x}"})
+					informe["chunks"].append({"tipo": chunk.tipo.decode('latin-1'), "posicion": chunk.posicion, "longitud": chunk.longitud, "crc": crc_correcto})
+					informe["crc_erroneos"] += crc_correcto is False
+					informe["truncado"] |= chunk.crc is None
+					if chunk.tipo == b'IDAT':
+						informe["bytes_idat"] += chunk.longitud
+					elif chunk.tipo not in CHUNKS_IMAGEN:
+						informe["bytes_metadatos"] += chunk.longitud
+					if chunk.tipo == b'iTXt' and datos_chunk(mapa=mapa, chunk=chunk, limite=len(CLAVE_XMP) + 1) == CLAVE_XMP + b'\x00':
+						informe["xmp"] = True
+	except (OSError, ValueError) as error:
+		informe["error"] = str(error)
+		return informe
+
+	if verificar:
+		if verificador is None:
+			informe["problemas"].append({"tipo": "ihdr", "posicion": len(FIRMA_PNG), "detalle": "Falta el chunk IHDR"})
+		elif not informe["bytes_idat"]:
+			informe["problemas"].append({"tipo": "zlib", "posicion": informe["bytes"], "detalle": "No hay chunks IDAT"})
+		else:
+			informe["problemas"].extend(verificador.terminar())
+	tipos: set[str] = {chunk["tipo"] for chunk in informe["chunks"]}
+	informe["metadatos"] = [nombre for nombre, tipo in METADATOS.items() if tipo.decode('latin-1') in tipos]
+	return informe
+
+def buscar_png(carpeta: Path) -> Iterator[Path]:
+	"""Recorre una carpeta y sus subcarpetas y devuelve los archivos .png que contiene."""
+	pendientes: List[Path] = [carpeta]
+	while pendientes:
+		with os.scandir(pendientes.pop()) as entradas:
+			for entrada in entradas:
+				if entrada.is_dir(follow_symlinks=False):
+					pendientes.append(Path(entrada.path))
+				elif entrada.name.lower().endswith('.png') and entrada.is_file():
+					yield Path(entrada.path)
+
+def analizar_carpeta(carpeta: Path, salida: Path, trabajadores: int = 0, verificar: bool = False) -> Dict[str, Any]:
+	"""
+	Analiza todos los PNG de una carpeta y sus subcarpetas con un grupo de procesos.
+
+	Escribe en `salida` un informe por archivo (informes.jsonl, un JSON por línea, ver analizar_png)
+	y las estadísticas del conjunto (resumen.json).
+
+	Args:
+		carpeta (Path): La carpeta a analizar.
+		salida (Path): La carpeta donde se escriben los informes; se crea si no existe.
+		trabajadores (int): Número de procesos (1 = modo serie, 0 = todos los núcleos).
+		verificar (bool): Verificar también los IDAT de cada archivo (ver analizar_png).
+
+	Returns:
+		Dict[str, Any]: Las estadísticas: archivos analizados, con errores, con CRC erróneos, truncados o con
+			problemas, archivos con cada tipo de metadatos, número de chunks de cada tipo y bytes de metadatos e IDAT.
+	"""
+	if trabajadores == 0:
+		trabajadores = os.cpu_count() or 1
+	inicio: float = time.perf_counter()
+	rutas: List[Path] = sorted(buscar_png(carpeta=carpeta))
+	salida.mkdir(parents=True, exist_ok=True)
+
+	resumen: Dict[str, Any] = {"carpeta": str(carpeta), "archivos": len(rutas), "errores": 0, "crc_erroneos": 0, "truncados": 0, "con_problemas": 0,
+		"metadatos": Counter(), "xmp": 0, "chunks": Counter(), "bytes": 0, "bytes_metadatos": 0, "bytes_idat": 0}
+	with open(file=salida / "informes.jsonl", mode="w", encoding="utf-8") as informes, ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+		# Los archivos se reparten por tandas para no pagar la comunicación entre procesos por cada uno
+		analizar: Callable[[Path], Dict[str, Any]] = partial(analizar_png, verificar=verificar)
+		resultados: Iterator[Dict[str, Any]] = ejecutor.map(analizar, rutas, chunksize=ARCHIVOS_POR_TAREA) if trabajadores > 1 else map(analizar, rutas)
+		for i, informe in enumerate(iterable=resultados, start=1):
+			informes.write(json.dumps(obj=informe, ensure_ascii=False) + "\n")
+			resumen["errores"] += informe["error"] is not None
+			resumen["crc_erroneos"] += informe["crc_erroneos"] > 0
+			resumen["truncados"] += informe["truncado"]
+			resumen["con_problemas"] += bool(informe["problemas"])
+			resumen["metadatos"].update(informe["metadatos"])
+			resumen["xmp"] += informe["xmp"]
+			resumen["chunks"].update(chunk["tipo"] for chunk in informe["chunks"])
+			for clave in ("bytes", "bytes_metadatos", "bytes_idat"):
+				resumen[clave] += informe[clave]
+			if i % max(ARCHIVOS_POR_TAREA, len(rutas) // 100) == 0 or i == len(rutas):
+				print(f"\rAnalizando archivo {i} de {len(rutas)}", end="\n" if i == len(rutas) else "", flush=True)
+
+	resumen["segundos"] = time.perf_counter() - inicio
+	with open(file=salida / "resumen.json", mode="w", encoding="utf-8") as f:
+		json.dump(obj=resumen, fp=f, ensure_ascii=False, indent=4)
+	return resumen
+
+def imprimir_resumen(resumen: Dict[str, Any]) -> None:
+	"""Imprime las estadísticas del modo carpeta."""
+	print("\033[93mArchivos analizados:\033[0m", f"\033[92m{resumen['archivos']}\033[0m", f"({resumen['segundos']:.1f} s)")
+	for clave, texto in (("errores", "No legibles o no PNG"), ("crc_erroneos", "Con CRC erróneos"), ("truncados", "Truncados"), ("con_problemas", "Con problemas al verificar")):
+		print(f"\t\033[94m{texto}:\033[0m", f"\033[91m{resumen[clave]}\033[0m" if resumen[clave] else colorizar(valor="0"))
+	print("\033[93mArchivos con metadatos:\033[0m")
+	for nombre in METADATOS:
+		print(f"\t\033[94m{nombre}:\033[0m", f"\033[92m{resumen['metadatos'][nombre]}\033[0m")
+	print("\t\033[94mxmp:\033[0m", f"\033[92m{resumen['xmp']}\033[0m")
+	print("\033[93mChunks por tipo:\033[0m")
+	for tipo, cantidad in resumen["chunks"].most_common():
+		print(f"\t\033[94m{tipo}:\033[0m", f"\033[92m{cantidad}\033[0m")
+	print("\033[93mBytes de metadatos:\033[0m", f"\033[92m{resumen['bytes_metadatos']}\033[0m")
+	print("\033[93mBytes de IDAT:\033[0m", f"\033[92m{resumen['bytes_idat']}\033[0m")
+
+def imprimir_problemas(informe: Dict[str, Any]) -> None:
+	"""Imprime el resultado de verificar un archivo."""
+	if informe["error"]:
+		print("\033[91mError:\033[0m", informe["error"])
+	elif not informe["problemas"]:
+		print("\033[92mCorrecto:\033[0m", f"{len(informe['chunks'])} chunks con CRC correcto y {informe['bytes_idat']} bytes de IDAT que se descomprimen al tamaño de IHDR")
+	for problema in informe["problemas"]:
+		print(f"\033[91m{problema['tipo']}\033[0m", f"\033[94men el byte {problema['posicion']}:\033[0m", problema["detalle"])
+
 def tester(ruta: Path) -> None:
 	"""Función de prueba que valida la ruta antes de procesarla."""
 	# Validar la ruta antes de procesarla
 	if not validador(ruta=ruta):
 		exit()
 	
-	# Leer el contenido del archivo
-	with open(file=ruta, mode='rb') as f:
-		bytes_imagen: bytes = f.read()
-
-	# Obtener la información de los chunks del archivo PNG
-	chunks: list[dict] = leer_chunks_png(bytes_imagen=bytes_imagen)
-
-	# Imprimir la información de los chunks
-	imprimir_chunks(chunks=chunks)
+	# Mapear el archivo en memoria: el sistema solo carga las páginas que se leen
+	with open(file=ruta, mode='rb') as f, mmap.mmap(fileno=f.fileno(), length=0, access=mmap.ACCESS_READ) as mapa:
+		# Recorrer los chunks del archivo PNG e imprimir su información a medida que se encuentran
+		imprimir_chunks(mapa=mapa, chunks=iterar_chunks_png(mapa=mapa))
 
 if __name__ == "__main__":
 	# Crear el parser de argumentos
 	parser = argparse.ArgumentParser(description='Procesa un archivo PNG y muestra información de sus chunks.')
-	parser.add_argument('archivo', nargs='?', help='Ruta al archivo PNG a procesar')
+	parser.add_argument('archivo', nargs='?', help='Ruta al archivo PNG a procesar, o a una carpeta para analizar todos sus PNG (también los de las subcarpetas)')
+	parser.add_argument('-t', '--trabajadores', type=int, default=0, help='Procesos para analizar una carpeta (1 = serie, 0 = todos los núcleos)')
+	parser.add_argument('-s', '--salida', help='Carpeta donde se escriben los informes de una carpeta (por defecto, informes_png dentro de ella)')
+	parser.add_argument('-v', '--verificar', action='store_true', help='Comprueba el CRC de cada chunk y que los IDAT se descomprimen al tamaño de IHDR; termina con código 1 si algo falla')
 	args: argparse.Namespace = parser.parse_args()
 
+	if args.archivo and Path(args.archivo).is_dir():
+		# Modo carpeta: un informe por archivo y las estadísticas del conjunto, sin esperar al usuario
+		carpeta: Path = Path(args.archivo)
+		salida: Path = Path(args.salida) if args.salida else carpeta / "informes_png"
+		resumen: Dict[str, Any] = analizar_carpeta(carpeta=carpeta, salida=salida, trabajadores=args.trabajadores, verificar=args.verificar)
+		imprimir_resumen(resumen=resumen)
+		print(f"Informes en {salida}")
+		exit(1 if args.verificar and (resumen["con_problemas"] or resumen["errores"]) else 0)
+
+	if args.archivo and args.verificar:
+		# Verificación de un archivo, para usarla antes de empaquetar: sin esperar al usuario
+		informe: Dict[str, Any] = analizar_png(ruta=Path(args.archivo), verificar=True)
+		imprimir_problemas(informe=informe)
+		exit(1 if informe["problemas"] or informe["error"] else 0)
+
 	if args.archivo:
 		# Si se proporciona un archivo como argumento, convertirlo en una ruta
 		ruta: Path = Path(args.archivo)
@@ -367,4 +684,7 @@ if __name__ == "__main__":
 
 	# Llamar a la función tester con la ruta del archivo como argumento
 	tester(ruta=ruta)
-	input()
+
+	# Solo se espera al usuario si la ruta se pidió por teclado (para que no se cierre la consola)
+	if not args.archivo:
+		input()
@@ -0,0 +1,167 @@
+import json, sys, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, TextIO
+
+# Instrumentación del empaquetado y el desempaquetado.
+#
+# Cada imagen lleva un registro de Etapas con el tiempo y los bytes de cada paso (decodificar, hash,
+# EXIF, escribir, comprimir, reconstruir, oxipng...). Los registros se pueden crear en los procesos
+# trabajadores y devolverse al principal, que los pasa a Instrumentacion. Esta los convierte en
+# eventos (diccionarios con una clave "tipo") y los envía a sus sumideros: cualquier función que
+# reciba un evento, como SumideroProgreso (progreso en stderr) o SumideroJSONL (un JSON por línea).
+# Al terminar se muestra un resumen con las etapas que dominan y las imágenes más lentas.
+
+# Número de imágenes más lentas que aparecen en el resumen
+IMAGENES_EN_RESUMEN: int = 5
+
+Sumidero = Callable[[Dict[str, Any]], None]
+
+
+class Etapas:
+	"""Tiempos y bytes de cada etapa del procesamiento de una imagen."""
+
+	def __init__(self, nombre: str) -> None:
+		self.nombre: str = nombre
+		self.segundos: Dict[str, float] = {}
+		self.bytes: Dict[str, int] = {}
+
+	@contextmanager
+	def medir(self, etapa: str, procesados: int = 0) -> Iterator[None]:
+		"""Mide el tiempo del bloque with y lo suma a la etapa, junto con los bytes procesados."""
+		inicio: float = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.anotar(etapa=etapa, segundos=time.perf_counter() - inicio, procesados=procesados)
+
+	def anotar(self, etapa: str, segundos: float, procesados: int = 0) -> None:
+		"""Suma a una etapa un tiempo medido por otros medios."""
+		self.segundos[etapa] = self.segundos.get(etapa, 0.0) + segundos
+		self.bytes[etapa] = self.bytes.get(etapa, 0) + procesados
+
+	@property
+	def total(self) -> float:
+		"""Tiempo total de la imagen, en segundos."""
+		return sum(self.segundos.values())
+
+	def a_diccionario(self) -> Dict[str, Dict[str, float]]:
+		"""Las etapas como diccionario serializable en JSON."""
+		return {etapa: {"segundos": segundos, "bytes": self.bytes[etapa]} for etapa, segundos in self.segundos.items()}
+
+
+class SumideroProgreso:
+	"""Muestra el progreso en una sola línea de la consola (stderr por defecto), que se cierra al llegar al total."""
+
+	def __init__(self, salida: TextIO = sys.stderr) -> None:
+		self.salida: TextIO = salida
+
+	def __call__(self, evento: Dict[str, Any]) -> None:
+		if evento["tipo"] == "progreso":
+			final: str = "\n" if evento["actual"] >= evento["total"] else ""
+			self.salida.write(f"\r{evento['accion']} {evento['actual']} de {evento['total']}{final}")
+			self.salida.flush()
+
+
+class SumideroJSONL:
+	"""Escribe cada evento como una línea JSON en un archivo de registro."""
+
+	def __init__(self, ruta: Path) -> None:
+		self.archivo: TextIO = open(file=ruta, mode="a", encoding="utf-8")
+
+	def __call__(self, evento: Dict[str, Any]) -> None:
+		self.archivo.write(json.dumps(obj=evento, ensure_ascii=False, default=str) + "\n")
+		self.archivo.flush()
+
+	def cerrar(self) -> None:
+		self.archivo.close()
+
+
+class Instrumentacion:
+	"""
+	Recoge las etapas de cada imagen y el progreso, los envía a los sumideros y resume la ejecución.
+
+	Los tiempos por etapa son la suma de lo que tardó cada imagen; con varios procesos trabajadores
+	pueden superar el tiempo real de la ejecución.
+	"""
+
+	def __init__(self, sumideros: List[Sumidero] | None = None) -> None:
+		self.sumideros: List[Sumidero] = list(sumideros or [])
+		self.inicio: float = time.perf_counter()
+		self.imagenes: List[Etapas] = []
+		self.segundos: Dict[str, float] = {}
+		self.bytes: Dict[str, int] = {}
+
+	@classmethod
+	def consola(cls, registro: Path | None = None) -> "Instrumentacion":
+		"""La instrumentación de los programas de línea de comandos: progreso en stderr y, si se indica, un registro JSONL."""
+		sumideros: List[Sumidero] = [SumideroProgreso()]
+		if registro is not None:
+			sumideros.append(SumideroJSONL(ruta=registro))
+		return cls(sumideros=sumideros)
+
+	def emitir(self, tipo: str, **datos: Any) -> None:
+		"""Envía un evento a todos los sumideros."""
+		evento: Dict[str, Any] = {"tipo": tipo, "tiempo": time.time(), **datos}
+		for sumidero in self.sumideros:
+			sumidero(evento)
+
+	def progreso(self, actual: int, total: int, accion: str = "Procesando imagen") -> None:
+		"""Informa de que se han procesado `actual` de `total` elementos."""
+		self.emitir(tipo="progreso", accion=accion, actual=actual, total=total)
+
+	def imagen(self, etapas: Etapas) -> None:
+		"""Registra las etapas de una imagen terminada."""
+		self.imagenes.append(etapas)
+		for etapa, segundos in etapas.segundos.items():
+			self.anotar(etapa=etapa, segundos=segundos, procesados=etapas.bytes[etapa])
+		self.emitir(tipo="imagen", nombre=etapas.nombre, segundos=etapas.total, etapas=etapas.a_diccionario())
+
+	def etapa(self, etapa: str, segundos: float, procesados: int = 0) -> None:
+		"""Registra una etapa que no pertenece a una sola imagen (por ejemplo, 7-Zip comprimiendo todo)."""
+		self.anotar(etapa=etapa, segundos=segundos, procesados=procesados)
+		self.emitir(tipo="etapa", etapa=etapa, segundos=segundos, bytes=procesados)
+
+	def anotar(self, etapa: str, segundos: float, procesados: int = 0) -> None:
+		"""Suma un tiempo a los totales de una etapa, sin emitir ningún evento."""
+		self.segundos[etapa] = self.segundos.get(etapa, 0.0) + segundos
+		self.bytes[etapa] = self.bytes.get(etapa, 0) + procesados
+
+	def resumen(self, imagenes: int = IMAGENES_EN_RESUMEN) -> str:
+		"""
+		Describe en qué se fue el tiempo.
+
+		Args:
+			imagenes (int): Cuántas de las imágenes más lentas mostrar.
+
+		Returns:
+			str: Las etapas ordenadas por tiempo y las imágenes más lentas con su etapa dominante.
+		"""
+		total: float = sum(self.segundos.values())
+		if not total:
+			return ""
+		lineas: List[str] = ["Tiempo por etapa (sumado entre procesos):"]
+		for etapa, segundos in sorted(self.segundos.items(), key=lambda par: par[1], reverse=True):
+			ritmo: str = f", {self.bytes[etapa] / 2**20 / segundos:.1f} MB/s" if self.bytes[etapa] and segundos else ""
+			lineas.append(f"  {etapa:<14}{segundos:>8.2f} s {segundos / total:>6.1%}{ritmo}")
+
+		lentas: List[Etapas] = sorted((etapas for etapas in self.imagenes if etapas.segundos), key=lambda etapas: etapas.total, reverse=True)[:imagenes]
+		if lentas:
+			lineas.append("Imágenes más lentas:")
+			for etapas in lentas:
+				dominante: str = max(etapas.segundos, key=etapas.segundos.__getitem__)
+				lineas.append(f"  {etapas.nombre:<40}{etapas.total:>8.2f} s ({dominante} {etapas.segundos[dominante]:.2f} s)")
+		return "\n".join(lineas)
+
+	def terminar(self) -> None:
+		"""Envía el resumen final, lo muestra y cierra los sumideros que lo necesiten."""
+		duracion: float = time.perf_counter() - self.inicio
+		self.emitir(tipo="resumen", segundos=duracion, imagenes=len(self.imagenes),
+			etapas={etapa: {"segundos": segundos, "bytes": self.bytes[etapa]} for etapa, segundos in self.segundos.items()},
+			lentas=[{"nombre": etapas.nombre, "segundos": etapas.total} for etapas in sorted(self.imagenes, key=lambda etapas: etapas.total, reverse=True)[:IMAGENES_EN_RESUMEN]])
+		texto: str = self.resumen()
+		if texto:
+			print(texto)
+		for sumidero in self.sumideros:
+			if hasattr(sumidero, "cerrar"):
+				sumidero.cerrar()
@@ -0,0 +1,145 @@
+import lzma, os
+from typing import Dict, List, NamedTuple
+
+# Perfiles de compresión.
+#
+# Un perfil fija el nivel de LZMA2 y los tamaños máximos del diccionario y del bloque sólido. Al
+# empaquetar se ajustan al tamaño total del rawdata de la galería y al límite de memoria indicado
+# (ver ajustar_perfil). Con bloques sólidos acotados se pueden comprimir (y descomprimir) varios
+# bloques a la vez, a cambio de perder las coincidencias entre imágenes de bloques distintos.
+
+MB: int = 1 << 20
+
+# Memoria aproximada del compresor LZMA2 por hilo, en múltiplos del diccionario (buscador bt4)
+FACTOR_MEMORIA_COMPRESION: float = 11.5
+
+# Diccionario más pequeño que se llega a elegir
+DICCIONARIO_MINIMO: int = 1 * MB
+
+
+class Perfil(NamedTuple):
+	"""Valores máximos de un perfil de compresión."""
+	nivel: int				# Nivel de LZMA2 (0-9, equivalente a -mx de 7-Zip)
+	extremo: bool			# Variante extrema del nivel (más lenta, algo mejor relación)
+	diccionario: int		# Diccionario máximo en bytes
+	bloque: int | None		# Bloque sólido máximo en bytes; 0 = un único bloque, None = un bloque por imagen
+
+
+PERFILES: Dict[str, Perfil] = {
+	"rapido":		Perfil(nivel=3, extremo=False, diccionario=4 * MB, bloque=32 * MB),
+	"equilibrado":	Perfil(nivel=6, extremo=False, diccionario=16 * MB, bloque=128 * MB),
+	"maximo":		Perfil(nivel=9, extremo=True, diccionario=64 * MB, bloque=512 * MB),
+	"ultra":		Perfil(nivel=9, extremo=True, diccionario=1536 * MB, bloque=0),
+	"imagen":		Perfil(nivel=9, extremo=True, diccionario=64 * MB, bloque=None),
+}
+
+PERFIL_POR_DEFECTO: str = "maximo"
+
+
+class Parametros(NamedTuple):
+	"""Parámetros de compresión concretos para una galería."""
+	nivel: int
+	extremo: bool
+	diccionario: int		# Bytes
+	bloque: int | None		# Bytes; None = un bloque por imagen
+	hilos: int
+
+	@property
+	def preset(self) -> int:
+		"""El preset equivalente para el módulo lzma."""
+		return self.nivel | (lzma.PRESET_EXTREME if self.extremo else 0)
+
+	@property
+	def memoria_compresion(self) -> int:
+		"""Memoria aproximada necesaria para comprimir, en bytes."""
+		return memoria_compresion(diccionario=self.diccionario, bloque=self.bloque, hilos=self.hilos)
+
+	@property
+	def memoria_descompresion(self) -> int:
+		"""Memoria aproximada necesaria para descomprimir un bloque, en bytes."""
+		return self.diccionario
+
+	def describir(self) -> str:
+		"""Resumen legible de los parámetros."""
+		bloque: str = "uno por imagen" if self.bloque is None else f"{self.bloque / MB:.0f} MB"
+		return (f"nivel {self.nivel}{'e' if self.extremo else ''}, diccionario {self.diccionario / MB:.0f} MB, bloque sólido {bloque}, "
+			f"{self.hilos} hilos (~{self.memoria_compresion / MB:.0f} MB para comprimir, ~{self.memoria_descompresion / MB:.0f} MB para descomprimir)")
+
+
+def memoria_compresion(diccionario: int, bloque: int | None, hilos: int) -> int:
+	"""
+	Estima la memoria que necesita la compresión.
+
+	Cada hilo reserva las estructuras del compresor; con más de un hilo, además, cada bloque en vuelo
+	(y el que se está llenando) se guarda entero en memoria. Un solo hilo comprime en flujo.
+	"""
+	memoria: int = hilos * int(FACTOR_MEMORIA_COMPRESION * diccionario)
+	if hilos > 1 and bloque:
+		memoria += (hilos + 1) * bloque
+	return memoria
+
+def ajustar_perfil(nombre: str, tamaño_total: int, memoria: int | None = None, hilos: int = 0) -> Parametros:
+	"""
+	Adapta un perfil a una galería concreta.
+
+	El diccionario no pasa del tamaño del bloque ni del rawdata total: uno mayor no mejora la compresión
+	y obliga a reservar más memoria al descomprimir. No se usan más hilos que bloques. Si se indica un
+	límite de memoria, se reducen primero los hilos y después el diccionario hasta que la compresión quepa.
+
+	Args:
+		nombre (str): El nombre del perfil en PERFILES.
+		tamaño_total (int): El rawdata total (estimado) de la galería, en bytes.
+		memoria (int | None): Límite de memoria para comprimir, en bytes; None para no limitarla.
+		hilos (int): Hilos de compresión (0 = todos los núcleos).
+
+	Returns:
+		Parametros: Los parámetros concretos de compresión.
+	"""
+	perfil: Perfil = PERFILES[nombre]
+	tamaño_total = max(tamaño_total, DICCIONARIO_MINIMO)
+
+	bloque: int | None = perfil.bloque
+	if bloque is not None:
+		bloque = tamaño_total if bloque == 0 else min(bloque, tamaño_total)
+
+	# Potencia de dos que cubre el bloque (o el total), sin pasar del máximo del perfil
+	cubrir: int = bloque or tamaño_total
+	diccionario: int = min(perfil.diccionario, max(DICCIONARIO_MINIMO, 1 << (cubrir - 1).bit_length()))
+
+	hilos = hilos or os.cpu_count() or 1
+	if bloque is not None:
+		hilos = min(hilos, -(-tamaño_total // bloque))
+
+	if memoria is not None:
+		while memoria_compresion(diccionario=diccionario, bloque=bloque, hilos=hilos) > memoria:
+			if hilos > 1:
+				hilos -= 1
+			elif diccionario > DICCIONARIO_MINIMO:
+				diccionario //= 2
+			else:
+				break
+
+	return Parametros(nivel=perfil.nivel, extremo=perfil.extremo, diccionario=diccionario, bloque=bloque, hilos=hilos)
+
+def parametros_7z(parametros: Parametros) -> List[str]:
+	"""
+	Traduce los parámetros de compresión a opciones de 7-Zip.
+
+	Args:
+		parametros (Parametros): Los parámetros ajustados con ajustar_perfil.
+
+	Returns:
+		List[str]: Las opciones de nivel, diccionario, bloque sólido e hilos.
+	"""
+	opciones: List[str] = [
+		f"-mx{parametros.nivel}",								# Nivel de compresión
+		f"-md={max(parametros.diccionario // MB, 1)}m",			# Tamaño del diccionario
+		f"-mmt={parametros.hilos}",								# Hilos de compresión
+	]
+	if parametros.extremo:
+		opciones.append("-mfb=273")								# Tamaño de palabra máximo
+	if parametros.bloque is None:
+		opciones.append("-ms=off")								# Un bloque por archivo
+	else:
+		opciones.append(f"-ms={max(parametros.bloque // MB, 1)}m")	# Tamaño de bloque sólido
+	return opciones
@@ -0,0 +1,203 @@
+import argparse
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from typing import Any, Dict, List, Tuple
+
+# Reducción sin pérdida del modo de las imágenes antes de guardarlas.
+#
+# Muchas imágenes declaran un modo más ancho que su contenido: RGBA con el alfa entero opaco,
+# RGB que en realidad es gris o imágenes con pocas decenas de colores. Aquí se busca el modo más
+# pequeño que representa exactamente los mismos píxeles (sin el alfa, en gris o con una paleta
+# de índices de 1, 2, 4 u 8 bits) y se guarda ese rawdata. La descripción de la reducción basta
+# para recuperar byte a byte el rawdata original de Pillow.
+
+# Modos que se pueden reducir y su número de canales; el alfa, si lo hay, es el último canal
+CANALES: Dict[str, int] = {"L": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+
+# Colores distintos que admite la paleta (los índices se guardan en un byte como mucho)
+COLORES_PALETA: int = 256
+
+# Píxeles de la muestra que descarta pronto una reducción en las imágenes que no la admiten
+PIXELES_MUESTRA: int = 1 << 16
+
+
+def es_reducible(modo: str) -> bool:
+	"""Indica si el rawdata de un modo de imagen se puede reducir."""
+	return modo in CANALES
+
+def _cumple(pixeles: np.ndarray, condicion) -> bool:
+	"""Comprueba una condición primero en una muestra de píxeles y, si se cumple en ella, en todos."""
+	paso: int = max(1, len(pixeles) // PIXELES_MUESTRA)
+	return bool(condicion(pixeles[::paso]).all()) and bool(condicion(pixeles).all())
+
+def _bits_por_indice(colores: int) -> int:
+	"""Los bits del índice más pequeño que distingue ese número de colores (1, 2, 4 u 8)."""
+	for bits in (1, 2, 4):
+		if colores <= 1 << bits:
+			return bits
+	return 8
+
+def _paleta(pixeles: np.ndarray) -> Tuple[np.ndarray, np.ndarray] | None:
+	"""
+	Busca los colores distintos de la imagen.
+
+	Returns:
+		Tuple[np.ndarray, np.ndarray] | None: La paleta (colores, canales) y el índice de cada píxel, o None si hay
+			más de COLORES_PALETA colores.
+	"""
+	canales: int = pixeles.shape[1]
+	if canales == 1:
+		# Un solo canal: basta con contar cuántas veces aparece cada valor
+		presentes: np.ndarray = np.flatnonzero(np.bincount(pixeles[:, 0], minlength=256))
+		tabla: np.ndarray = np.zeros(shape=256, dtype=np.uint8)
+		tabla[presentes] = np.arange(len(presentes), dtype=np.uint8)
+		return presentes.astype(np.uint8).reshape(-1, 1), tabla[pixeles[:, 0]]
+
+	# Varios canales: cada color se junta en un entero para ordenarlos de una vez
+	codigos: np.ndarray = np.zeros(shape=len(pixeles), dtype=np.uint32)
+	for canal in range(canales):
+		codigos |= pixeles[:, canal].astype(np.uint32) << np.uint32(8 * canal)
+	paso: int = max(1, len(codigos) // PIXELES_MUESTRA)
+	if len(np.unique(codigos[::paso])) > COLORES_PALETA:
+		return None
+	colores, indices = np.unique(codigos, return_inverse=True)
+	if len(colores) > COLORES_PALETA:
+		return None
+	paleta: np.ndarray = ((colores[:, None] >> (8 * np.arange(canales, dtype=np.uint32))) & 0xFF).astype(np.uint8)
+	return paleta, indices.astype(np.uint8)
+
+def _empaquetar_indices(indices: np.ndarray, bits: int) -> bytes:
+	"""Junta los índices (alto, ancho) en bytes de `bits` bits cada uno, empezando cada fila en un byte nuevo, como PNG."""
+	if bits == 8:
+		return indices.tobytes()
+	por_byte: int = 8 // bits
+	alto, ancho = indices.shape
+	relleno: np.ndarray = np.zeros(shape=(alto, -(-ancho // por_byte) * por_byte), dtype=np.uint8)
+	relleno[:, :ancho] = indices
+	desplazamientos: np.ndarray = (8 - bits * (np.arange(por_byte, dtype=np.uint8) + 1)).astype(np.uint8)
+	grupos: np.ndarray = relleno.reshape(alto, -1, por_byte) << desplazamientos
+	return np.bitwise_or.reduce(grupos, axis=2).tobytes()
+
+def _desempaquetar_indices(datos: bytes, bits: int, tamaño: Tuple[int, int]) -> np.ndarray:
+	"""Invierte _empaquetar_indices."""
+	ancho, alto = tamaño
+	filas: np.ndarray = np.frombuffer(datos, dtype=np.uint8).reshape(alto, -1)
+	if bits == 8:
+		return filas
+	por_byte: int = 8 // bits
+	desplazamientos: np.ndarray = (8 - bits * (np.arange(por_byte, dtype=np.uint8) + 1)).astype(np.uint8)
+	indices: np.ndarray = (filas[:, :, None] >> desplazamientos) & ((1 << bits) - 1)
+	return indices.reshape(alto, -1)[:, :ancho]
+
+def reducir(rawdata: bytes, modo: str, tamaño: Tuple[int, int]) -> Tuple[bytes, Dict[str, Any] | None]:
+	"""
+	Guarda los píxeles en el modo más pequeño que los representa exactamente.
+
+	Se quita el alfa si es opaco en todos los píxeles, se pasa a gris si los tres canales de color
+	son iguales en todos y, si hay pocos colores distintos, se guardan como índices de una paleta.
+
+	Args:
+		rawdata (bytes): El rawdata entrelazado de Pillow.
+		modo (str): El modo de la imagen.
+		tamaño (Tuple[int, int]): Ancho y alto de la imagen.
+
+	Returns:
+		Tuple[bytes, Dict[str, Any] | None]: El rawdata reducido y la descripción de la reducción que hay que guardar
+			con las propiedades, o el rawdata original y None si no se puede reducir.
+	"""
+	if not es_reducible(modo=modo) or not rawdata:
+		return rawdata, None
+	ancho, alto = tamaño
+	pixeles: np.ndarray = np.frombuffer(rawdata, dtype=np.uint8).reshape(-1, CANALES[modo])
+	reducido: str = modo
+
+	# Alfa opaco en todos los píxeles
+	if reducido in ("LA", "RGBA") and _cumple(pixeles=pixeles, condicion=lambda p: p[:, -1] == 255):
+		pixeles = pixeles[:, :-1]
+		reducido = reducido[:-1]
+
+	# Color con los tres canales iguales: gris
+	if reducido in ("RGB", "RGBA") and _cumple(pixeles=pixeles, condicion=lambda p: (p[:, 0] == p[:, 1]) & (p[:, 0] == p[:, 2])):
+		pixeles = pixeles[:, [0, 3]] if reducido == "RGBA" else pixeles[:, :1]
+		reducido = "LA" if reducido == "RGBA" else "L"
+
+	# Pocos colores: índices de una paleta, si ocupan menos que los píxeles
+	encontrada: Tuple[np.ndarray, np.ndarray] | None = _paleta(pixeles=pixeles)
+	if encontrada is not None and _bits_por_indice(colores=len(encontrada[0])) < 8 * pixeles.shape[1]:
+		paleta, indices = encontrada
+		bits: int = _bits_por_indice(colores=len(paleta))
+		datos: bytes = _empaquetar_indices(indices=indices.reshape(alto, ancho), bits=bits)
+		return datos, {"mode": reducido, "palette": paleta.tobytes().hex(), "bits": bits}
+
+	if reducido == modo:
+		return rawdata, None
+	return np.ascontiguousarray(pixeles).tobytes(), {"mode": reducido}
+
+def modo_guardado(reduccion: Dict[str, Any]) -> str:
+	"""El modo del rawdata reducido: el de sus colores o "P" si son índices de una paleta (que no se transforman)."""
+	return "P" if "palette" in reduccion else reduccion["mode"]
+
+def ampliar(datos: bytes, modo: str, tamaño: Tuple[int, int], reduccion: Dict[str, Any]) -> bytes:
+	"""
+	Recupera el rawdata original a partir del reducido.
+
+	Args:
+		datos (bytes): El rawdata reducido.
+		modo (str): El modo original de la imagen.
+		tamaño (Tuple[int, int]): Ancho y alto de la imagen.
+		reduccion (Dict[str, Any]): La descripción guardada por reducir.
+
+	Returns:
+		bytes: El rawdata tal y como lo entrega Pillow.
+	"""
+	reducido: str = reduccion["mode"]
+	if "palette" in reduccion:
+		paleta: np.ndarray = np.frombuffer(bytes.fromhex(reduccion["palette"]), dtype=np.uint8).reshape(-1, CANALES[reducido])
+		pixeles: np.ndarray = paleta[_desempaquetar_indices(datos=datos, bits=reduccion["bits"], tamaño=tamaño).reshape(-1)]
+	else:
+		pixeles = np.frombuffer(datos, dtype=np.uint8).reshape(-1, CANALES[reducido])
+
+	# Gris: el mismo valor en los tres canales de color
+	if reducido in ("L", "LA") and modo in ("RGB", "RGBA"):
+		pixeles = pixeles[:, [0, 0, 0, 1] if reducido == "LA" else [0, 0, 0]]
+
+	# Alfa opaco
+	if pixeles.shape[1] < CANALES[modo]:
+		pixeles = np.concatenate((pixeles, np.full(shape=(len(pixeles), 1), fill_value=255, dtype=np.uint8)), axis=1)
+	return np.ascontiguousarray(pixeles).tobytes()
+
+def describir(reduccion: Dict[str, Any] | None, modo: str) -> str:
+	"""Describe una reducción para mostrarla: "RGBA -> L" o "RGB -> paleta de 12 colores (4 bits)"."""
+	if reduccion is None:
+		return f"{modo} (sin reducir)"
+	if "palette" in reduccion:
+		colores: int = len(reduccion["palette"]) // (2 * CANALES[reduccion["mode"]])
+		return f"{modo} -> paleta {reduccion['mode']} de {colores} colores ({reduccion['bits']} bits)"
+	return f"{modo} -> {reduccion['mode']}"
+
+if __name__ == "__main__":
+	# Muestra qué reducción se aplicaría a cada imagen y cuánto rawdata ahorra
+	parser = argparse.ArgumentParser(description='Muestra la reducción de modo sin pérdida de cada imagen y el rawdata que ahorra.')
+	parser.add_argument('ruta', help='Imagen o carpeta de imágenes')
+	args: argparse.Namespace = parser.parse_args()
+
+	ruta: Path = Path(args.ruta)
+	if ruta.is_dir():
+		rutas: List[Path] = sorted(archivo for archivo in ruta.iterdir() if archivo.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp'])
+	else:
+		rutas = [ruta]
+	original: int = 0
+	reducido: int = 0
+	for imagen in rutas:
+		with Image.open(fp=imagen) as img:
+			modo: str = img.mode
+			tamaño: Tuple[int, int] = img.size
+			rawdata: bytes = img.tobytes()
+		datos, reduccion = reducir(rawdata=rawdata, modo=modo, tamaño=tamaño)
+		assert reduccion is None or ampliar(datos=datos, modo=modo, tamaño=tamaño, reduccion=reduccion) == rawdata
+		print(f"{imagen.name:<40}{describir(reduccion=reduccion, modo=modo):<40}{len(rawdata) / 2**20:>9.2f} MB -> {len(datos) / 2**20:.2f} MB")
+		original += len(rawdata)
+		reducido += len(datos)
+	if original:
+		print(f"Total: {original / 2**20:.1f} MB -> {reducido / 2**20:.1f} MB ({reducido / original:.1%})")
@@ -0,0 +1,125 @@
+import argparse, time
+import numpy as np
+from concurrent.futures import Executor
+from pathlib import Path
+from PIL import Image
+from typing import Dict, List, Tuple
+
+from Franjas import es_grande
+
+# Orden de las imágenes por parecido antes de comprimirlas.
+#
+# En un bloque sólido, LZMA2 solo aprovecha lo que se repite dentro de su diccionario, así que las
+# versiones casi iguales de una imagen (otra exportación, un recorte, un retoque) comprimen mucho
+# mejor si quedan seguidas. El orden por nombre suele separarlas. Aquí se agrupan las imágenes por
+# modo y tamaño (solo las de un mismo grupo pueden coincidir byte a byte) y, dentro de cada grupo,
+# se encadenan por una huella barata: la luminancia media de una cuadrícula pequeña.
+
+# Lado de la cuadrícula de la huella
+LADO_HUELLA: int = 8
+
+# Imágenes que se encadenan de una vez; los grupos mayores se encadenan por tramos de este tamaño
+# para que el coste (cuadrático en el tamaño del tramo) no se dispare
+IMAGENES_POR_CADENA: int = 2048
+
+# Imágenes que recibe cada tarea cuando las huellas se calculan con un grupo de procesos
+IMAGENES_POR_TAREA: int = 16
+
+Grupo = Tuple[str, Tuple[int, int]]
+
+
+def submuestrear(gris: np.ndarray) -> np.ndarray:
+	"""Reduce una imagen en gris a la media de cada celda de una cuadrícula de LADO_HUELLA × LADO_HUELLA (menos celdas si es más pequeña)."""
+	alto, ancho = gris.shape
+	filas: np.ndarray = np.linspace(0, alto, num=min(LADO_HUELLA, alto) + 1).astype(np.intp)[:-1]
+	columnas: np.ndarray = np.linspace(0, ancho, num=min(LADO_HUELLA, ancho) + 1).astype(np.intp)[:-1]
+	sumas: np.ndarray = np.add.reduceat(np.add.reduceat(gris, filas, axis=0), columnas, axis=1)
+	celdas: np.ndarray = np.outer(np.diff(np.append(filas, alto)), np.diff(np.append(columnas, ancho)))
+	return (sumas / celdas).ravel().astype(np.float32)
+
+def huella(ruta: Path) -> Tuple[Grupo, np.ndarray | None]:
+	"""
+	Lee el modo y el tamaño de una imagen y calcula su huella.
+
+	Los JPEG se decodifican directamente a escala reducida. Las imágenes grandes (ver Franjas.es_grande)
+	no se decodifican, porque no caben en el diccionario de ninguna forma, y no tienen huella.
+
+	Args:
+		ruta (Path): La ruta de la imagen.
+
+	Returns:
+		Tuple[Grupo, np.ndarray | None]: El modo y el tamaño de la imagen, y su huella o None.
+	"""
+	with Image.open(fp=ruta) as img:
+		grupo: Grupo = (img.mode, img.size)
+		if es_grande(modo=img.mode, tamaño=img.size) or not all(img.size):
+			return grupo, None
+		img.draft("L", (LADO_HUELLA * 8, LADO_HUELLA * 8))
+		gris: np.ndarray = np.asarray(img.convert("L"), dtype=np.float32)
+	return grupo, submuestrear(gris=gris)
+
+def encadenar(huellas: np.ndarray) -> List[int]:
+	"""
+	Ordena huellas (imágenes, valores) empezando por la primera y siguiendo cada vez por la más parecida de las que quedan.
+
+	El parecido es la distancia L1 entre huellas; con empates se queda la que iba antes.
+	"""
+	restantes: np.ndarray = np.ones(shape=len(huellas), dtype=bool)
+	actual: int = 0
+	restantes[actual] = False
+	cadena: List[int] = [actual]
+	for _ in range(len(huellas) - 1):
+		distancias: np.ndarray = np.abs(huellas - huellas[actual]).sum(axis=1)
+		distancias[~restantes] = np.inf
+		actual = int(np.argmin(distancias))
+		restantes[actual] = False
+		cadena.append(actual)
+	return cadena
+
+def ordenar_por_parecido(lista_imagenes: List[Path], ejecutor: Executor | None = None) -> List[int]:
+	"""
+	Elige el orden en que conviene comprimir las imágenes para que las parecidas queden seguidas.
+
+	Los grupos de modo y tamaño aparecen en el orden de su primera imagen; dentro de cada uno, las
+	imágenes se encadenan por parecido y las que no tienen huella van al final.
+
+	Args:
+		lista_imagenes (List[Path]): Las imágenes en el orden de la galería.
+		ejecutor (Executor | None): Grupo de procesos con el que calcular las huellas; None para calcularlas aquí.
+
+	Returns:
+		List[int]: Los índices de lista_imagenes en el orden en que se deben comprimir.
+	"""
+	if ejecutor is None:
+		analizadas: List[Tuple[Grupo, np.ndarray | None]] = [huella(ruta=imagen) for imagen in lista_imagenes]
+	else:
+		analizadas = list(ejecutor.map(huella, lista_imagenes, chunksize=IMAGENES_POR_TAREA))
+
+	grupos: Dict[Grupo, List[int]] = {}
+	for indice, (grupo, _) in enumerate(iterable=analizadas):
+		grupos.setdefault(grupo, []).append(indice)
+
+	orden: List[int] = []
+	for indices in grupos.values():
+		con_huella: List[int] = [indice for indice in indices if analizadas[indice][1] is not None]
+		for inicio in range(0, len(con_huella), IMAGENES_POR_CADENA):
+			tramo: List[int] = con_huella[inicio:inicio + IMAGENES_POR_CADENA]
+			huellas: np.ndarray = np.stack([analizadas[indice][1] for indice in tramo])
+			orden.extend(tramo[posicion] for posicion in encadenar(huellas=huellas))
+		orden.extend(indice for indice in indices if analizadas[indice][1] is None)
+	return orden
+
+if __name__ == "__main__":
+	# Muestra el orden por parecido de una carpeta de imágenes
+	from Empaquetador import escanear_carpeta
+
+	parser = argparse.ArgumentParser(description='Muestra en qué orden se comprimirían las imágenes de una carpeta al ordenarlas por parecido.')
+	parser.add_argument('carpeta', help='Carpeta de imágenes')
+	args: argparse.Namespace = parser.parse_args()
+
+	lista_imagenes: List[Path] = escanear_carpeta(carpeta=Path(args.carpeta))
+	inicio: float = time.perf_counter()
+	orden: List[int] = ordenar_por_parecido(lista_imagenes=lista_imagenes)
+	for posicion in orden:
+		print(lista_imagenes[posicion].name)
+	print(f"{len(lista_imagenes)} imágenes ordenadas en {time.perf_counter() - inicio:.2f} s")
@@ -0,0 +1,213 @@
+import argparse, lzma, time
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from typing import Any, Dict, List, Tuple
+
+# Transformaciones reversibles del rawdata antes de comprimirlo.
+#
+# El rawdata de Pillow está entrelazado (RGBRGB...), lo que es una mala entrada para un
+# compresor genérico. Aquí se separa en planos (RRR...GGG...BBB...) y se aplica a cada plano
+# un predictor por filas, como los filtros de PNG: se guarda la diferencia entre cada byte y
+# su predicción, que en contenido fotográfico es casi siempre un valor pequeño.
+
+# Modos con canales de 8 bits que se pueden separar en planos, y su número de canales
+CANALES: Dict[str, int] = {"L": 1, "LA": 2, "RGB": 3, "RGBA": 4, "CMYK": 4, "YCbCr": 3, "LAB": 3, "HSV": 3}
+
+# Filtros disponibles; "planos" solo separa los canales
+FILTROS: Tuple[str, ...] = ("planos", "sub", "up", "average", "paeth")
+
+# Lado máximo de la muestra usada para elegir el filtro automáticamente
+LADO_MUESTRA: int = 256
+
+
+def es_transformable(modo: str) -> bool:
+	"""Indica si el rawdata de un modo de imagen se puede transformar."""
+	return modo in CANALES
+
+def _a_planos(rawdata: bytes, modo: str, tamaño: Tuple[int, int]) -> np.ndarray:
+	"""Convierte el rawdata entrelazado en un arreglo (canales, alto, ancho)."""
+	ancho, alto = tamaño
+	pixeles: np.ndarray = np.frombuffer(rawdata, dtype=np.uint8).reshape(alto, ancho, CANALES[modo])
+	return np.ascontiguousarray(pixeles.transpose(2, 0, 1))
+
+def _vecinos(planos: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Devuelve los vecinos izquierdo, superior y superior izquierdo de cada byte (0 fuera de la imagen)."""
+	izquierda: np.ndarray = np.zeros_like(planos)
+	izquierda[:, :, 1:] = planos[:, :, :-1]
+	arriba: np.ndarray = np.zeros_like(planos)
+	arriba[:, 1:, :] = planos[:, :-1, :]
+	arriba_izquierda: np.ndarray = np.zeros_like(planos)
+	arriba_izquierda[:, 1:, 1:] = planos[:, :-1, :-1]
+	return izquierda, arriba, arriba_izquierda
+
+def _paeth(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+	"""Predictor de Paeth (el de PNG) sobre arreglos de enteros con signo."""
+	p: np.ndarray = a + b - c
+	pa: np.ndarray = np.abs(p - a)
+	pb: np.ndarray = np.abs(p - b)
+	pc: np.ndarray = np.abs(p - c)
+	return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+def _filtrar(planos: np.ndarray, filtro: str) -> np.ndarray:
+	"""Aplica un filtro a todos los planos a la vez; la resta es módulo 256."""
+	if filtro == "planos":
+		return planos
+	izquierda, arriba, arriba_izquierda = _vecinos(planos=planos)
+	if filtro == "sub":
+		return planos - izquierda
+	if filtro == "up":
+		return planos - arriba
+	if filtro == "average":
+		return planos - ((izquierda.astype(np.uint16) + arriba) >> 1).astype(np.uint8)
+	if filtro == "paeth":
+		prediccion: np.ndarray = _paeth(a=izquierda.astype(np.int16), b=arriba.astype(np.int16), c=arriba_izquierda.astype(np.int16))
+		return planos - prediccion.astype(np.uint8)
+	raise ValueError(f"Filtro desconocido: {filtro}")
+
+def _desfiltrar(residuos: np.ndarray, filtro: str) -> np.ndarray:
+	"""Invierte _filtrar."""
+	if filtro == "planos":
+		return residuos
+	# Sub y Up se invierten con una suma acumulada módulo 256
+	if filtro == "sub":
+		return np.cumsum(residuos, axis=2, dtype=np.uint8)
+	if filtro == "up":
+		return np.cumsum(residuos, axis=1, dtype=np.uint8)
+	if filtro not in ("average", "paeth"):
+		raise ValueError(f"Filtro desconocido: {filtro}")
+
+	# Average y Paeth dependen del vecino izquierdo ya reconstruido, así que se recorren las
+	# antidiagonales (x + y constante): cada una solo depende de las dos anteriores y se
+	# reconstruye entera con una operación vectorizada.
+	canales, alto, ancho = residuos.shape
+	salida: np.ndarray = np.zeros(shape=(canales, alto + 1, ancho + 1), dtype=np.int16)	# Fila y columna 0 de relleno
+	for diagonal in range(alto + ancho - 1):
+		ys: np.ndarray = np.arange(max(0, diagonal - ancho + 1), min(alto, diagonal + 1))
+		xs: np.ndarray = diagonal - ys
+		izquierda: np.ndarray = salida[:, ys + 1, xs]
+		arriba: np.ndarray = salida[:, ys, xs + 1]
+		if filtro == "average":
+			prediccion: np.ndarray = (izquierda + arriba) >> 1
+		else:
+			prediccion = _paeth(a=izquierda, b=arriba, c=salida[:, ys, xs])
+		salida[:, ys + 1, xs + 1] = (residuos[:, ys, xs] + prediccion) & 0xFF
+	return salida[:, 1:, 1:].astype(np.uint8)
+
+def elegir_filtro(rawdata: bytes, modo: str, tamaño: Tuple[int, int]) -> str:
+	"""
+	Elige el filtro que deja los residuos más pequeños en una muestra central de la imagen.
+
+	Es la misma heurística que usan los codificadores PNG: la suma de los valores absolutos de los
+	residuos interpretados como bytes con signo.
+	"""
+	planos: np.ndarray = _a_planos(rawdata=rawdata, modo=modo, tamaño=tamaño)
+	_, alto, ancho = planos.shape
+	y0: int = max(0, (alto - LADO_MUESTRA) // 2)
+	x0: int = max(0, (ancho - LADO_MUESTRA) // 2)
+	muestra: np.ndarray = np.ascontiguousarray(planos[:, y0:y0 + LADO_MUESTRA, x0:x0 + LADO_MUESTRA])
+
+	costes: Dict[str, int] = {}
+	for filtro in FILTROS:
+		costes[filtro] = int(np.abs(_filtrar(planos=muestra, filtro=filtro).view(np.int8).astype(np.int32)).sum())
+	return min(costes, key=costes.__getitem__)
+
+def transformar(rawdata: bytes, modo: str, tamaño: Tuple[int, int], filtro: str = "auto") -> Tuple[bytes, Dict[str, Any] | None]:
+	"""
+	Separa el rawdata en planos y aplica un filtro de predicción.
+
+	Args:
+		rawdata (bytes): El rawdata entrelazado de Pillow.
+		modo (str): El modo de la imagen.
+		tamaño (Tuple[int, int]): Ancho y alto de la imagen.
+		filtro (str): Uno de FILTROS, o "auto" para elegirlo por imagen.
+
+	Returns:
+		Tuple[bytes, Dict[str, Any] | None]: El rawdata transformado y la descripción de la transformación
+			que hay que guardar en images.json, o el rawdata original y None si el modo no es transformable.
+	"""
+	if not es_transformable(modo=modo):
+		return rawdata, None
+	if filtro == "auto":
+		filtro = elegir_filtro(rawdata=rawdata, modo=modo, tamaño=tamaño)
+	planos: np.ndarray = _a_planos(rawdata=rawdata, modo=modo, tamaño=tamaño)
+	return _filtrar(planos=planos, filtro=filtro).tobytes(), {"planos": True, "filtro": filtro}
+
+def invertir(datos: bytes, modo: str, tamaño: Tuple[int, int], transformacion: Dict[str, Any]) -> bytes:
+	"""
+	Recupera el rawdata entrelazado original a partir del transformado.
+
+	Args:
+		datos (bytes): El rawdata transformado.
+		modo (str): El modo de la imagen.
+		tamaño (Tuple[int, int]): Ancho y alto de la imagen.
+		transformacion (Dict[str, Any]): La descripción guardada por transformar.
+
+	Returns:
+		bytes: El rawdata tal y como lo entrega Pillow.
+	"""
+	ancho, alto = tamaño
+	residuos: np.ndarray = np.frombuffer(datos, dtype=np.uint8).reshape(CANALES[modo], alto, ancho)
+	planos: np.ndarray = _desfiltrar(residuos=residuos, filtro=transformacion["filtro"])
+	return planos.transpose(1, 2, 0).tobytes()
+
+def comparar_filtros(rutas: List[Path]) -> None:
+	"""
+	Mide, para cada transformación, la relación de compresión LZMA2 y la velocidad de transformar y comprimir.
+
+	Args:
+		rutas (List[Path]): Imágenes con las que medir.
+	"""
+	from Contenedor import filtros_lzma2
+
+	opciones: List[str] = ["ninguna", *FILTROS]
+	resultados: Dict[str, Dict[str, float]] = {opcion: {"original": 0, "comprimido": 0, "transformar": 0.0, "comprimir": 0.0, "invertir": 0.0} for opcion in opciones}
+
+	for ruta in rutas:
+		with Image.open(fp=ruta) as img:
+			modo: str = img.mode
+			tamaño: Tuple[int, int] = img.size
+			rawdata: bytes = img.tobytes()
+		if not es_transformable(modo=modo):
+			print(f"Se omite {ruta.name}: modo {modo} no transformable")
+			continue
+
+		for opcion in opciones:
+			resultado: Dict[str, float] = resultados[opcion]
+			inicio: float = time.perf_counter()
+			datos: bytes = rawdata if opcion == "ninguna" else transformar(rawdata=rawdata, modo=modo, tamaño=tamaño, filtro=opcion)[0]
+			resultado["transformar"] += time.perf_counter() - inicio
+
+			inicio = time.perf_counter()
+			comprimido: bytes = lzma.compress(datos, format=lzma.FORMAT_XZ, filters=filtros_lzma2(tamaño_previsto=len(datos)))
+			resultado["comprimir"] += time.perf_counter() - inicio
+
+			if opcion != "ninguna":
+				inicio = time.perf_counter()
+				assert invertir(datos=datos, modo=modo, tamaño=tamaño, transformacion={"planos": True, "filtro": opcion}) == rawdata
+				resultado["invertir"] += time.perf_counter() - inicio
+
+			resultado["original"] += len(rawdata)
+			resultado["comprimido"] += len(comprimido)
+
+	# Tabla de resultados
+	print(f"{'Transformación':<15}{'Relación':>10}{'Transf. MB/s':>14}{'Compr. MB/s':>13}{'Inv. MB/s':>11}")
+	for opcion, resultado in resultados.items():
+		if not resultado["original"]:
+			continue
+		mb: float = resultado["original"] / 2**20
+		velocidad = lambda segundos: f"{mb / segundos:.1f}" if segundos else "-"
+		print(f"{opcion:<15}{resultado['original'] / resultado['comprimido']:>10.3f}{velocidad(resultado['transformar']):>14}{velocidad(resultado['comprimir']):>13}{velocidad(resultado['invertir']):>11}")
+
+if __name__ == "__main__":
+	# Banco de pruebas: compara las transformaciones sobre una imagen o una carpeta de imágenes
+	parser = argparse.ArgumentParser(description='Compara la relación de compresión y la velocidad de cada transformación del rawdata.')
+	parser.add_argument('ruta', help='Imagen o carpeta de imágenes')
+	args: argparse.Namespace = parser.parse_args()
+
+	ruta: Path = Path(args.ruta)
+	if ruta.is_dir():
+		rutas: List[Path] = sorted(archivo for archivo in ruta.iterdir() if archivo.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp'])
+	else:
+		rutas = [ruta]
+	comparar_filtros(rutas=rutas)
@@ -0,0 +1,153 @@
+import os, threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Iterable, Iterator, Tuple, TypeVar
+
+from Franjas import TAMAÑO_LECTURA
+
+# Etapas del empaquetado solapadas en una tubería.
+#
+# Sin tubería, cada imagen pasa por todas las etapas antes de empezar la siguiente: mientras se
+# escribe o se comprime una imagen no se decodifica ninguna y, mientras se decodifica, el disco está
+# parado. Aquí las etapas se separan con colas acotadas: un hilo lee por adelantado los archivos de
+# las próximas imágenes (el decodificador los encuentra ya en la caché del sistema), otro hilo las
+# decodifica (él mismo o repartiéndolas entre los procesos trabajadores) y quien recorre el resultado
+# las escribe o las comprime. Cada cola limita cuánto se adelanta la etapa anterior, y con ello la
+# memoria. Pillow, hashlib, lzma y la escritura en disco sueltan el GIL, así que las etapas avanzan a
+# la vez aunque solo haya un proceso.
+
+# Imágenes que el hilo lector puede leer por delante del decodificador
+IMAGENES_PRELEIDAS: int = 8
+
+# Archivos a partir de este tamaño no se leen por adelantado: no caben en la caché y se decodifican por franjas
+ARCHIVO_MAXIMO_PRELEIDO: int = 256 << 20
+
+# Bytes de rawdata decodificado que pueden esperar a ser escritos o comprimidos
+BYTES_EN_COLA: int = 256 << 20
+
+T = TypeVar("T")
+
+
+class ColaAcotada:
+	"""
+	Cola entre un hilo productor y quien la recorre, acotada por número de elementos y por bytes.
+
+	Siempre se admite al menos un elemento, aunque por sí solo supere el límite de bytes. Un error del
+	productor se vuelve a lanzar al recorrer la cola, después de entregar lo que ya se había producido.
+	"""
+
+	def __init__(self, elementos_maximos: int | None = None, bytes_maximos: int | None = None) -> None:
+		self.elementos_maximos: int | None = elementos_maximos
+		self.bytes_maximos: int | None = bytes_maximos
+		self.pendientes: Deque[Tuple[Any, int]] = deque()
+		self.bytes_pendientes: int = 0
+		self.terminada: bool = False
+		self.cancelada: bool = False
+		self.error: BaseException | None = None
+		self.condicion = threading.Condition()
+
+	def _llena(self, tamaño: int) -> bool:
+		"""Indica si un elemento más de ese tamaño superaría alguno de los límites."""
+		if not self.pendientes:
+			return False
+		if self.elementos_maximos is not None and len(self.pendientes) >= self.elementos_maximos:
+			return True
+		return self.bytes_maximos is not None and self.bytes_pendientes + tamaño > self.bytes_maximos
+
+	def llenar(self, elementos: Iterable[Any], tamaño: Callable[[Any], int] | None = None) -> None:
+		"""Recorre los elementos (en el hilo productor) y los encola, esperando cuando la cola está llena."""
+		iterador: Iterator[Any] = iter(elementos)
+		try:
+			for elemento in iterador:
+				bytes_elemento: int = 0 if tamaño is None else tamaño(elemento)
+				with self.condicion:
+					while self._llena(tamaño=bytes_elemento) and not self.cancelada:
+						self.condicion.wait()
+					if self.cancelada:
+						return
+					self.pendientes.append((elemento, bytes_elemento))
+					self.bytes_pendientes += bytes_elemento
+					self.condicion.notify_all()
+		except BaseException as error:
+			with self.condicion:
+				self.error = error
+		finally:
+			# Cierra el generador en su propio hilo (por ejemplo, para apagar su grupo de procesos)
+			cerrar: Callable[[], None] | None = getattr(iterador, "close", None)
+			if cerrar is not None:
+				cerrar()
+			with self.condicion:
+				self.terminada = True
+				self.condicion.notify_all()
+
+	def cancelar(self) -> None:
+		"""Descarta lo pendiente y hace que el productor pare en cuanto termine el elemento en curso."""
+		with self.condicion:
+			self.cancelada = True
+			self.pendientes.clear()
+			self.bytes_pendientes = 0
+			self.condicion.notify_all()
+
+	def __iter__(self) -> Iterator[Any]:
+		while True:
+			with self.condicion:
+				while not self.pendientes and not self.terminada:
+					self.condicion.wait()
+				if not self.pendientes:
+					if self.error is not None:
+						raise self.error
+					return
+				elemento, bytes_elemento = self.pendientes.popleft()
+				self.bytes_pendientes -= bytes_elemento
+				self.condicion.notify_all()
+			yield elemento
+
+
+def en_segundo_plano(elementos: Iterable[T], tamaño: Callable[[T], int] | None = None, elementos_maximos: int | None = None, bytes_maximos: int | None = None) -> Iterator[T]:
+	"""
+	Recorre un iterable en un hilo aparte y entrega sus elementos, en orden, a medida que están listos.
+
+	El hilo se adelanta como mucho elementos_maximos elementos o bytes_maximos bytes (según `tamaño`).
+	Si se deja de recorrer el resultado, el hilo para y se espera a que termine.
+
+	Args:
+		elementos (Iterable[T]): Lo que produce la etapa anterior (un generador se recorre y se cierra en el hilo).
+		tamaño (Callable[[T], int] | None): Bytes que ocupa en memoria cada elemento; None para no contarlos.
+		elementos_maximos (int | None): Elementos que pueden esperar en la cola; None para no limitarlos.
+		bytes_maximos (int | None): Bytes que pueden esperar en la cola; None para no limitarlos.
+
+	Yields:
+		T: Los elementos, en el orden en que se produjeron.
+	"""
+	cola = ColaAcotada(elementos_maximos=elementos_maximos, bytes_maximos=bytes_maximos)
+	hilo = threading.Thread(target=cola.llenar, args=(elementos, tamaño), daemon=True)
+	hilo.start()
+	try:
+		yield from cola
+	finally:
+		cola.cancelar()
+		hilo.join()
+
+def leer_por_adelantado(ruta: Path) -> Path:
+	"""
+	Trae un archivo a la caché del sistema para que decodificarlo no espere al disco.
+
+	Donde existe, posix_fadvise pide al sistema que lo lea en segundo plano; si no, se lee por trozos y
+	se descarta. Los errores se ignoran: ya los encontrará el decodificador.
+	"""
+	try:
+		if ruta.stat().st_size >= ARCHIVO_MAXIMO_PRELEIDO:
+			return ruta
+		with open(file=ruta, mode="rb") as f:
+			if hasattr(os, "posix_fadvise"):
+				os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+			else:
+				while f.read(TAMAÑO_LECTURA):
+					pass
+	except OSError:
+		pass
+	return ruta
+
+def preleer(rutas: Iterable[Path], adelanto: int = IMAGENES_PRELEIDAS) -> Iterator[Path]:
+	"""Entrega las rutas a medida que un hilo lector trae sus archivos a la caché, como mucho `adelanto` por delante."""
+	return en_segundo_plano(elementos=map(leer_por_adelantado, rutas), elementos_maximos=adelanto)